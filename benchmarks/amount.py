@@ -0,0 +1,62 @@
+"""Micro-benchmark of token amounts parsing and formatting.
+
+    python benchmarks/amount.py [--count 10000]
+
+The former `Wei` string based parseUnit/formatUnit are measured too when brownie is installed.
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.amount import Amount, format_amounts, parse_amounts
+
+
+def legacy_units():
+    from brownie import Wei
+
+    def parseUnit(amount, decimals=18):
+        if decimals < 18:
+            return Wei(f"{amount} ether") // 10 ** (18 - decimals)
+        return Wei(f"{amount} ether")
+
+    def formatUnit(amount, decimals=18):
+        if decimals < 18:
+            corr = 18 - decimals
+            return str(Wei(amount * 10 ** (corr)).to("ether"))[:-corr]
+        return str(Wei(amount).to("ether"))
+
+    return (parseUnit, formatUnit)
+
+
+def report(name, count, seconds):
+    print(f"{name:<28} {seconds / count * 1e6:8.2f}us per amount")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=10000)
+    args = parser.parse_args()
+
+    random.seed(1)
+    for decimals in (18, 6):
+        raws = [random.randrange(10 ** (decimals + 6)) for _ in range(args.count)]
+        texts = format_amounts(raws, decimals)
+        print(f"-- {decimals} decimals")
+        report("Amount.parse", args.count, timeit.timeit(lambda: [Amount.parse(x, decimals) for x in texts], number=1))
+        report("parse_amounts", args.count, timeit.timeit(lambda: parse_amounts(texts, decimals), number=1))
+        report("Amount.format", args.count, timeit.timeit(lambda: [Amount(x, decimals).format() for x in raws], number=1))
+        report("format_amounts", args.count, timeit.timeit(lambda: format_amounts(raws, decimals), number=1))
+        try:
+            (parseUnit, formatUnit) = legacy_units()
+        except ImportError:
+            continue
+        report("parseUnit (legacy)", args.count, timeit.timeit(lambda: [parseUnit(x, decimals) for x in texts], number=1))
+        report("formatUnit (legacy)", args.count, timeit.timeit(lambda: [formatUnit(x, decimals) for x in raws], number=1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Cold start of the read-only CLI against the brownie path for a similar price read.
+
+    python benchmarks/cold_start.py <sellerAddress> <sellToken> <buyToken> <priceFeed> [--network mainnet] [--runs 5]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+
+def measure(cmd, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def report(name, timings):
+    print(f"{name:<10} median {statistics.median(timings):8.0f}ms  min {min(timings):8.0f}ms  max {max(timings):8.0f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("seller")
+    parser.add_argument("sell_token")
+    parser.add_argument("buy_token")
+    parser.add_argument("price_feed")
+    parser.add_argument("--network", default="mainnet")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    readonly = [sys.executable, "-m", "scripts.readonly", "--network", args.network, "price", args.seller]
+    brownie = ["brownie", "run", "--network", args.network, "main", "showTokensPrice", args.sell_token, args.buy_token, args.price_feed]
+    report("readonly", measure(readonly, args.runs))
+    report("brownie", measure(brownie, args.runs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Order-size optimizer against a mock CowSwap quote curve, no network access required.
+
+    python benchmarks/order_sizing.py [--total 1000] [--slices 16] [--latency 0.15]
+
+The mock curve has a fixed gas fee, a proportional fee and a linear price impact,
+the optimizer is compared with an exhaustive sequential search over all the counts.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.order_sizing import QuoteCurve, optimize_split, split_amounts, check_order_amounts, min_buy_amount
+
+E18 = 10**18
+PRICE = 1800 * E18
+MAX_MARGIN = 200
+
+
+def mock_quote(latency, gas_fee=0.02 * E18, fee_bps=5, impact_per_unit=0.00004):
+    def quote(sell_amount):
+        time.sleep(latency)
+        fee = int(gas_fee + sell_amount * fee_bps // 10_000)
+        rate = PRICE / E18 * max(0.0, 1 - impact_per_unit * sell_amount / E18)
+        return (fee, int(max(0, sell_amount - fee) * rate))
+
+    return quote
+
+
+def min_buy(sell_amount):
+    return min_buy_amount(sell_amount, PRICE, MAX_MARGIN, 18, 18)
+
+
+def exhaustive(total, quote, max_slices):
+    best = None
+    requests = 0
+    for count in range(1, max_slices + 1):
+        proceeds = 0
+        for amount in split_amounts(total, count):
+            (fee, buy) = quote(amount)
+            requests += 1
+            if not check_order_amounts(amount, buy, fee, min_buy(amount))[0]:
+                break
+            proceeds += buy
+        else:
+            if best is None or proceeds > best[1]:
+                best = (count, proceeds)
+    return (best, requests)
+
+
+def report(name, elapsed, requests, count, proceeds):
+    result = f"count {count:3}  proceeds {proceeds / E18:.4f}" if count else "no split passes checkOrder"
+    print(f"{name:<11} {elapsed * 1000:8.0f}ms  {requests:4} quotes  {result}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--total", type=int, default=1000, help="total sell amount, in ether")
+    parser.add_argument("--slices", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.15, help="mocked quote API latency, in seconds")
+    args = parser.parse_args()
+    total = args.total * E18
+    quote = mock_quote(args.latency)
+
+    started = time.perf_counter()
+    (best, requests) = exhaustive(total, quote, args.slices)
+    elapsed = time.perf_counter() - started
+    report("exhaustive", elapsed, requests, *(best or (None, None)))
+
+    curve = QuoteCurve(quote)
+    started = time.perf_counter()
+    plan = optimize_split(total, quote, min_buy, max_slices=args.slices, curve=curve)
+    elapsed = time.perf_counter() - started
+    report("optimizer", elapsed, curve.requests, *((plan.count, plan.proceeds) if plan else (None, None)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Micro-benchmark of the price at time lookups of the Chainlink rounds history, no network access required.
+
+    python benchmarks/price_history.py [--rounds 1000000] [--lookups 1000000]
+
+A synthetic history of rounds updated every ~1h is written to a temporary directory and looked up at random times.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.price_history import RoundHistory, make_round_id
+
+START_TIME = 1_600_000_000
+
+
+def report(name, count, seconds):
+    print(f"{name:<28} {count / seconds / 1e6:8.2f}M lookups/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    random.seed(1)
+    with tempfile.TemporaryDirectory() as directory:
+        history = RoundHistory(directory)
+        (updated_at, answer, rounds) = (START_TIME, 10**15, [])
+        for i in range(args.rounds):
+            updated_at += random.randrange(600, 3600)
+            answer += random.randrange(-(10**12), 10**12)
+            rounds.append((make_round_id(1, i + 1), answer, updated_at))
+        started = time.perf_counter()
+        history.add(rounds)
+        print(f"{'write':<28} {time.perf_counter() - started:8.2f}s for {len(history)} rounds")
+
+        times = [random.randrange(START_TIME, updated_at) for _ in range(args.lookups)]
+        started = time.perf_counter()
+        history.price_at(times[0])
+        print(f"{'time index':<28} {time.perf_counter() - started:8.2f}s")
+        started = time.perf_counter()
+        for t in times:
+            history.price_at(t)
+        report("price_at", args.lookups, time.perf_counter() - started)
+        started = time.perf_counter()
+        history.prices_at(times)
+        report("prices_at", args.lookups, time.perf_counter() - started)
+        history.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@
 pragma solidity 0.8.10;
 
 import {OTCSeller} from "./OTCSeller.sol";
+import {OTCSellerWithArgs} from "./OTCSellerWithArgs.sol";
 import {Clones} from "./lib/Clones.sol";
 import {LibTokenPair} from "./lib/LibTokenPair.sol";
 import {IChainlinkPriceFeedV3} from "./interfaces/IChainlinkPriceFeedV3.sol";
@@ -11,12 +12,18 @@ contract OTCFactory {
     event SellerCreated(address indexed token0, address indexed token1, address indexed beneficiary, address pair);
 
     address public immutable implementation;
+    /// @dev The sellers are clones with the beneficiary and pair tokens appended to the code, see OTCSellerWithArgs
+    bool public immutable immutableArgs;
 
     constructor(
         address wethAddress,
-        address daoVaultAddress // address beneficiaryAddress
+        address daoVaultAddress, // address beneficiaryAddress
+        bool withImmutableArgs
     ) {
-        implementation = address(new OTCSeller(wethAddress, daoVaultAddress));
+        immutableArgs = withImmutableArgs;
+        implementation = withImmutableArgs
+            ? address(new OTCSellerWithArgs(wethAddress, daoVaultAddress))
+            : address(new OTCSeller(wethAddress, daoVaultAddress));
     }
 
     function isSellerExists(address seller) public view returns (bool) {
@@ -30,8 +37,7 @@ contract OTCFactory {
         address tokenB
     ) external view returns (address seller) {
         (address token0, address token1) = LibTokenPair.sortTokens(tokenA, tokenB);
-        bytes32 salt = keccak256(abi.encodePacked(beneficiary, token0, token1));
-        seller = Clones.predictDeterministicAddress(implementation, salt, address(this));
+        (seller, , ) = _predictSeller(beneficiary, token0, token1);
     }
 
     /// @dev create the Clone for implementation and initialize it
@@ -44,13 +50,36 @@ contract OTCFactory {
         uint256 constantPrice
     ) external returns (address seller) {
         (address token0, address token1) = LibTokenPair.sortTokens(tokenA, tokenB);
-        bytes32 salt = keccak256(abi.encodePacked(beneficiary, token0, token1));
-        seller = Clones.predictDeterministicAddress(implementation, salt, address(this));
+        bytes memory args;
+        bytes32 salt;
+        (seller, args, salt) = _predictSeller(beneficiary, token0, token1);
 
         require(!isSellerExists(seller), "Seller exists");
 
-        require(seller == Clones.cloneDeterministic(implementation, salt), "Wrong clone address");
+        address clone = immutableArgs ? Clones.cloneDeterministicWithArgs(implementation, args, salt) : Clones.cloneDeterministic(implementation, salt);
+        require(seller == clone, "Wrong clone address");
         OTCSeller(payable(seller)).initialize(beneficiary, tokenA, tokenB, priceFeed, maxMargin, constantPrice);
         emit SellerCreated(token0, token1, beneficiary, seller);
     }
+
+    /// @dev the args are the same for any tokens order, so is the seller address
+    function _predictSeller(
+        address beneficiary,
+        address token0,
+        address token1
+    )
+        internal
+        view
+        returns (
+            address seller,
+            bytes memory args,
+            bytes32 salt
+        )
+    {
+        args = abi.encodePacked(beneficiary, token0, token1);
+        salt = keccak256(args);
+        seller = immutableArgs
+            ? Clones.predictDeterministicAddressWithArgs(implementation, args, salt, address(this))
+            : Clones.predictDeterministicAddress(implementation, salt, address(this));
+    }
 }
@@ -3,9 +3,11 @@
 pragma solidity 0.8.10;
 
 import {Initializable} from "@openzeppelin/contracts/proxy/utils/Initializable.sol";
+import {IERC1271} from "@openzeppelin/contracts/interfaces/IERC1271.sol";
 /// @notice IERC20Metadata is used to support .decimals() method
 import {IERC20Metadata as IERC20} from "@openzeppelin/contracts/token/ERC20/extensions/IERC20Metadata.sol";
 import {SafeERC20} from "@openzeppelin/contracts/token/ERC20/utils/SafeERC20.sol";
+import {SafeCast} from "@openzeppelin/contracts/utils/math/SafeCast.sol";
 
 import {GPv2Order} from "./lib/GPv2Order.sol";
 import {AssetRecoverer} from "./lib/AssetRecoverer.sol";
@@ -16,12 +18,14 @@ import {IVault} from "./interfaces/IVault.sol";
 // import {IOTCFactory} from "./interfaces/IOTCFactory.sol";
 import {IChainlinkPriceFeedV3} from "./interfaces/IChainlinkPriceFeedV3.sol";
 
-contract OTCSeller is Initializable, AssetRecoverer {
+contract OTCSeller is Initializable, AssetRecoverer, IERC1271 {
     using SafeERC20 for IERC20;
     using GPv2Order for GPv2Order.Data;
     using GPv2Order for bytes;
 
     uint16 private constant MAX_BPS = 10_000;
+    /// ERC-1271 magic value of a valid signature, `IERC1271.isValidSignature.selector`
+    bytes4 private constant ERC1271_MAGIC_VALUE = 0x1626ba7e;
 
     /// Contract we give allowance to perform swaps
     /// The addresses are the same in all chains, so we can hardcode it
@@ -32,6 +36,25 @@ contract OTCSeller is Initializable, AssetRecoverer {
     event PairConfigSet(address indexed token0, address indexed token1, PairConfig config);
     event OrderSigned(address indexed caller, bytes orderUid, address sellToken, address buyToken, uint256 sellAmount, uint256 buyAmount);
     event OrderCanceled(address indexed caller, bytes orderUid);
+    event RelayerAllowanceSet(address indexed token, uint256 allowance);
+    event OrderPruned(bytes orderUid);
+
+    // errors
+    error ZeroAddress();
+    error SameTokens();
+    error OnlyFactory();
+    error OnlyBeneficiary();
+    error EthNotAccepted();
+    error WrongToken();
+    error OrderCheckFailed(OrderCheck reason);
+    error OrderHashMismatch();
+    error InsufficientBalance();
+    error OrderAlreadyFilled();
+    error PairConfigNotSet();
+    error PriceNotDefined();
+    error UnexpectedPriceFeedAnswer();
+    error WrongPriceSource();
+    error WrongMaxMargin();
 
     /// WETH or analog address
     address public immutable WETH;
@@ -40,9 +63,21 @@ contract OTCSeller is Initializable, AssetRecoverer {
 
     address public immutable factory;
 
-    address public beneficiary;
-    address public tokenA;
-    address public tokenB;
+    /// @dev The beneficiary shares a slot with the pair maxMargin and direction, as the order checks read them together.
+    /// The beneficiary and sorted pair tokens are read by `_sellerArgs`, as they are not stored by the clones with args.
+    address private _beneficiary;
+    uint16 private _maxMargin;
+    /// @dev tokenA is token1 of the sorted pair
+    bool private _reverse;
+    address private _token0;
+    address private _token1;
+    /// @dev The pair price source in one slot, constantPrice is bounded to uint96
+    address private _priceFeed;
+    uint96 private _constantPrice;
+    /// @dev Registry of the orders signed by `signOrder`, keyed by the order digest,
+    /// the orderUid is rebuilt from the digest, the seller address and validTo
+    bytes32[] private _orderDigests;
+    mapping(bytes32 => OrderEntry) private _orders;
 
     struct PairConfig {
         address priceFeed;
@@ -52,22 +87,59 @@ contract OTCSeller is Initializable, AssetRecoverer {
         uint256 constantPrice;
     }
 
-    PairConfig private _pairConfig;
+    /// @dev Registry entry packed in one slot
+    struct OrderEntry {
+        uint128 sellAmount;
+        uint32 validTo;
+        // index in `_orderDigests` + 1, zero for not registered orders
+        uint64 position;
+    }
+
+    enum OrderStatus {
+        None,
+        Open,
+        // filled or invalidated on the settlement
+        Filled,
+        Expired
+    }
+
+    struct OrderInfo {
+        bytes orderUid;
+        uint256 sellAmount;
+        uint32 validTo;
+        uint256 filledAmount;
+        OrderStatus status;
+    }
+
+    /// @dev Order check results, `checkOrder` returns them as the reason strings for off-chain callers
+    enum OrderCheck {
+        Ok,
+        UnsupportedPair,
+        ValidToInPast,
+        WrongReceiver,
+        PartiallyFillable,
+        WrongKind,
+        WrongSellTokenBalance,
+        WrongBuyTokenBalance,
+        OrderUidMismatch,
+        FeeTooHigh,
+        BuyAmountTooLow
+    }
 
     constructor(address wethAddress, address daoVaultAddress) {
-        require(wethAddress != address(0) && daoVaultAddress != address(0), "Zero address");
+        if (wethAddress == address(0) || daoVaultAddress == address(0)) revert ZeroAddress();
         WETH = wethAddress;
         DAO_VAULT = daoVaultAddress;
         factory = msg.sender;
     }
 
     modifier onlyFactory() {
-        require(msg.sender == factory, "Only factory can call");
+        if (msg.sender != factory) revert OnlyFactory();
         _;
     }
 
     modifier onlyBeneficiary() {
-        require(msg.sender == beneficiary, "Only beneficiary can call");
+        _checkBeneficiary();
         _;
     }
 
@@ -75,20 +147,20 @@ contract OTCSeller is Initializable, AssetRecoverer {
     ///         i.e., in the case of selling ETH for DAI, the sellToken must be set to DAI,
     ///         as the chainlink price feed returns the ETH amount for 1DAI
     function initialize(
-        address _beneficiary,
-        address _tokenA,
-        address _tokenB,
+        address beneficiary_,
+        address tokenA_,
+        address tokenB_,
         address priceFeed,
         uint16 maxMargin,
         uint256 constantPrice
     ) external initializer onlyFactory {
         /// @notice contract works only with ERC20 compatible tokens
-        require(_tokenA != address(0) && _tokenB != address(0) && _beneficiary != address(0), "Zero address");
-        require(_tokenA != _tokenB, "tokenA and tokenB must be different");
+        if (tokenA_ == address(0) || tokenB_ == address(0) || beneficiary_ == address(0)) revert ZeroAddress();
+        if (tokenA_ == tokenB_) revert SameTokens();
 
-        beneficiary = _beneficiary;
-        tokenA = _tokenA;
-        tokenB = _tokenB;
+        (address token0, address token1) = LibTokenPair.sortTokens(tokenA_, tokenB_);
+        _setSellerArgs(beneficiary_, token0, token1);
+        _reverse = token0 != tokenA_;
 
         _setPairConfig(priceFeed, maxMargin, constantPrice);
     }
@@ -96,7 +168,7 @@ contract OTCSeller is Initializable, AssetRecoverer {
     /// @dev allow contract to receive ETH
     /// @notice all received ETH are converted to WETH due to CowSwap only works with WETH
     receive() external payable {
-        require(tokenA == WETH || tokenB == WETH, "ETH not accepted");
+        if (!_isPairToken(WETH)) revert EthNotAccepted();
         // wrap all income ETH to WETH
         IWETH(WETH).deposit{value: msg.value}();
     }
@@ -105,8 +177,23 @@ contract OTCSeller is Initializable, AssetRecoverer {
         revert();
     }
 
+    function beneficiary() public view returns (address beneficiary_) {
+        (beneficiary_, , ) = _sellerArgs();
+    }
+
+    /// @dev Base token of the price feed
+    function tokenA() public view returns (address) {
+        (, address token0, address token1) = _sellerArgs();
+        return _reverse ? token1 : token0;
+    }
+
+    function tokenB() public view returns (address) {
+        (, address token0, address token1) = _sellerArgs();
+        return _reverse ? token0 : token1;
+    }
+
     function getPairConfig() external view returns (PairConfig memory) {
-        return _pairConfig;
+        return PairConfig(_priceFeed, _maxMargin, _reverse, _constantPrice);
     }
 
     function setPairConfig(
@@ -118,21 +205,16 @@ contract OTCSeller is Initializable, AssetRecoverer {
     }
 
     function priceAndMaxMargin() external view returns (uint256 price, uint16 maxMargin) {
-        return _getPriceAndMaxMargin(tokenA, tokenB);
+        return _getPriceAndMaxMargin(tokenA(), tokenB());
     }
 
     function reversePriceAndMaxMargin() external view returns (uint256 price, uint16 maxMargin) {
-        return _getPriceAndMaxMargin(tokenB, tokenA);
+        return _getPriceAndMaxMargin(tokenB(), tokenA());
     }
 
     /// @dev Calculates OrderUid from Order Data
     function getOrderUid(GPv2Order.Data calldata orderData) public view returns (bytes memory) {
-        // Allocated
-        bytes memory orderUid = new bytes(GPv2Order.UID_LENGTH);
-        // Get the hash
-        bytes32 digest = GPv2Order.hash(orderData, IGPv2Settlement(GP_V2_SETTLEMENT).domainSeparator());
-        GPv2Order.packOrderUidParams(orderUid, digest, address(this), orderData.validTo);
-        return orderUid;
+        return _getOrderUid(orderData);
     }
 
     /// @dev Get min acceptable amount to buy (according priceFeed and maxMargin)
@@ -153,43 +235,55 @@ contract OTCSeller is Initializable, AssetRecoverer {
     /// @dev General order data checks.
     /// @notice The receiver must be a "beneficiary" to avoid the purchased tokens appearing on the contract address
     function checkOrder(GPv2Order.Data calldata orderData, bytes calldata orderUid) public view returns (bool success, string memory result) {
-        result = _checkTokensPair(address(orderData.sellToken), address(orderData.buyToken));
-        if (bytes(result).length > 0) return (false, result);
-        result = _checkOrderParams(orderData);
-        if (bytes(result).length > 0) return (false, result);
-
-        // Verify we get the same ID
-        bytes memory derivedOrderID = getOrderUid(orderData);
-        if (keccak256(derivedOrderID) != keccak256(orderUid)) {
-            return (false, "orderUid mismatch");
-        }
+        OrderCheck check = _checkOrder(orderData, orderUid);
+        return (check == OrderCheck.Ok, _orderCheckMessage(check));
+    }
 
-        if (orderData.feeAmount > orderData.sellAmount / 10) {
-            // Fee can be at most 1/10th of order
-            return (false, "Order fee to high");
-        }
+    /// @dev ERC-1271 signature check, called by GPv2Settlement for orders created with the `eip1271` signing scheme.
+    /// The signature is the ABI encoded order data, it's valid when the order digest matches `hash`
+    /// and the order passes the same rules as `checkOrder`, so such orders need no `signOrder` transaction.
+    /// @notice The total amount sold this way is bounded by the relayer allowance added by the beneficiary with `increaseRelayerAllowance`
+    function isValidSignature(bytes32 hash, bytes memory signature) external view override returns (bytes4 magicValue) {
+        GPv2Order.Data memory orderData = abi.decode(signature, (GPv2Order.Data));
+        if (orderData.hash(IGPv2Settlement(GP_V2_SETTLEMENT).domainSeparator()) != hash) revert OrderHashMismatch();
+
+        OrderCheck check = _checkOrderParams(orderData);
+        if (check == OrderCheck.Ok) check = _checkOrderAmounts(orderData);
+        if (check != OrderCheck.Ok) revert OrderCheckFailed(check);
+        return ERC1271_MAGIC_VALUE;
+    }
 
-        uint256 minAcceptableBuyAmount = minBuyAmount(orderData.sellToken, orderData.buyToken, orderData.sellAmount);
+    /// @dev Adds `amount` to the GPv2 vault relayer allowance of the pair token, that is the amount available to `eip1271` orders
+    /// @notice Can be called only by beneficiary. The allowance is shared with the presigned orders, `signOrder` adds their
+    /// sell amount to it, so it's changed by a delta and never overwritten, not to break the settlement of outstanding orders
+    function increaseRelayerAllowance(address token, uint256 amount) external onlyBeneficiary {
+        if (!_isPairToken(token)) revert WrongToken();
+        IERC20(token).safeIncreaseAllowance(GP_V2_VAULT_RELAYER, amount);
+        emit RelayerAllowanceSet(token, IERC20(token).allowance(address(this), GP_V2_VAULT_RELAYER));
+    }
 
-        // Require that Cowswap is offering a better price or matching
-        if (minAcceptableBuyAmount > orderData.buyAmount) {
-            return (false, "buyAmount too low");
-        }
-        return (true, "");
+    /// @dev Takes back `amount` of the relayer allowance added by `increaseRelayerAllowance`
+    /// @notice Can be called only by beneficiary. Decreasing it below the sell amount of the outstanding presigned orders
+    /// makes them unfillable, reverts when `amount` exceeds the allowance
+    function decreaseRelayerAllowance(address token, uint256 amount) external onlyBeneficiary {
+        if (!_isPairToken(token)) revert WrongToken();
+        IERC20(token).safeDecreaseAllowance(GP_V2_VAULT_RELAYER, amount);
+        emit RelayerAllowanceSet(token, IERC20(token).allowance(address(this), GP_V2_VAULT_RELAYER));
     }
 
     /// @dev Function to perform a swap on Cowswap via this smart contract
     /// @notice Can be called by anyone
     function signOrder(GPv2Order.Data calldata orderData, bytes calldata orderUid) external payable {
-        (bool checked, string memory result) = checkOrder(orderData, orderUid);
-        require(checked, result);
+        OrderCheck check = _checkOrder(orderData, orderUid);
+        if (check != OrderCheck.Ok) revert OrderCheckFailed(check);
 
         // check balance
-        require(orderData.sellToken.balanceOf(address(this)) >= orderData.sellAmount, "Insufficient sell token balance");
+        if (orderData.sellToken.balanceOf(address(this)) < orderData.sellAmount) revert InsufficientBalance();
 
         orderData.sellToken.safeIncreaseAllowance(GP_V2_VAULT_RELAYER, orderData.sellAmount);
         // setPresignature to order will happen
         IGPv2Settlement(GP_V2_SETTLEMENT).setPreSignature(orderUid, true);
+        _registerOrder(orderUid, orderData.sellAmount, orderData.validTo);
 
         emit OrderSigned(msg.sender, orderUid, address(orderData.sellToken), address(orderData.buyToken), orderData.sellAmount, orderData.buyAmount);
     }
@@ -200,25 +294,78 @@ contract OTCSeller is Initializable, AssetRecoverer {
         _checkBeneficiary();
 
         uint256 soldAmount = IGPv2Settlement(GP_V2_SETTLEMENT).filledAmount(orderUid);
-        require(soldAmount == 0, "Order already filled");
+        if (soldAmount != 0) revert OrderAlreadyFilled();
 
         // reset setPresignature
         IGPv2Settlement(GP_V2_SETTLEMENT).setPreSignature(orderUid, false);
+        // invalidate the order, as `eip1271` orders stay valid without a presignature
+        IGPv2Settlement(GP_V2_SETTLEMENT).invalidateOrder(orderUid);
+        (bytes32 digest, , ) = orderUid.extractOrderUidParams();
+        if (_orders[digest].position != 0) _removeOrder(digest);
 
         emit OrderCanceled(msg.sender, orderUid);
     }
 
+    /// @dev Number of the registered orders, including the expired and filled ones not pruned yet
+    function ordersCount() external view returns (uint256) {
+        return _orderDigests.length;
+    }
+
+    /// @dev Registry entry of the order signed by `signOrder`, the status is None for not registered or pruned orders
+    function getOrder(bytes calldata orderUid) external view returns (OrderInfo memory order) {
+        (bytes32 digest, , ) = orderUid.extractOrderUidParams();
+        if (_orders[digest].position != 0) order = _getOrderInfo(digest);
+    }
+
+    /// @dev Open orders among the registry entries [offset, offset + limit), with their settlement filledAmount.
+    /// The registry is scanned page by page until `next` equals `ordersCount()`.
+    /// @notice Orders signed with the `eip1271` scheme are not registered, as they need no `signOrder` transaction
+    function getActiveOrders(uint256 offset, uint256 limit) external view returns (OrderInfo[] memory orders, uint256 next) {
+        uint256 count = _orderDigests.length;
+        if (offset >= count) return (new OrderInfo[](0), count);
+        next = limit < count - offset ? offset + limit : count;
+
+        orders = new OrderInfo[](next - offset);
+        uint256 found;
+        for (uint256 i = offset; i < next; ++i) {
+            OrderInfo memory order = _getOrderInfo(_orderDigests[i]);
+            if (order.status == OrderStatus.Open) orders[found++] = order;
+        }
+        // shrink the array to the found orders
+        assembly {
+            mstore(orders, found)
+        }
+    }
+
+    /// @dev Removes the expired and filled orders among `limit` registry entries starting at `offset`
+    /// @notice Can be called by anyone
+    function pruneOrders(uint256 offset, uint256 limit) external returns (uint256 pruned) {
+        uint256 i = offset;
+        for (uint256 checked; checked < limit && i < _orderDigests.length; ++checked) {
+            bytes32 digest = _orderDigests[i];
+            OrderInfo memory order = _getOrderInfo(digest);
+            if (order.status == OrderStatus.Open) {
+                ++i;
+            } else {
+                // the last entry is moved to `i`, so it's checked next
+                _removeOrder(digest);
+                emit OrderPruned(order.orderUid);
+                ++pruned;
+            }
+        }
+    }
+
     /// @notice Can be called by anyone except case when token is sellToken or buyToken
     function transferERC20(address token, uint256 amount) external {
-        if (token == tokenA || token == tokenB) {
+        if (_isPairToken(token)) {
             _checkBeneficiary();
         }
-        _transferERC20(token, beneficiary, amount);
+        _transferERC20(token, beneficiary(), amount);
     }
 
     /// @notice Can be called by anyone
     function transferEther(uint256 amount) external {
-        _transferEther(beneficiary, amount);
+        _transferEther(beneficiary(), amount);
     }
 
     /// @notice Can be called by anyone
@@ -227,8 +374,8 @@ contract OTCSeller is Initializable, AssetRecoverer {
         uint256 tokenId,
         bytes calldata data
     ) external {
-        require(token != tokenA && token != tokenB, "Wrong token address");
-        _transferERC721(token, beneficiary, tokenId, data);
+        if (_isPairToken(token)) revert WrongToken();
+        _transferERC721(token, beneficiary(), tokenId, data);
     }
 
     /// @notice Can be called by anyone
@@ -238,8 +385,8 @@ contract OTCSeller is Initializable, AssetRecoverer {
         uint256 amount,
         bytes calldata data
     ) external {
-        require(token != tokenA && token != tokenB, "Wrong token address");
-        _transferERC1155(token, beneficiary, tokenId, amount, data);
+        if (_isPairToken(token)) revert WrongToken();
+        _transferERC1155(token, beneficiary(), tokenId, amount, data);
     }
 
     function _transferERC20(
@@ -256,48 +403,162 @@ contract OTCSeller is Initializable, AssetRecoverer {
         }
     }
 
+    /// @dev Beneficiary and sorted pair tokens, set once by `initialize`
+    function _sellerArgs()
+        internal
+        view
+        virtual
+        returns (
+            address beneficiary_,
+            address token0,
+            address token1
+        )
+    {
+        return (_beneficiary, _token0, _token1);
+    }
+
+    function _setSellerArgs(
+        address beneficiary_,
+        address token0,
+        address token1
+    ) internal virtual {
+        _beneficiary = beneficiary_;
+        _token0 = token0;
+        _token1 = token1;
+    }
+
+    function _registerOrder(
+        bytes calldata orderUid,
+        uint256 sellAmount,
+        uint32 validTo
+    ) internal {
+        bytes32 digest = bytes32(orderUid[:32]);
+        // the same order can be signed again, e.g. after the seller refill
+        if (_orders[digest].position != 0) return;
+        _orderDigests.push(digest);
+        _orders[digest] = OrderEntry(SafeCast.toUint128(sellAmount), validTo, uint64(_orderDigests.length));
+    }
+
+    /// @dev Swaps the entry with the last one and pops it
+    function _removeOrder(bytes32 digest) internal {
+        uint256 index = _orders[digest].position - 1;
+        uint256 lastIndex = _orderDigests.length - 1;
+        if (index != lastIndex) {
+            bytes32 lastDigest = _orderDigests[lastIndex];
+            _orderDigests[index] = lastDigest;
+            _orders[lastDigest].position = uint64(index + 1);
+        }
+        _orderDigests.pop();
+        delete _orders[digest];
+    }
+
+    function _getOrderInfo(bytes32 digest) internal view returns (OrderInfo memory order) {
+        OrderEntry memory entry = _orders[digest];
+        order.orderUid = new bytes(GPv2Order.UID_LENGTH);
+        GPv2Order.packOrderUidParams(order.orderUid, digest, address(this), entry.validTo);
+        order.sellAmount = entry.sellAmount;
+        order.validTo = entry.validTo;
+        order.filledAmount = IGPv2Settlement(GP_V2_SETTLEMENT).filledAmount(order.orderUid);
+        if (order.filledAmount >= entry.sellAmount) {
+            order.status = OrderStatus.Filled;
+        } else if (entry.validTo <= block.timestamp) {
+            order.status = OrderStatus.Expired;
+        } else {
+            order.status = OrderStatus.Open;
+        }
+    }
+
+    function _isPairToken(address token) internal view returns (bool) {
+        (, address token0, address token1) = _sellerArgs();
+        return token == token0 || token == token1;
+    }
+
     function _checkBeneficiary() internal view {
-        require(msg.sender == beneficiary, "Only beneficiary has access");
+        if (msg.sender != beneficiary()) revert OnlyBeneficiary();
     }
 
-    function _checkTokensPair(address sellToken, address buyToken) internal view returns (string memory resut) {
-        address _sellToken = tokenA;
-        address _buyToken = tokenB;
-        if (!(sellToken == _sellToken && buyToken == _buyToken) && !(sellToken == _buyToken && buyToken == _sellToken)) return "Unsupported tokens pair";
+    function _getOrderUid(GPv2Order.Data memory orderData) internal view returns (bytes memory orderUid) {
+        // Allocated
+        orderUid = new bytes(GPv2Order.UID_LENGTH);
+        // Get the hash
+        bytes32 digest = orderData.hash(IGPv2Settlement(GP_V2_SETTLEMENT).domainSeparator());
+        GPv2Order.packOrderUidParams(orderUid, digest, address(this), orderData.validTo);
     }
 
-    function _checkOrderParams(GPv2Order.Data calldata orderData) internal view returns (string memory resut) {
-        if (orderData.validTo <= block.timestamp) return "validTo in the past";
-        if (orderData.receiver != beneficiary) return "Wrong receiver";
-        if (orderData.partiallyFillable == true) return "Partially fill not allowed";
-        if (orderData.kind != GPv2Order.KIND_SELL) return "Wrong order kind";
+    /// @dev The order data is copied to memory once for all the checks
+    function _checkOrder(GPv2Order.Data calldata orderData, bytes calldata orderUid) internal view returns (OrderCheck check) {
+        GPv2Order.Data memory order = orderData;
+        check = _checkOrderParams(order);
+        if (check != OrderCheck.Ok) return check;
+
+        // Verify we get the same ID
+        if (keccak256(_getOrderUid(order)) != keccak256(orderUid)) return OrderCheck.OrderUidMismatch;
+
+        return _checkOrderAmounts(order);
+    }
+
+    function _checkOrderParams(GPv2Order.Data memory orderData) internal view returns (OrderCheck) {
+        (address beneficiary_, address token0, address token1) = _sellerArgs();
+        address sellToken = address(orderData.sellToken);
+        address buyToken = address(orderData.buyToken);
+        if (!(sellToken == token0 && buyToken == token1) && !(sellToken == token1 && buyToken == token0)) return OrderCheck.UnsupportedPair;
+
+        if (orderData.validTo <= block.timestamp) return OrderCheck.ValidToInPast;
+        if (orderData.receiver != beneficiary_) return OrderCheck.WrongReceiver;
+        if (orderData.partiallyFillable) return OrderCheck.PartiallyFillable;
+        if (orderData.kind != GPv2Order.KIND_SELL) return OrderCheck.WrongKind;
 
         //Check the TokenBalance marker value for using direct ERC20 balances for computing the order struct hash.
-        if (orderData.sellTokenBalance != GPv2Order.BALANCE_ERC20) return "Wrong order sellTokenBalance marker";
-        if (orderData.buyTokenBalance != GPv2Order.BALANCE_ERC20) return "Wrong order buyTokenBalance marker";
+        if (orderData.sellTokenBalance != GPv2Order.BALANCE_ERC20) return OrderCheck.WrongSellTokenBalance;
+        if (orderData.buyTokenBalance != GPv2Order.BALANCE_ERC20) return OrderCheck.WrongBuyTokenBalance;
+        return OrderCheck.Ok;
+    }
+
+    function _checkOrderAmounts(GPv2Order.Data memory orderData) internal view returns (OrderCheck) {
+        // Fee can be at most 1/10th of order
+        if (orderData.feeAmount > orderData.sellAmount / 10) return OrderCheck.FeeTooHigh;
+
+        // Require that Cowswap is offering a better price or matching
+        if (minBuyAmount(orderData.sellToken, orderData.buyToken, orderData.sellAmount) > orderData.buyAmount) return OrderCheck.BuyAmountTooLow;
+        return OrderCheck.Ok;
+    }
+
+    /// @dev Reason strings of the `checkOrder` view, kept for off-chain callers
+    function _orderCheckMessage(OrderCheck check) internal pure returns (string memory) {
+        if (check == OrderCheck.Ok) return "";
+        if (check == OrderCheck.UnsupportedPair) return "Unsupported tokens pair";
+        if (check == OrderCheck.ValidToInPast) return "validTo in the past";
+        if (check == OrderCheck.WrongReceiver) return "Wrong receiver";
+        if (check == OrderCheck.PartiallyFillable) return "Partially fill not allowed";
+        if (check == OrderCheck.WrongKind) return "Wrong order kind";
+        if (check == OrderCheck.WrongSellTokenBalance) return "Wrong order sellTokenBalance marker";
+        if (check == OrderCheck.WrongBuyTokenBalance) return "Wrong order buyTokenBalance marker";
+        if (check == OrderCheck.OrderUidMismatch) return "orderUid mismatch";
+        if (check == OrderCheck.FeeTooHigh) return "Order fee to high";
+        return "buyAmount too low";
     }
 
     function _getPriceAndMaxMargin(address sellToken, address buyToken) internal view returns (uint256 price, uint16 maxMargin) {
-        (address token0, address token1) = LibTokenPair.sortTokens(sellToken, buyToken);
+        (address token0, ) = LibTokenPair.sortTokens(sellToken, buyToken);
         // (price, maxMargin) = IOTCFactory(factory).getPriceAndMaxMargin(sellToken, buyToken);
-        PairConfig memory config = _pairConfig;
-        require(config.priceFeed != address(0) || config.constantPrice != 0, "Pair config not set");
-
-        maxMargin = config.maxMargin;
+        maxMargin = _maxMargin;
 
         // if the requested tokens order is opposite to sorted order and in the same time
         // the priceFeed is also match the reverse sorted order, return direct (not reverse) price
-        bool reverse = (token0 != sellToken) != config.reverse;
+        bool reverse = (token0 != sellToken) != _reverse;
 
         // constantPrice has priority
-        if (config.constantPrice > 0) {
-            price = reverse ? 10**36 / config.constantPrice : config.constantPrice;
+        uint256 constantPrice = _constantPrice;
+        if (constantPrice > 0) {
+            price = reverse ? 10**36 / constantPrice : constantPrice;
         } else {
+            address priceFeed = _priceFeed;
+            if (priceFeed == address(0)) revert PairConfigNotSet();
             // get Chainlink price
-            price = _getChainlinkPrice(config.priceFeed, reverse);
+            price = _getChainlinkPrice(priceFeed, reverse);
         }
-        require(price > 0, "price not defined");
-        require(maxMargin > 0, "maxMargin not defined");
+        if (price == 0) revert PriceNotDefined();
+        if (maxMargin == 0) revert PairConfigNotSet();
     }
 
     /// @dev Returns the normalized price from Chainlink price feed
@@ -305,7 +566,7 @@ contract OTCSeller is Initializable, AssetRecoverer {
         IChainlinkPriceFeedV3 _priceFeed = IChainlinkPriceFeedV3(priceFeed);
         uint256 decimals = _priceFeed.decimals();
         (, int256 price, , uint256 updatedAt, ) = _priceFeed.latestRoundData();
-        require(updatedAt != 0, "Unexpected price feed answer");
+        if (updatedAt == 0) revert UnexpectedPriceFeedAnswer();
         // normilize chainlink price to 18 decimals
         return reverse ? (10**(18 + decimals)) / uint256(price) : uint256(price) * (10**(18 - decimals));
     }
@@ -315,14 +576,16 @@ contract OTCSeller is Initializable, AssetRecoverer {
         uint16 maxMargin,
         uint256 constantPrice
     ) internal {
-        require(priceFeed != address(0) || constantPrice > 0, "either priceFeed or constantPrice is required");
-        require(maxMargin > 0 && maxMargin <= 500, "maxMargin too high or not set");
-        (address token0, address token1) = LibTokenPair.sortTokens(tokenA, tokenB);
-
-        bool reverse = token0 != tokenA;
-        PairConfig memory config = PairConfig(priceFeed, maxMargin, reverse, constantPrice);
-
-        _pairConfig = config;
-        emit PairConfigSet(token0, token1, config);
+        // either priceFeed or constantPrice is required
+        if ((priceFeed == address(0) && constantPrice == 0) || constantPrice > type(uint96).max) revert WrongPriceSource();
+        if (maxMargin == 0 || maxMargin > 500) revert WrongMaxMargin();
+        (, address token0, address token1) = _sellerArgs();
+
+        // the pair direction is set once by initialize
+        bool reverse = _reverse;
+        _maxMargin = maxMargin;
+        _priceFeed = priceFeed;
+        _constantPrice = uint96(constantPrice);
+        emit PairConfigSet(token0, token1, PairConfig(priceFeed, maxMargin, reverse, constantPrice));
     }
 }
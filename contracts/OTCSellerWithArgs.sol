@@ -0,0 +1,50 @@
+// SPDX-FileCopyrightText: 2022 Lido <info@lido.fi>
+// SPDX-License-Identifier: MIT
+pragma solidity 0.8.10;
+
+import {OTCSeller} from "./OTCSeller.sol";
+
+/// @dev OTCSeller implementation for clones with the immutable args appended to the clone code
+/// (see `Clones.cloneDeterministicWithArgs`): beneficiary and sorted pair tokens are read by `extcodecopy`
+/// instead of the storage, only the mutable pair config is stored.
+contract OTCSellerWithArgs is OTCSeller {
+    /// EIP-1167 runtime code length, the args follow it
+    uint256 private constant ARGS_OFFSET = 0x2d;
+    /// abi.encodePacked(beneficiary, token0, token1)
+    uint256 private constant ARGS_LENGTH = 60;
+
+    error WrongSellerArgs();
+
+    constructor(address wethAddress, address daoVaultAddress) OTCSeller(wethAddress, daoVaultAddress) {}
+
+    function _sellerArgs()
+        internal
+        view
+        override
+        returns (
+            address beneficiary_,
+            address token0,
+            address token1
+        )
+    {
+        /// @solidity memory-safe-assembly
+        assembly {
+            // the free memory is used as a scratch space, it's not allocated
+            let ptr := mload(0x40)
+            extcodecopy(address(), ptr, ARGS_OFFSET, ARGS_LENGTH)
+            beneficiary_ := shr(96, mload(ptr))
+            token0 := shr(96, mload(add(ptr, 20)))
+            token1 := shr(96, mload(add(ptr, 40)))
+        }
+    }
+
+    /// @dev The args are set on the clone deploy, the initialize ones must match them
+    function _setSellerArgs(
+        address beneficiary_,
+        address token0,
+        address token1
+    ) internal view override {
+        (address argsBeneficiary, address argsToken0, address argsToken1) = _sellerArgs();
+        if (beneficiary_ != argsBeneficiary || token0 != argsToken0 || token1 != argsToken1) revert WrongSellerArgs();
+    }
+}
@@ -14,4 +14,7 @@ interface IGPv2Settlement {
     function domainSeparator() external view returns (bytes32);
 
     function filledAmount(bytes calldata orderUid) external view returns (uint256);
+
+    /// @dev Invalidates the specified order UID, so it can't be filled anymore.
+    function invalidateOrder(bytes calldata orderUid) external;
 }
@@ -83,4 +83,52 @@ library Clones {
     function predictDeterministicAddress(address implementation, bytes32 salt) internal view returns (address predicted) {
         return predictDeterministicAddress(implementation, salt, address(this));
     }
+
+    /**
+     * @dev Creation code of a clone with `args` appended to the EIP-1167 runtime code.
+     * The clone runtime is unchanged, the implementation reads the args by `extcodecopy` of `address(this)`.
+     */
+    function initCodeWithArgs(address implementation, bytes memory args) internal pure returns (bytes memory) {
+        // the runtime and args length is pushed by PUSH1
+        require(args.length <= 0xff - 0x2d, "ERC1167: args too long");
+        return
+            abi.encodePacked(
+                hex"3d60",
+                uint8(0x2d + args.length),
+                hex"80600a3d3981f3363d3d373d3d3d363d73",
+                implementation,
+                hex"5af43d82803e903d91602b57fd5bf3",
+                args
+            );
+    }
+
+    /**
+     * @dev Deploys and returns the address of a clone of `implementation` with `args` appended to its code,
+     * using create2 and a `salt` as {Clones-cloneDeterministic}.
+     */
+    function cloneDeterministicWithArgs(
+        address implementation,
+        bytes memory args,
+        bytes32 salt
+    ) internal returns (address instance) {
+        bytes memory code = initCodeWithArgs(implementation, args);
+        /// @solidity memory-safe-assembly
+        assembly {
+            instance := create2(0, add(code, 0x20), mload(code), salt)
+        }
+        require(instance != address(0), "ERC1167: create2 failed");
+    }
+
+    /**
+     * @dev Computes the address of a clone deployed using {Clones-cloneDeterministicWithArgs}.
+     */
+    function predictDeterministicAddressWithArgs(
+        address implementation,
+        bytes memory args,
+        bytes32 salt,
+        address deployer
+    ) internal pure returns (address predicted) {
+        bytes32 hash = keccak256(abi.encodePacked(bytes1(0xff), deployer, salt, keccak256(initCodeWithArgs(implementation, args))));
+        predicted = address(uint160(uint256(hash)));
+    }
 }
@@ -0,0 +1,81 @@
+// SPDX-FileCopyrightText: 2022 Lido <info@lido.fi>
+// SPDX-License-Identifier: MIT
+pragma solidity 0.8.10;
+
+/// @dev Chainlink aggregator with rounds set by tests, for local chain tests only
+contract MockChainlinkFeed {
+    struct Round {
+        int256 answer;
+        uint256 startedAt;
+        uint256 updatedAt;
+    }
+
+    event AnswerUpdated(int256 indexed current, uint256 indexed roundId, uint256 updatedAt);
+
+    uint8 public immutable decimals;
+    string public description;
+    uint80 public latestRound;
+
+    mapping(uint80 => Round) private _rounds;
+
+    constructor(
+        uint8 decimals_,
+        string memory description_,
+        int256 initialAnswer
+    ) {
+        decimals = decimals_;
+        description = description_;
+        setAnswer(initialAnswer);
+    }
+
+    /// @dev Starts the next round with the answer updated at the current block
+    function setAnswer(int256 answer) public {
+        setRound(latestRound + 1, answer, block.timestamp);
+    }
+
+    /// @dev Sets any round, the latest round is moved forward when `roundId` is above it
+    function setRound(
+        uint80 roundId,
+        int256 answer,
+        uint256 updatedAt
+    ) public {
+        _rounds[roundId] = Round(answer, updatedAt, updatedAt);
+        if (roundId > latestRound) {
+            latestRound = roundId;
+        }
+        emit AnswerUpdated(answer, roundId, updatedAt);
+    }
+
+    function latestAnswer() external view returns (int256) {
+        return _rounds[latestRound].answer;
+    }
+
+    function latestRoundData()
+        external
+        view
+        returns (
+            uint80 roundId,
+            int256 answer,
+            uint256 startedAt,
+            uint256 updatedAt,
+            uint80 answeredInRound
+        )
+    {
+        return getRoundData(latestRound);
+    }
+
+    function getRoundData(uint80 roundId)
+        public
+        view
+        returns (
+            uint80,
+            int256 answer,
+            uint256 startedAt,
+            uint256 updatedAt,
+            uint80
+        )
+    {
+        Round memory round = _rounds[roundId];
+        return (roundId, round.answer, round.startedAt, round.updatedAt, roundId);
+    }
+}
@@ -0,0 +1,53 @@
+// SPDX-FileCopyrightText: 2022 Lido <info@lido.fi>
+// SPDX-License-Identifier: MIT
+pragma solidity 0.8.10;
+
+/// @dev GPv2Settlement presign, filled amounts and trade events, for local chain tests only.
+/// The runtime code is placed at the mainnet settlement address, so it doesn't rely on constructor set storage.
+contract MockGPv2Settlement {
+    bytes32 private constant DOMAIN_TYPE_HASH = keccak256("EIP712Domain(string name,string version,uint256 chainId,address verifyingContract)");
+    bytes32 private constant DOMAIN_NAME = keccak256("Gnosis Protocol");
+    bytes32 private constant DOMAIN_VERSION = keccak256("v2");
+    uint256 private constant PRE_SIGNED = uint256(keccak256("GPv2Signing.Scheme.PreSign"));
+    uint256 private constant UID_LENGTH = 56;
+
+    event PreSignature(address indexed owner, bytes orderUid, bool signed);
+    event Trade(address indexed owner, address sellToken, address buyToken, uint256 sellAmount, uint256 buyAmount, uint256 feeAmount, bytes orderUid);
+
+    mapping(bytes => uint256) public preSignature;
+    mapping(bytes => uint256) public filledAmount;
+
+    function domainSeparator() public view returns (bytes32) {
+        return keccak256(abi.encode(DOMAIN_TYPE_HASH, DOMAIN_NAME, DOMAIN_VERSION, block.chainid, address(this)));
+    }
+
+    function setPreSignature(bytes calldata orderUid, bool signed) external {
+        require(orderUid.length == UID_LENGTH, "GPv2: invalid uid");
+        require(_owner(orderUid) == msg.sender, "GPv2: cannot presign order");
+        preSignature[orderUid] = signed ? PRE_SIGNED : 0;
+        emit PreSignature(msg.sender, orderUid, signed);
+    }
+
+    function invalidateOrder(bytes calldata orderUid) external {
+        require(_owner(orderUid) == msg.sender, "GPv2: caller does not own order");
+        filledAmount[orderUid] = type(uint256).max;
+    }
+
+    /// @dev Simulates a solver settlement of the presigned order without moving tokens
+    function trade(
+        bytes calldata orderUid,
+        address sellToken,
+        address buyToken,
+        uint256 sellAmount,
+        uint256 buyAmount,
+        uint256 feeAmount
+    ) external {
+        require(preSignature[orderUid] == PRE_SIGNED, "GPv2: order not presigned");
+        filledAmount[orderUid] += sellAmount;
+        emit Trade(_owner(orderUid), sellToken, buyToken, sellAmount, buyAmount, feeAmount, orderUid);
+    }
+
+    function _owner(bytes calldata orderUid) private pure returns (address owner) {
+        owner = address(bytes20(orderUid[32:52]));
+    }
+}
@@ -0,0 +1,31 @@
+// SPDX-FileCopyrightText: 2022 Lido <info@lido.fi>
+// SPDX-License-Identifier: MIT
+pragma solidity 0.8.10;
+
+import {IERC20} from "@openzeppelin/contracts/token/ERC20/IERC20.sol";
+import {SafeERC20} from "@openzeppelin/contracts/token/ERC20/utils/SafeERC20.sol";
+
+/// @dev Aragon Agent (Vault) deposit analog, for local chain tests only
+contract MockVault {
+    using SafeERC20 for IERC20;
+
+    event VaultDeposit(address indexed token, address indexed sender, uint256 amount);
+
+    receive() external payable {
+        emit VaultDeposit(address(0), msg.sender, msg.value);
+    }
+
+    function deposit(address _token, uint256 _value) external payable {
+        require(_value > 0, "VAULT_DEPOSIT_VALUE_ZERO");
+        if (_token == address(0)) {
+            require(msg.value == _value, "VAULT_VALUE_MISMATCH");
+        } else {
+            IERC20(_token).safeTransferFrom(msg.sender, address(this), _value);
+        }
+        emit VaultDeposit(_token, msg.sender, _value);
+    }
+
+    function balance(address _token) external view returns (uint256) {
+        return _token == address(0) ? address(this).balance : IERC20(_token).balanceOf(address(this));
+    }
+}
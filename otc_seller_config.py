@@ -5,3 +5,23 @@ MAX_MARGIN = 200  # 2%
 # constant price can be set when no pricefeed for pair exists
 # in that case PRICE_FEED should be set to zero address
 CONST_PRICE = 0
+
+# order manager daemon (scripts/daemon.py) policy limits
+# max sell amount per order by sell token address, in human readable format
+# orders for sell tokens not listed here are rejected
+DAEMON_MAX_SELL_AMOUNT = {
+    # "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2": 1000,  # WETH
+}
+# allowed order validity period, in seconds
+DAEMON_MIN_VALID_PERIOD = 300
+DAEMON_MAX_VALID_PERIOD = 24 * 3600
+# max order fee, value in BPS of sell amount (OTCSeller itself accepts up to 10%)
+DAEMON_MAX_FEE = 100  # 1%
+# order intents queue polling interval, in seconds
+DAEMON_POLL_INTERVAL = 10
+
+# auto-sell daemon (scripts/daemon.py autosell), sells funds landing on the sellers within the DAEMON_* limits
+# validity period of the auto-sell orders, in seconds
+AUTOSELL_VALID_PERIOD = 3600
+# new blocks polling interval, in seconds
+AUTOSELL_POLL_INTERVAL = 2
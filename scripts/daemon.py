@@ -0,0 +1,349 @@
+import signal
+import time
+from decimal import Decimal
+from brownie import chain, interface, network, OTCSeller, OTCFactory
+from utils.cow import api_get_sell_fee
+from utils.deployed_state import read_or_update_state
+from utils.amount import Amount
+from utils.order_queue import OrderQueue, PENDING, PROCESSING, SIGNED, REJECTED, FAILED
+from utils.fees import get_fee_strategy, fee_params
+from utils.ledger import OrderLedger
+from utils.events import EventSource, LogIngester, address_topic
+from utils.tx_pipeline import TxPipeline, CONFIRMED, PENDING as TX_PENDING, get_receipt, is_known
+import utils.log as log
+import utils.metrics as metrics
+from scripts.deploy import get_token_data, make_order
+from scripts.order import OrderError, get_oracle_price, submit_order
+from scripts.main import checkEnv, loadAccount
+from scripts.ingest import find_our_sellers
+from utils.config import cowswap_settlement
+from otc_seller_config import (
+    BENEFICIARY,
+    DAEMON_MAX_SELL_AMOUNT,
+    DAEMON_MIN_VALID_PERIOD,
+    DAEMON_MAX_VALID_PERIOD,
+    DAEMON_MAX_FEE,
+    DAEMON_POLL_INTERVAL,
+    AUTOSELL_VALID_PERIOD,
+    AUTOSELL_POLL_INTERVAL,
+)
+
+APP_DATA = "0x0000000000000000000000000000000000000000000000000000000000000000"
+
+
+class PolicyError(OrderError):
+    pass
+
+
+class OrderManager:
+    """Signs queued order intents without prompts, keeping contract handles and token metadata warm between orders"""
+
+    def __init__(self, factory, executor, queue, cow_network="mainnet", poll_interval=DAEMON_POLL_INTERVAL):
+        self.factory = factory
+        self.executor = executor
+        self.queue = queue
+        self.cow_network = cow_network
+        self.settlement = interface.Settlement(cowswap_settlement)
+        self.pipeline = TxPipeline(executor)
+        self.fees = get_fee_strategy()
+        self.ledger = OrderLedger()
+        metrics.watch_ledger(self.ledger)
+        self.signing = {}
+        self.sent_txids = {}
+        self.sellers = {}
+        self.tokens = {}
+        # polled before every intent, e.g. to queue new intents on chain events
+        self.triggers = []
+        self.poll_interval = poll_interval
+        self.stopping = False
+
+    def get_token(self, address):
+        if address not in self.tokens:
+            self.tokens[address] = get_token_data(address)
+        return self.tokens[address]
+
+    def get_seller(self, beneficiary, sell_token, buy_token):
+        key = (beneficiary, *sorted((sell_token, buy_token)))
+        if key not in self.sellers:
+            sellerAddress = self.factory.getSellerFor(beneficiary, sell_token, buy_token)
+            if not self.factory.isSellerExists(sellerAddress):
+                raise PolicyError(f"Seller for pair {sell_token}:{buy_token} is not defined/deployed")
+            self.sellers[key] = OTCSeller.at(sellerAddress)
+            metrics.watch_seller(self.sellers[key])
+        return self.sellers[key]
+
+    def check_policy(self, intent):
+        max_amount = DAEMON_MAX_SELL_AMOUNT.get(intent["sell_token"])
+        if max_amount is None:
+            raise PolicyError(f"Sell token {intent['sell_token']} is not allowed")
+        if Decimal(intent["sell_amount"]) > Decimal(str(max_amount)):
+            raise PolicyError(f"Sell amount exceeds the limit of {max_amount}")
+        if not DAEMON_MIN_VALID_PERIOD <= intent["valid_period"] <= DAEMON_MAX_VALID_PERIOD:
+            raise PolicyError(f"Valid period must be in range {DAEMON_MIN_VALID_PERIOD}..{DAEMON_MAX_VALID_PERIOD}")
+
+    def process(self, intent, started):
+        """`started` is the intent processing start time of the sign flow metric"""
+        self.check_policy(intent)
+        seller = self.get_seller(intent["beneficiary"], intent["sell_token"], intent["buy_token"])
+        [sellToken, sellTokenSymbol, sellTokenDecimals] = self.get_token(intent["sell_token"])
+        [_, buyTokenSymbol, buyTokenDecimals] = self.get_token(intent["buy_token"])
+        sellAmount = Amount.parse(intent["sell_amount"], sellTokenDecimals).raw
+
+        if sellToken.balanceOf(seller.address) < sellAmount:
+            raise PolicyError("Seller balance is below sell amount")
+
+        feeAmount, quoteBuyAmount = api_get_sell_fee(intent["sell_token"], intent["buy_token"], sellAmount, self.cow_network, cache=False)
+        if feeAmount * 10000 > sellAmount * DAEMON_MAX_FEE:
+            raise PolicyError(f"Fee {Amount(feeAmount, sellTokenDecimals)}{sellTokenSymbol} exceeds the limit")
+
+        buyAmount = seller.minBuyAmount(intent["sell_token"], intent["buy_token"], sellAmount)
+        validTo = chain.time() + intent["valid_period"]
+        log.info(f"Intent #{intent['id']}", f"{Amount(sellAmount, sellTokenDecimals)}{sellTokenSymbol} -> {buyTokenSymbol}")
+        log.note("Min buy amount", f"{Amount(buyAmount, buyTokenDecimals)}{buyTokenSymbol}")
+
+        order = make_order(
+            sell_token=intent["sell_token"],
+            buy_token=intent["buy_token"],
+            receiver=seller.beneficiary(),
+            sell_amount=sellAmount,
+            buy_amount=buyAmount,
+            valid_to=validTo,
+            app_data=APP_DATA,
+            fee_amount=feeAmount,
+            partiallyFillable=False,
+        )
+        orderUid = submit_order(seller, order, self.cow_network)
+        self.queue.update(intent["id"], PROCESSING, order_uid=orderUid)
+        # sign txs are pipelined, the next intent is processed without waiting for the receipt
+        feeQuote = self.fees.quote("signOrder", validTo)
+        entry = self.pipeline.submit(seller.signOrder, order, orderUid, tx_params=fee_params(feeQuote))
+        self.queue.update(intent["id"], PROCESSING, tx_hash=entry.txid)
+        self.sent_txids[entry] = 1
+        ledgerRecord = {
+            "order": order,
+            "order_uid": orderUid,
+            "seller_address": seller.address,
+            "quote": (feeAmount, quoteBuyAmount),
+            "oracle_price": get_oracle_price(seller, intent["sell_token"]),
+        }
+        self.signing[entry] = (intent["id"], feeQuote, ledgerRecord, started)
+
+    def collect(self):
+        self.pipeline.poll()
+        for (entry, (intent_id, _, _, _)) in self.signing.items():
+            # the txids of the fee bumped resends are stored too, any of them may be the one that gets mined
+            if len(entry.txids) > self.sent_txids[entry]:
+                self.queue.update(intent_id, PROCESSING, tx_hash=",".join(entry.txids))
+                self.sent_txids[entry] = len(entry.txids)
+        for entry in [entry for entry in self.signing if entry.status != TX_PENDING]:
+            (intent_id, feeQuote, ledgerRecord, started) = self.signing.pop(entry)
+            del self.sent_txids[entry]
+            metrics.observe_sign_order(started, "daemon", "signed" if entry.status == CONFIRMED else entry.status)
+            if entry.status == CONFIRMED:
+                txHash = entry.receipt.transactionHash.hex()
+                log.okay(f"Intent #{intent_id} order signed, txHash", txHash)
+                self.queue.update(intent_id, SIGNED, tx_hash=txHash)
+                self.fees.record_inclusion(feeQuote, txHash, entry.receipt.blockNumber)
+                self.ledger.record_order(**ledgerRecord, sign_tx=txHash)
+            else:
+                log.error(f"Intent #{intent_id} sign tx {entry.status}", entry.txid)
+                self.queue.update(intent_id, FAILED, error=f"sign tx {entry.status}")
+
+    def wait_sign_receipt(self, txids, poll_interval=1):
+        """Receipt of the mined one of the sign txids, None once none of them is mined or pending"""
+        while True:
+            receipt = get_receipt(txids)
+            if receipt is not None or not any(is_known(txid) for txid in txids):
+                return receipt
+            time.sleep(poll_interval)
+
+    def recover(self):
+        """Resolves intents interrupted by a previous shutdown or crash"""
+        for intent in self.queue.interrupted():
+            fields = {}
+            receipt = self.wait_sign_receipt(intent["tx_hash"].split(",")) if intent["tx_hash"] else None
+            if receipt is not None:
+                status = SIGNED if receipt.status == 1 else FAILED
+                fields["tx_hash"] = receipt.transactionHash.hex()
+            elif intent["order_uid"] and self.settlement.preSignature(intent["order_uid"]) != 0:
+                # signed by a tx not known to the daemon, e.g. replaced by a resend
+                status = SIGNED
+            else:
+                # the sign tx (if any) was dropped and the API order was never presigned, it expires on its own,
+                # so the intent is safe to retry
+                status = PENDING
+            log.warn(f"Intent #{intent['id']} recovered as", status)
+            self.queue.update(intent["id"], status, **fields)
+
+    def stop(self, *args):
+        log.warn("Shutting down after the current intent...")
+        self.stopping = True
+
+    def run(self):
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        self.recover()
+        log.okay("Order manager started, waiting for intents")
+        while not self.stopping:
+            self.collect()
+            for trigger in self.triggers:
+                try:
+                    trigger.poll()
+                except Exception as err:
+                    # e.g. a node hiccup, the trigger resumes from its checkpoint
+                    log.error(f"{type(trigger).__name__} poll failed", str(err))
+            intent = self.queue.take()
+            if intent is None:
+                self.sleep(self.poll_interval)
+                continue
+            started = time.monotonic()
+            try:
+                self.process(intent, started)
+            except PolicyError as err:
+                log.error(f"Intent #{intent['id']} rejected", str(err))
+                metrics.observe_sign_order(started, "daemon", "rejected")
+                self.queue.update(intent["id"], REJECTED, error=str(err))
+            except Exception as err:
+                log.error(f"Intent #{intent['id']} failed", str(err))
+                metrics.observe_sign_order(started, "daemon", "failed")
+                self.queue.update(intent["id"], FAILED, error=str(err))
+        self.pipeline.wait_all()
+        self.collect()
+        log.okay("Order manager stopped")
+
+    def sleep(self, seconds):
+        deadline = time.monotonic() + seconds
+        while not self.stopping and time.monotonic() < deadline:
+            time.sleep(0.2)
+
+
+class FundingTrigger:
+    """Queues a sell intent as soon as a pair token lands on one of the sellers.
+
+    Transfers into the sellers are found by the `Transfer` logs filtered by the indexed recipient, so the node returns
+    only ours, ether sent to a seller is found by the WETH `Deposit` of its wrapping. A DAO vote funding the seller is
+    caught by the transfer of its execution. The intent sells the seller balance not reserved by open orders and queued
+    intents, up to the DAEMON_MAX_SELL_AMOUNT limit. The other policy limits and the seller `checkOrder` rules are
+    checked by the order manager, which quotes and signs it right away.
+    """
+
+    def __init__(self, manager, sellers, start_block, valid_period=AUTOSELL_VALID_PERIOD):
+        self.manager = manager
+        self.valid_period = valid_period
+        self.sellers = {seller.address: seller for seller in sellers}
+        self.pairs = {seller.address: (seller.tokenA(), seller.tokenB(), seller.beneficiary()) for seller in sellers}
+        tokens = sorted({token for (tokenA, tokenB, _) in self.pairs.values() for token in (tokenA, tokenB)})
+        recipients = [address_topic(address) for address in self.sellers]
+        sources = [EventSource(interface.ERC20.abi, ["Transfer"], address=tokens, topics=[None, recipients])]
+        weth = sellers[0].WETH() if sellers else None
+        if weth in tokens:
+            sources.append(EventSource(interface.WETH.abi, ["Deposit"], address=weth, topics=[recipients]))
+        # funding is acted upon at the head, a transfer reorged out fails the balance check of the intent
+        self.ingester = LogIngester("autosell", sources, start_block, confirmations=0, on_events=self.on_events)
+
+    def poll(self):
+        head = self.ingester.safe_head()
+        if head <= self.ingester.checkpoint()[0]:
+            return
+        self.ingester.check_reorg()
+        while self.ingester.checkpoint()[0] < head:
+            self.ingester.step(head)
+
+    def on_events(self, events):
+        # a deposit of the mock WETH also emits a Transfer, a funded token is sold once per batch
+        funded = {}
+        for event in events:
+            recipient = event.args.get("to", event.args.get("dst"))
+            if recipient in self.sellers:
+                funded[(recipient, event.address)] = event
+        for (sellerAddress, token) in funded:
+            self.queue_sale(self.sellers[sellerAddress], token)
+
+    def reserved(self, seller, token):
+        """Not filled amounts of the seller open orders and queued intents of the token, which must not be sold twice"""
+        (tokenA, tokenB, beneficiary) = self.pairs[seller.address]
+        now = chain.time()
+        reserved = sum(
+            int(order["sell_amount"]) + int(order["fee_amount"]) - int(order["executed_sell_amount"]) - int(order["executed_fee_amount"])
+            for order in self.manager.ledger.open_orders()
+            if order["seller"].lower() == seller.address.lower() and order["sell_token"].lower() == token.lower() and order["valid_to"] > now
+        )
+        [_, _, decimals] = self.manager.get_token(token)
+        for intent in self.manager.queue.list(PENDING) + self.manager.queue.list(PROCESSING):
+            pair = {intent["sell_token"].lower(), intent["buy_token"].lower()}
+            if (
+                intent["sell_token"].lower() == token.lower()
+                and pair == {tokenA.lower(), tokenB.lower()}
+                and intent["beneficiary"].lower() == beneficiary.lower()
+            ):
+                reserved += Amount.parse(intent["sell_amount"], decimals).raw
+        return reserved
+
+    def queue_sale(self, seller, token):
+        (tokenA, tokenB, beneficiary) = self.pairs[seller.address]
+        buyToken = tokenB if token == tokenA else tokenA
+        [sellToken, symbol, decimals] = self.manager.get_token(token)
+        maxAmount = DAEMON_MAX_SELL_AMOUNT.get(token)
+        if maxAmount is None:
+            log.warn(f"Seller {seller.address} funded with {symbol}, which is not allowed to sell")
+            return
+        amount = min(sellToken.balanceOf(seller.address) - self.reserved(seller, token), Amount.parse(maxAmount, decimals).raw)
+        if amount <= 0:
+            log.note(f"Seller {seller.address} funded with {symbol}", "balance is reserved by open orders")
+            return
+        intent_id = self.manager.queue.push(token, buyToken, Amount(amount, decimals).format(), self.valid_period, beneficiary)
+        log.okay(f"Seller {seller.address} funded, intent #{intent_id} queued", f"{Amount(amount, decimals)}{symbol}")
+
+
+def make_manager(txExecutor, poll_interval=DAEMON_POLL_INTERVAL):
+    deployedState = read_or_update_state()
+    if not deployedState.factoryAddress:
+        log.error("Factory not defined/deployed")
+        exit()
+    factory = OTCFactory.at(deployedState.factoryAddress)
+    log.note("NETWORK", network.show_active())
+    log.note("EXECUTOR", txExecutor.address)
+    log.info(f"Using factory at", factory.address)
+    return (OrderManager(factory, txExecutor, OrderQueue(), poll_interval=poll_interval), deployedState)
+
+
+def main():
+    log.info("-= Order manager daemon =-")
+
+    checkEnv()
+    txExecutor = loadAccount("EXECUTOR")
+    (manager, _) = make_manager(txExecutor)
+    metrics.start()
+
+    manager.run()
+
+
+def autosell(startBlock=None):
+    log.info("-= Auto-sell daemon =-")
+
+    checkEnv()
+    txExecutor = loadAccount("EXECUTOR")
+    (manager, deployedState) = make_manager(txExecutor, AUTOSELL_POLL_INTERVAL)
+    sellers = [OTCSeller.at(address) for address in find_our_sellers(deployedState)]
+    if not sellers:
+        log.error("No deployed sellers found")
+        exit()
+    log.note("Sellers", len(sellers))
+    # the first run starts from the next block, later runs resume from the checkpoint
+    manager.triggers.append(FundingTrigger(manager, sellers, int(startBlock) if startBlock else chain.height + 1))
+    metrics.start()
+
+    manager.run()
+
+
+def enqueue(sellTokenAddress, buyTokenAddress, sellAmount, validPeriod=3600, beneficiaryAddress=BENEFICIARY):
+    intent_id = OrderQueue().push(sellTokenAddress, buyTokenAddress, sellAmount, validPeriod, beneficiaryAddress)
+    log.okay("Order intent queued", intent_id)
+
+
+def status():
+    for intent in OrderQueue().list():
+        log.note(
+            f"#{intent['id']} {intent['status']}",
+            f"{intent['sell_amount']} {intent['sell_token']} -> {intent['buy_token']} {intent['order_uid'] or ''} {intent['error'] or ''}".strip(),
+        )
@@ -1,10 +1,14 @@
+import json
 from dotmap import DotMap
+from eth_utils import keccak, to_checksum_address
 from utils.deployed_state import read_or_update_state
+from utils.tx_pipeline import TxPipeline, CONFIRMED
 import utils.log as log
-from utils.cow import KIND_SELL, BALANCE_ERC20
+from utils.gpv2_order import Order
 
 try:
-    from brownie import OTCSeller, OTCFactory, interface, Wei
+    from brownie import web3, OTCSeller, OTCFactory, interface, multicall, Wei
+    from brownie.exceptions import VirtualMachineError
 except ImportError:
     print("You're probably running inside Brownie console. Please call:")
     print("set_console_globals(interface=interface, PurchaseExecutor=PurchaseExecutor)")
@@ -18,9 +22,13 @@ def set_console_globals(**kwargs):
     interface = kwargs["interface"]
 
 
+from utils.events import EventSource, LogIngester, to_hex
+from utils.helpers import view_call
+from utils.store import open_db
 from utils.dao import create_vote, encode_token_transfer, encode_call_script, encode_agent_execute, encode_wrap_eth
 
 from utils.config import (
+    ZERO_ADDRESS,
     eth_token_address,
     weth_token_address,
     dai_token_address,
@@ -82,8 +90,8 @@ def make_initialize_args(receiver, sell_token, buy_token, price_feed, max_margin
     )
 
 
-def make_factory_constructor_args(weth_token, dao_vault):
-    return DotMap({"wethAddress": weth_token, "daoVaultAddress": dao_vault})
+def make_factory_constructor_args(weth_token, dao_vault, immutable_args=False):
+    return DotMap({"wethAddress": weth_token, "daoVaultAddress": dao_vault, "immutableArgs": immutable_args})
 
 
 def deploy_factory(tx_params, sellerInitializeArgs):
@@ -98,6 +106,7 @@ def deploy_factory(tx_params, sellerInitializeArgs):
         factory = OTCFactory.deploy(
             args.wethAddress,
             args.daoVaultAddress,
+            bool(args.immutableArgs),
             tx_params,
         )
         log.info("> txHash:", factory.tx.txid)
@@ -116,6 +125,7 @@ def deploy_factory(tx_params, sellerInitializeArgs):
         log.info("Checking deployed OTCFactory...")
         check_deployed_factory(factory=factory, factoryConstructorArgs=args)
         log.okay("OTCFactory check pass")
+        read_or_update_state({"factoryFingerprint": fingerprint_factory(factory)})
 
     return factory
 
@@ -155,6 +165,15 @@ def deploy_seller(tx_params, sellerInitializeArgs, factoryAddress=None):
     else:
         sellerInfo = DotMap(sellers[sellerIndex])
 
+    if sellerInfo.fingerprint and is_fingerprint_of_args(sellerInfo, args):
+        fingerprint = fingerprint_sellers([sellerAddress], {sellerAddress: sellerInfo.fingerprint})[sellerAddress]
+        if not is_fingerprint_moved(sellerInfo.fingerprint, fingerprint):
+            log.okay(f"OTCSeller unchanged since the check at block {sellerInfo.fingerprint.block}, check skipped", sellerAddress)
+            sellerInfo.fingerprint = fingerprint
+            sellers[sellerIndex] = sellerInfo
+            read_or_update_state({"sellers": sellers})
+            return OTCSeller.at(sellerAddress)
+
     [_, sellTokenASymbol, _] = get_token_data(args.sellTokenAddress)
     [_, buyTokenBSymbol, _] = get_token_data(args.buyTokenAddress)
     if factory.isSellerExists(sellerAddress):
@@ -193,6 +212,7 @@ def deploy_seller(tx_params, sellerInitializeArgs, factoryAddress=None):
     [_, sellerInfo.tokenASymbol, _] = get_token_data(sellerInfo.tokenA)
     sellerInfo.tokenB = seller.tokenB()
     [_, sellerInfo.tokenBSymbol, _] = get_token_data(sellerInfo.tokenB)
+    sellerInfo.fingerprint = fingerprint_sellers([sellerAddress], {})[sellerAddress]
 
     sellers[sellerIndex] = sellerInfo
     deployedState = read_or_update_state(
@@ -204,6 +224,156 @@ def deploy_seller(tx_params, sellerInitializeArgs, factoryAddress=None):
     return seller
 
 
+# EIP-1167 minimal proxy creation code around the implementation address
+CLONE_CODE_PREFIX = bytes.fromhex("3d602d80600a3d3981f3363d3d373d3d3d363d73")
+CLONE_CODE_SUFFIX = bytes.fromhex("5af43d82803e903d91602b57fd5bf3")
+# the same runtime code with the immutable args appended, the PUSH1 of the returned code length goes in between
+CLONE_RUNTIME_LENGTH = 0x2D
+CLONE_WITH_ARGS_PREFIX = (bytes.fromhex("3d60"), bytes.fromhex("80600a3d3981f3363d3d373d3d3d363d73"))
+
+
+def predict_seller_address(factoryAddress, implementationAddress, beneficiaryAddress, tokenA, tokenB, immutableArgs=False):
+    """Local equivalent of OTCFactory.getSellerFor"""
+    (token0, token1) = sorted((tokenA, tokenB), key=lambda x: int(x, 16))
+    args = b"".join(bytes.fromhex(x[2:]) for x in (beneficiaryAddress, token0, token1))
+    salt = keccak(args)
+    if immutableArgs:
+        (head, tail) = CLONE_WITH_ARGS_PREFIX
+        code = head + bytes([CLONE_RUNTIME_LENGTH + len(args)]) + tail + bytes.fromhex(implementationAddress[2:]) + CLONE_CODE_SUFFIX + args
+    else:
+        code = CLONE_CODE_PREFIX + bytes.fromhex(implementationAddress[2:]) + CLONE_CODE_SUFFIX
+    return to_checksum_address(keccak(b"\xff" + bytes.fromhex(factoryAddress[2:]) + salt + keccak(code))[12:])
+
+
+def read_sellers_plan(filename, beneficiary, max_margin, const_price):
+    """Reads sellers initialize args from the plan file, see `deploy-plan.example.json`"""
+    with open(filename) as fp:
+        plan = json.load(fp)
+    return [
+        make_initialize_args(
+            receiver=item.get("beneficiary", plan.get("beneficiary", beneficiary)),
+            sell_token=item["sellToken"],
+            buy_token=item["buyToken"],
+            price_feed=item.get("priceFeed", ZERO_ADDRESS),
+            max_margin=item.get("maxMargin", plan.get("maxMargin", max_margin)),
+            const_price=int(item.get("constantPrice", const_price)),
+        )
+        for item in plan["sellers"]
+    ]
+
+
+def is_immutable_args_factory(factory):
+    """Clone mode of the factory, the factories deployed before the immutable args mode have no `immutableArgs` getter"""
+    try:
+        return bool(factory.immutableArgs())
+    except (ValueError, VirtualMachineError):
+        return False
+
+
+def prefetch_sellers(factory, sellersArgs):
+    """Predicts seller addresses locally and reads their existence, token metadata and prices in multicall batches"""
+    implementationAddress = factory.implementation()
+    immutableArgs = is_immutable_args_factory(factory)
+    planned = [
+        DotMap(
+            {
+                "args": args,
+                "sellerAddress": predict_seller_address(
+                    factory.address, implementationAddress, args.beneficiaryAddress, args.sellTokenAddress, args.buyTokenAddress, immutableArgs
+                ),
+            }
+        )
+        for args in sellersArgs
+    ]
+    tokens = {address for x in planned for address in (x.args.sellTokenAddress, x.args.buyTokenAddress)}
+    feeds = {x.args.chainLinkPriceFeedAddress for x in planned if x.args.chainLinkPriceFeedAddress != ZERO_ADDRESS}
+    with multicall():
+        exists = {x.sellerAddress: factory.isSellerExists(x.sellerAddress) for x in planned}
+        tokenData = {address: (interface.ERC20(address).symbol(), interface.ERC20(address).decimals()) for address in tokens}
+        feedData = {
+            address: (interface.IChainlinkPriceFeedV3(address).decimals(), interface.IChainlinkPriceFeedV3(address).latestRoundData()) for address in feeds
+        }
+
+    for x in planned:
+        x.exists = bool(exists[x.sellerAddress])
+        (x.sellTokenSymbol, x.sellTokenDecimals) = (str(tokenData[x.args.sellTokenAddress][0]), int(tokenData[x.args.sellTokenAddress][1]))
+        (x.buyTokenSymbol, x.buyTokenDecimals) = (str(tokenData[x.args.buyTokenAddress][0]), int(tokenData[x.args.buyTokenAddress][1]))
+        # sell token price in buy tokens normalized to 1e18, constantPrice has priority as in the seller
+        if x.args.constantPrice:
+            x.price = x.args.constantPrice
+        else:
+            (feedDecimals, roundData) = feedData[x.args.chainLinkPriceFeedAddress]
+            x.price = int(roundData[1]) * 10 ** (18 - int(feedDecimals))
+    return planned
+
+
+def deploy_sellers(tx_params, factory, planned):
+    """Sends createSeller txs of not existing sellers in a pipeline, the deployed state is written once at the end"""
+    tx_params = dict(tx_params)
+    pipeline = TxPipeline(tx_params.pop("from"))
+    pending = []
+    for x in planned:
+        if x.exists:
+            log.warn(f"Seller for {x.sellTokenSymbol}:{x.buyTokenSymbol} already deployed at", x.sellerAddress)
+            continue
+        log.info("Deploying OTCSeller for tokens pair", f"{x.sellTokenSymbol}:{x.buyTokenSymbol}")
+        entry = pipeline.submit(
+            factory.createSeller,
+            x.args.beneficiaryAddress,
+            x.args.sellTokenAddress,
+            x.args.buyTokenAddress,
+            x.args.chainLinkPriceFeedAddress,
+            x.args.maxMargin,
+            x.args.constantPrice,
+            tx_params=tx_params,
+        )
+        log.info("> txHash:", entry.txid)
+        pending.append((x, entry))
+    pipeline.wait_all()
+
+    deployedState = read_or_update_state()
+    sellers = deployedState.sellers or []
+    deployed = []
+    fingerprints = fingerprint_sellers([x.sellerAddress for (x, entry) in pending if entry.status == CONFIRMED], {})
+    for (x, entry) in pending:
+        if entry.status != CONFIRMED:
+            log.error(f"OTCSeller for {x.sellTokenSymbol}:{x.buyTokenSymbol} deploy tx {entry.status}", entry.txid)
+            continue
+        seller = OTCSeller.at(x.sellerAddress)
+        check_deployed_seller(factory=factory, seller=seller, sellerInitializeArgs=x.args)
+        log.okay(f"OTCSeller for {x.sellTokenSymbol}:{x.buyTokenSymbol} deployed at", x.sellerAddress)
+
+        sellerInfo = DotMap(
+            {
+                "sellerAddress": x.sellerAddress,
+                "sellerDeployTx": entry.receipt.transactionHash.hex(),
+                "sellerDeployConstructorArgs": (x.args.toDict(),),
+                # the pair config is verified against the initialize args above
+                "pairConfig": {
+                    "chainLinkPriceFeedAddress": x.args.chainLinkPriceFeedAddress,
+                    "maxMargin": x.args.maxMargin,
+                    "constantPrice": x.args.constantPrice,
+                },
+                "tokenA": x.args.sellTokenAddress,
+                "tokenASymbol": x.sellTokenSymbol,
+                "tokenB": x.args.buyTokenAddress,
+                "tokenBSymbol": x.buyTokenSymbol,
+                "fingerprint": fingerprints[x.sellerAddress],
+            }
+        )
+        sellerIndex = find_deployed_seller_index(sellers, x.sellerAddress)
+        if sellerIndex == -1:
+            sellers.append(sellerInfo)
+        else:
+            sellers[sellerIndex] = sellerInfo
+        deployed.append(seller)
+
+    if deployed:
+        log.info("Updating sellers deployed info...")
+        read_or_update_state({"sellers": sellers})
+    return deployed
+
+
 # def deploy(tx_params, factoryConstructorArgs, sellerInitializeArgs):
 #     factory = deploy_factory(tx_params, factoryConstructorArgs)
 #     seller = deploy_seller(tx_params, sellerInitializeArgs)
@@ -214,6 +384,7 @@ def check_deployed_factory(factory, factoryConstructorArgs):
     impl = OTCSeller.at(factory.implementation())
     assert impl.DAO_VAULT() == factoryConstructorArgs.daoVaultAddress, "Wrong Lido Agent address"
     assert impl.WETH() == factoryConstructorArgs.wethAddress, "Wrong WETH address"
+    assert is_immutable_args_factory(factory) == bool(factoryConstructorArgs.immutableArgs), "Wrong sellers clone mode"
 
 
 def check_deployed_seller(factory, seller, sellerInitializeArgs):
@@ -241,6 +412,140 @@ def check_deployed_seller(factory, seller, sellerInitializeArgs):
     assert constPrice == sellerInitializeArgs.constantPrice, "Wrong max constantPrice"
 
 
+def fingerprint_factory(factory):
+    """Code hashes of the factory and the implementation, the factory config is immutable"""
+    block = web3.eth.block_number
+    return DotMap(
+        {
+            "codeHash": to_hex(keccak(web3.eth.get_code(factory.address, block))),
+            "implementationCodeHash": to_hex(keccak(web3.eth.get_code(factory.implementation(), block))),
+            "block": block,
+        }
+    )
+
+
+def fingerprint_sellers(sellerAddresses, previous):
+    """Fingerprints of the sellers at the latest block: the code hash, the last `PairConfigSet` log position and the pair config.
+
+    `previous` is {sellerAddress: fingerprint} of the last check. New `PairConfigSet` logs since it are read for all sellers
+    at once, in block ranges split adaptively by `LogIngester` when the node caps eth_getLogs. The pair config and the code
+    are read only for the sellers without a previous fingerprint or with new logs: the sellers can't selfdestruct, so
+    the code of a checked seller can't change.
+    """
+    block = web3.eth.block_number
+    known = [address for address in sellerAddresses if previous.get(address)]
+    positions = {}
+    if known:
+        fromBlock = min(previous[x]["block"] for x in known) + 1
+
+        def on_events(events):
+            for event in events:
+                address = to_checksum_address(event.address)
+                if event.blockNumber > previous[address]["block"]:
+                    # events are passed in the chain order, the last one wins
+                    positions[address] = [event.blockNumber, event.logIndex]
+
+        ingester = LogIngester(
+            "fingerprints",
+            [EventSource(OTCSeller.abi, ["PairConfigSet"], address=known)],
+            fromBlock,
+            conn=open_db("fingerprints", transient=True),
+            # the whole range is tried first, it's halved only if the node rejects it
+            initial_range=max(1, block - fromBlock + 1),
+            confirmations=0,
+            on_events=on_events,
+        )
+        ingester.catch_up(block)
+    reads = [address for address in sellerAddresses if not previous.get(address) or address in positions]
+    configs = {}
+    if reads:
+        with multicall(block_identifier=block):
+            configs = {address: view_call(OTCSeller.abi, address, "getPairConfig")() for address in reads}
+
+    fingerprints = {}
+    for address in sellerAddresses:
+        last = previous.get(address) or {}
+        if address in configs:
+            (priceFeed, maxMargin, _, constantPrice) = configs[address]
+            pairConfig = [str(priceFeed), int(maxMargin), int(constantPrice)]
+            codeHash = to_hex(keccak(web3.eth.get_code(address, block)))
+        else:
+            (pairConfig, codeHash) = (last["pairConfig"], last["codeHash"])
+        fingerprints[address] = DotMap(
+            {
+                "codeHash": codeHash,
+                "pairConfigLog": positions.get(address, last.get("pairConfigLog")),
+                "pairConfig": pairConfig,
+                "block": block,
+            }
+        )
+    return fingerprints
+
+
+def is_fingerprint_moved(previous, current):
+    return any(previous.get(key) != current.get(key) for key in ("codeHash", "implementationCodeHash", "pairConfigLog", "pairConfig"))
+
+
+def is_fingerprint_of_args(sellerInfo, sellerInitializeArgs):
+    """Whether the last checked seller state matches the initialize args, the beneficiary is a part of the seller address"""
+    args = sellerInitializeArgs
+    (priceFeed, maxMargin, constantPrice) = sellerInfo.fingerprint.pairConfig
+    return [x.lower() for x in (sellerInfo.tokenA, sellerInfo.tokenB, priceFeed)] == [
+        x.lower() for x in (args.sellTokenAddress, args.buyTokenAddress, args.chainLinkPriceFeedAddress)
+    ] and (maxMargin, constantPrice) == (int(args.maxMargin), int(args.constantPrice))
+
+
+def verify_deployment(factory, deployedState, force=False):
+    """Re-checks the factory and the sellers of the deployed state whose fingerprints moved since their last check, or all with `force`.
+    A changed pair config is reported and accepted, it's set by the DAO. Returns the updated state and the failed sellers"""
+    factoryFingerprint = fingerprint_factory(factory)
+    if not deployedState.factoryDeployConstructorArgs:
+        log.warn("OTCFactory constructor args are not saved, factory check skipped")
+    elif force or not deployedState.factoryFingerprint or is_fingerprint_moved(deployedState.factoryFingerprint, factoryFingerprint):
+        log.info("Checking OTCFactory...")
+        check_deployed_factory(factory=factory, factoryConstructorArgs=DotMap(deployedState.factoryDeployConstructorArgs))
+        log.okay("OTCFactory check pass")
+    else:
+        log.okay(f"OTCFactory unchanged since the check at block {deployedState.factoryFingerprint.block}")
+
+    sellers = [DotMap(x) for x in deployedState.sellers or []]
+    previous = {} if force else {x.sellerAddress: x.fingerprint for x in sellers if x.fingerprint}
+    fingerprints = fingerprint_sellers([x.sellerAddress for x in sellers], previous)
+    failed = []
+    for sellerInfo in sellers:
+        fingerprint = fingerprints[sellerInfo.sellerAddress]
+        if sellerInfo.fingerprint and not force and not is_fingerprint_moved(sellerInfo.fingerprint, fingerprint):
+            sellerInfo.fingerprint = fingerprint
+            continue
+        (priceFeed, maxMargin, constantPrice) = fingerprint.pairConfig
+        if sellerInfo.pairConfig and [
+            sellerInfo.pairConfig.chainLinkPriceFeedAddress,
+            sellerInfo.pairConfig.maxMargin,
+            sellerInfo.pairConfig.constantPrice,
+        ] != [
+            priceFeed,
+            maxMargin,
+            constantPrice,
+        ]:
+            log.warn(
+                f"Seller {sellerInfo.tokenASymbol}:{sellerInfo.tokenBSymbol} pair config changed", f"{dict(sellerInfo.pairConfig)} -> {fingerprint.pairConfig}"
+            )
+        seller = OTCSeller.at(sellerInfo.sellerAddress)
+        args = make_initialize_args(seller.beneficiary(), sellerInfo.tokenA, sellerInfo.tokenB, priceFeed, maxMargin, constantPrice)
+        try:
+            check_deployed_seller(factory=factory, seller=seller, sellerInitializeArgs=args)
+        except AssertionError as err:
+            # the fingerprint is not updated, so the seller is checked again by the next run
+            log.error(f"OTCSeller {sellerInfo.tokenASymbol}:{sellerInfo.tokenBSymbol} check failed at {sellerInfo.sellerAddress}", str(err))
+            failed.append(sellerInfo.sellerAddress)
+            continue
+        log.okay(f"OTCSeller {sellerInfo.tokenASymbol}:{sellerInfo.tokenBSymbol} check pass", sellerInfo.sellerAddress)
+        sellerInfo.pairConfig = {"chainLinkPriceFeedAddress": priceFeed, "maxMargin": maxMargin, "constantPrice": constantPrice}
+        sellerInfo.fingerprint = fingerprint
+
+    return ({"factoryFingerprint": factoryFingerprint, "sellers": sellers}, failed)
+
+
 def start_dao_vote_transfer_eth_for_sell(tx_params, seller_address, sell_amount):
     (vote_id, _) = propose_transfer_eth_for_sell(
         tx_params=tx_params,
@@ -252,17 +557,15 @@ def start_dao_vote_transfer_eth_for_sell(tx_params, seller_address, sell_amount)
 
 
 def make_order(sell_token, buy_token, receiver, sell_amount, buy_amount, valid_to, app_data, fee_amount, partiallyFillable=False):
-    return [
-        sell_token,
-        buy_token,
-        receiver,
-        int(sell_amount),
-        int(buy_amount),
-        valid_to,
-        app_data,
-        int(fee_amount),
-        KIND_SELL,
-        partiallyFillable,
-        BALANCE_ERC20,
-        BALANCE_ERC20,
-    ]
+    """Sell order with ERC20 balances, the Order is passed to the contract calls as is"""
+    return Order(
+        sell_token=sell_token,
+        buy_token=buy_token,
+        receiver=receiver,
+        sell_amount=sell_amount,
+        buy_amount=buy_amount,
+        valid_to=valid_to,
+        app_data=app_data,
+        fee_amount=fee_amount,
+        partially_fillable=partiallyFillable,
+    )
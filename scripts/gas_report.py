@@ -0,0 +1,95 @@
+"""Gas report of the seller deploy and order functions on a local dev chain with the mocks of `contracts/mocks`.
+
+    brownie run gas_report main [outputFilename] [immutableArgs] --network development
+    brownie run gas_report compare <beforeFilename> <afterFilename>
+
+`main` saves the report to a JSON file when `outputFilename` is set, so reports of two builds
+(e.g. before and after a storage layout change) can be compared by `compare`.
+`immutableArgs` measures the sellers of a factory in the clones with immutable args mode,
+`main` reports of both modes can be compared the same way.
+"""
+import json
+from brownie import accounts, chain, OTCFactory, OTCSeller
+from utils.gpv2_order import ZERO_APP_DATA
+import utils.log as log
+from scripts.deploy import make_order
+from scripts.local_chain import deploy_mocks
+from otc_seller_config import MAX_MARGIN
+
+SELL_AMOUNT = 10**18
+
+
+def measure(mocks, deployer, beneficiary, immutableArgs=False):
+    """Gas used by txs and estimated for views, the views estimates include the 21000 base tx cost"""
+    tx_params = {"from": deployer, "silent": True}
+    report = {}
+
+    # a standalone seller has no args appended to its code, so it's measured in the storage mode only
+    if not immutableArgs:
+        implementation = OTCSeller.deploy(mocks.weth, mocks.vault, tx_params)
+        # the deployer is the factory of a standalone seller, so it's allowed to initialize it
+        tx = implementation.initialize(beneficiary, mocks.dai, mocks.weth, mocks.chainlink_dai_eth, MAX_MARGIN, 0, tx_params)
+        report["initialize"] = tx.gas_used
+
+    factory = OTCFactory.deploy(mocks.weth, mocks.vault, immutableArgs, tx_params)
+    report["deployFactory"] = factory.tx.gas_used
+    tx = factory.createSeller(beneficiary, mocks.dai, mocks.weth, mocks.chainlink_dai_eth, MAX_MARGIN, 0, tx_params)
+    report["createSeller"] = tx.gas_used
+    seller = OTCSeller.at(factory.getSellerFor(beneficiary, mocks.dai, mocks.weth))
+    deployer.transfer(seller.address, SELL_AMOUNT * 2, silent=True)
+
+    (price, _) = seller.reversePriceAndMaxMargin()
+    fee_amount = SELL_AMOUNT // 1000
+    order = make_order(
+        mocks.weth,
+        mocks.dai,
+        beneficiary,
+        SELL_AMOUNT - fee_amount,
+        price * (SELL_AMOUNT - fee_amount) // 10**18,
+        chain.time() + 3600,
+        ZERO_APP_DATA,
+        fee_amount,
+    )
+    orderUid = seller.getOrderUid(order)
+    report["getOrderUid"] = seller.getOrderUid.estimate_gas(order)
+    report["checkOrder"] = seller.checkOrder.estimate_gas(order, orderUid)
+    # the orderUid starts with the order digest
+    report["isValidSignature"] = seller.isValidSignature.estimate_gas(orderUid[:32], order.eip1271_signature)
+    report["signOrder"] = seller.signOrder(order, orderUid, tx_params).gas_used
+    return report
+
+
+def print_report(report, before=None):
+    for name, gas in report.items():
+        if before and name in before:
+            delta = gas - before[name]
+            log.note(name, f"{gas} ({delta:+d}, {delta / before[name] * 100:+.1f}%)")
+        else:
+            log.note(name, gas)
+
+
+def main(outputFilename=None, immutableArgs=False):
+    immutableArgs = str(immutableArgs).lower() in ("1", "true", "yes")
+    if chain.id == 1:
+        log.error("Gas report must run on a local dev chain, e.g. `--network development`")
+        return
+
+    deployer = accounts[0]
+    mocks = deploy_mocks({"from": deployer, "silent": True})
+    report = measure(mocks, deployer, accounts[1], immutableArgs)
+    log.info("Gas used", "clones with immutable args" if immutableArgs else "clones")
+    print_report(report)
+    if outputFilename:
+        with open(outputFilename, "w") as fp:
+            json.dump(report, fp, indent=4)
+        log.info("Gas report saved to", outputFilename)
+    return report
+
+
+def compare(beforeFilename, afterFilename):
+    with open(beforeFilename) as fp:
+        before = json.load(fp)
+    with open(afterFilename) as fp:
+        after = json.load(fp)
+    log.info("Gas used", f"{afterFilename} vs {beforeFilename}")
+    print_report(after, before)
@@ -0,0 +1,106 @@
+from brownie import chain, interface, OTCSeller, OTCFactory
+from utils.deployed_state import read_or_update_state
+from utils.events import EventSource, LogIngester, address_topic, to_hex
+from utils.ledger import OrderLedger
+from utils.seller_index import SellerIndex
+from utils.config import cowswap_settlement
+import utils.log as log
+from otc_seller_config import BENEFICIARY
+
+SELLER_EVENTS = ["OrderSigned", "OrderCanceled", "ERC20Transferred", "PairConfigSet", "RelayerAllowanceSet", "OrderPruned"]
+
+
+def make_seller_events_ingester(seller_addresses, start_block, ledger=None):
+    """Settlement trades of the sellers and the sellers own events, trades are added to the ledger as order fills"""
+    sources = [
+        # Trade.owner is indexed, so only trades of our sellers are returned by the node
+        EventSource(interface.Settlement.abi, ["Trade"], address=cowswap_settlement, topics=[[address_topic(a) for a in seller_addresses]], key_arg="owner"),
+        EventSource(OTCSeller.abi, SELLER_EVENTS, address=seller_addresses),
+    ]
+
+    def on_events(events):
+        for event in events:
+            if event.event == "Trade" and ledger.get(to_hex(event.args["orderUid"])):
+                ledger.add_fill(
+                    to_hex(event.args["orderUid"]),
+                    to_hex(event.transactionHash),
+                    event.logIndex,
+                    event.blockNumber,
+                    event.args["sellAmount"],
+                    event.args["buyAmount"],
+                    event.args["feeAmount"],
+                )
+
+    return LogIngester(
+        "sellers",
+        sources,
+        start_block,
+        on_events=on_events if ledger else None,
+        on_rollback=ledger.rollback_fills if ledger else None,
+    )
+
+
+def make_factory_ingester(factory_address, start_block):
+    ingester = LogIngester("factory", [EventSource(OTCFactory.abi, ["SellerCreated"], address=factory_address)], start_block)
+    index = SellerIndex(ingester.conn)
+    ingester.on_events = index.on_events
+    ingester.on_rollback = index.on_rollback
+    return (ingester, index)
+
+
+def get_start_block(deployedState):
+    if deployedState.factoryDeployTx:
+        return chain.get_transaction(deployedState.factoryDeployTx).block_number
+    return chain.height
+
+
+def find_our_sellers(deployedState, beneficiary=BENEFICIARY):
+    """Sellers of the deployed state and the sellers of our beneficiary deployed by other operators"""
+    sellers = [seller.sellerAddress for seller in deployedState.sellers or []]
+    if deployedState.factoryAddress:
+        (factoryIngester, index) = make_factory_ingester(deployedState.factoryAddress, get_start_block(deployedState))
+        factoryIngester.catch_up()
+        sellers += [x["seller"] for x in index.by_beneficiary(beneficiary) if x["seller"] not in sellers]
+    return sellers
+
+
+def main(follow=False, startBlock=None):
+    log.info("-= Seller events ingestion =-")
+    deployedState = read_or_update_state()
+    sellers = find_our_sellers(deployedState)
+    if not sellers:
+        log.error("No deployed sellers found")
+        exit()
+    startBlock = int(startBlock) if startBlock else get_start_block(deployedState)
+    log.note("Sellers", len(sellers))
+    log.note("Start block", startBlock)
+
+    ingester = make_seller_events_ingester(sellers, startBlock, OrderLedger())
+    if follow:
+        ingester.follow()
+    else:
+        ingester.catch_up()
+
+
+def sellers(follow=False, startBlock=None):
+    log.info("-= Factory sellers index =-")
+    deployedState = read_or_update_state()
+    if not deployedState.factoryAddress:
+        log.error("Factory not defined/deployed")
+        exit()
+    startBlock = int(startBlock) if startBlock else get_start_block(deployedState)
+    (ingester, index) = make_factory_ingester(deployedState.factoryAddress, startBlock)
+    if follow:
+        ingester.follow()
+    else:
+        ingester.catch_up()
+    log.okay("Indexed sellers", len(index.all()))
+
+
+def findSellers(tokenOrBeneficiary):
+    deployedState = read_or_update_state()
+    (_, index) = make_factory_ingester(deployedState.factoryAddress, get_start_block(deployedState))
+    found = index.by_token(tokenOrBeneficiary) or index.by_beneficiary(tokenOrBeneficiary)
+    for seller in found:
+        log.note(f"{seller['token0']}:{seller['token1']}", f"{seller['seller']} (beneficiary {seller['beneficiary']})")
+    log.info("Sellers found", len(found))
@@ -0,0 +1,242 @@
+"""Load test of the order signing flow against a local dev chain and a local CowSwap API stand-in.
+
+    brownie run load_test main [orders] [concurrency] [sellers] [rate] [latency] [jitter] --network development
+
+Each order goes through the same stages as `signOrder`: quote, make_order, getOrderUid, checkOrder,
+API create, status check and the signOrder transaction. Orders arrive at `rate` per second (0 enqueues all at once)
+and are processed by `concurrency` workers, each signing from its own funded account.
+"""
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from queue import Queue, Empty
+from threading import Lock, Thread
+from brownie import accounts, chain, OTCFactory, OTCSeller
+from utils.cow import COW_API_URL_ENV, api_get_quote, api_post_order, api_get_order_status
+from utils.cow_standin import CowApiStandIn, PRESIGNATURE_PENDING
+from utils.gpv2_order import domain_separator, ZERO_APP_DATA
+from utils.config import cowswap_settlement
+from utils.amount import Amount
+import utils.log as log
+from scripts.deploy import make_order
+from scripts.local_chain import deploy_mocks
+from scripts.order import OrderError, get_oracle_price
+from otc_seller_config import MAX_MARGIN
+
+STAGES = ("queue", "quote", "make_order", "getOrderUid", "checkOrder", "api_create", "status", "signOrder")
+PERCENTILES = (50, 90, 99)
+SAMPLE_INTERVAL = 0.1
+NETWORK = "local"
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of the sorted values"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, -(-pct * len(values) // 100) - 1))]
+
+
+class LoadStats:
+    """Per-stage latencies, and the number of orders waiting in the queue or being in each stage over time"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.active = defaultdict(int)
+        self.occupancy = defaultdict(list)
+        self.backlog = []
+        self.completed = 0
+        self.errors = defaultdict(int)
+        self._lock = Lock()
+
+    @contextmanager
+    def stage(self, name):
+        """Times the wrapped stage, a failure is counted against it and re-raised"""
+        with self._lock:
+            self.active[name] += 1
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as error:
+            with self._lock:
+                self.errors[f"{name}: {error if isinstance(error, OrderError) else type(error).__name__}"] += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.active[name] -= 1
+                self.samples[name].append(elapsed)
+
+    def record(self, name, elapsed):
+        with self._lock:
+            self.samples[name].append(elapsed)
+
+    def record_completed(self):
+        with self._lock:
+            self.completed += 1
+
+    def sample(self, queued):
+        with self._lock:
+            self.backlog.append(queued)
+            for stage in STAGES[1:]:
+                self.occupancy[stage].append(self.active[stage])
+
+    def report(self, elapsed):
+        stages = {}
+        for stage in STAGES:
+            values = sorted(self.samples[stage])
+            occupancy = self.occupancy[stage] if stage != "queue" else self.backlog
+            stages[stage] = {
+                "count": len(values),
+                "total": sum(values),
+                **{f"p{pct}": percentile(values, pct) for pct in PERCENTILES},
+                "max": values[-1] if values else 0.0,
+                "avg_occupancy": sum(occupancy) / len(occupancy) if occupancy else 0.0,
+                "max_occupancy": max(occupancy) if occupancy else 0,
+            }
+        busiest = max(STAGES[1:], key=lambda stage: stages[stage]["avg_occupancy"])
+        return {
+            "elapsed": elapsed,
+            "completed": self.completed,
+            "failed": sum(self.errors.values()),
+            "throughput": self.completed / elapsed * 60 if elapsed else 0.0,
+            "stages": stages,
+            "bottleneck": busiest,
+            "errors": dict(self.errors),
+        }
+
+
+def print_report(report):
+    log.info("Orders signed", f"{report['completed']} in {report['elapsed']:.1f}s")
+    log.note("Throughput", f"{report['throughput']:.1f} orders/min")
+    if report["failed"]:
+        log.warn("Orders failed", report["failed"])
+        for error, count in report["errors"].items():
+            log.note(error, f"{count}x")
+    percentiles = ", ".join(f"p{pct}" for pct in PERCENTILES)
+    log.info("Stage latencies, ms", f"{percentiles}, max; avg/max orders in stage")
+    for stage, stats in report["stages"].items():
+        timings = ", ".join(f"{stats[f'p{pct}'] * 1000:.1f}" for pct in PERCENTILES)
+        log.note(stage, f"{timings}, {stats['max'] * 1000:.1f}; {stats['avg_occupancy']:.2f}/{stats['max_occupancy']}")
+    log.note("Queue builds up at", report["bottleneck"])
+
+
+def deploy_load_sellers(tx_params, mocks, count, funding):
+    """Deploys `count` WETH:DAI sellers of fresh beneficiaries and refills each with `funding` ETH"""
+    factory = OTCFactory.deploy(mocks.weth, mocks.vault, False, tx_params)
+    sellers = []
+    for _ in range(count):
+        beneficiary = accounts.add()
+        factory.createSeller(beneficiary, mocks.dai, mocks.weth, mocks.chainlink_dai_eth, MAX_MARGIN, 0, tx_params)
+        seller = OTCSeller.at(factory.getSellerFor(beneficiary, mocks.dai, mocks.weth))
+        tx_params["from"].transfer(seller.address, funding, silent=True)
+        sellers.append((seller, beneficiary))
+    return sellers
+
+
+def sign_flow(stats, job, executor, mocks):
+    """Runs one order through all stages, the timings of each stage are recorded in `stats`"""
+    (seller, beneficiary, sell_amount, valid_to) = job
+
+    with stats.stage("quote"):
+        (fee_amount, buy_amount) = api_get_quote(mocks.weth, mocks.dai, sell_amount, valid_to, seller.address, network=NETWORK, cache=False)
+
+    with stats.stage("make_order"):
+        order = make_order(mocks.weth, mocks.dai, beneficiary.address, sell_amount - fee_amount, buy_amount, valid_to, ZERO_APP_DATA, fee_amount)
+
+    with stats.stage("getOrderUid"):
+        orderUid = seller.getOrderUid(order)
+
+    with stats.stage("checkOrder"):
+        (checked, result) = seller.checkOrder(order, orderUid)
+        if not checked:
+            raise OrderError(f"Check order failed: {result}")
+
+    with stats.stage("api_create"):
+        if api_post_order(order.api_payload(seller.address), NETWORK) != orderUid:
+            raise OrderError("OrderUid mismatch")
+
+    with stats.stage("status"):
+        status = api_get_order_status(orderUid, NETWORK)
+        if status != PRESIGNATURE_PENDING:
+            raise OrderError(f"Wrong order status: {status}")
+
+    with stats.stage("signOrder"):
+        tx = seller.signOrder(order, orderUid, {"from": executor, "required_confs": 1, "silent": True})
+        if "OrderSigned" not in tx.events:
+            raise OrderError("OrderSigned event not found")
+
+
+def run_load(sellers, executors, mocks, orders, rate, sell_amount):
+    stats = LoadStats()
+    queue = Queue()
+    producing = [True]
+    valid_to = chain.time() + 3600
+
+    def worker(executor):
+        while producing[0] or not queue.empty():
+            try:
+                (enqueued_at, job) = queue.get(timeout=SAMPLE_INTERVAL)
+            except Empty:
+                continue
+            stats.record("queue", time.perf_counter() - enqueued_at)
+            try:
+                sign_flow(stats, job, executor, mocks)
+            except Exception:
+                # already counted against the failed stage
+                continue
+            stats.record_completed()
+
+    threads = [Thread(target=worker, args=(executor,), daemon=True) for executor in executors]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+
+    next_at = started
+    for index in range(orders):
+        (seller, beneficiary) = sellers[index % len(sellers)]
+        # distinct validTo keeps orderUids of the same seller unique
+        queue.put((time.perf_counter(), (seller, beneficiary, sell_amount, valid_to + index)))
+        stats.sample(queue.qsize())
+        if rate:
+            next_at += 1 / rate
+            time.sleep(max(0.0, next_at - time.perf_counter()))
+    producing[0] = False
+
+    while any(thread.is_alive() for thread in threads):
+        stats.sample(queue.qsize())
+        time.sleep(SAMPLE_INTERVAL)
+    return stats.report(time.perf_counter() - started)
+
+
+def main(orders=100, concurrency=4, sellers=2, rate=0, latency=0.05, jitter=0.0, orderAmount="0.1"):
+    (orders, concurrency, sellers, rate, latency, jitter) = (int(orders), int(concurrency), int(sellers), float(rate), float(latency), float(jitter))
+    if chain.id == 1:
+        log.error("Load test must run on a local dev chain, e.g. `--network development`")
+        return
+
+    deployer = accounts[0]
+    tx_params = {"from": deployer, "silent": True}
+    log.info("Deploying mocks and sellers...")
+    mocks = deploy_mocks(tx_params)
+    sell_amount = Amount.parse(orderAmount, 18).raw
+    per_seller = -(-orders // sellers)
+    load_sellers = deploy_load_sellers(tx_params, mocks, sellers, sell_amount * per_seller)
+    executors = []
+    for _ in range(concurrency):
+        executor = accounts.add()
+        deployer.transfer(executor, "1 ether", silent=True)
+        executors.append(executor)
+
+    price = get_oracle_price(load_sellers[0][0], mocks.weth)
+    domain = domain_separator(chain.id, cowswap_settlement)
+    with CowApiStandIn(domain, price, latency=latency, jitter=jitter) as api:
+        os.environ[COW_API_URL_ENV] = api.url
+        log.info("CowSwap API stand-in at", api.url)
+        log.note(
+            "Orders",
+            f"{orders} of {orderAmount} WETH, {sellers} sellers, {concurrency} workers, rate {rate or 'unbounded'}/s, API latency {latency * 1000:.0f}ms",
+        )
+        report = run_load(load_sellers, executors, mocks, orders, rate, sell_amount)
+    print_report(report)
+    return report
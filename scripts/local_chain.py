@@ -0,0 +1,38 @@
+from dotmap import DotMap
+from brownie import web3, MockERC20, MockWETH, MockChainlinkFeed, MockGPv2Settlement, MockVault
+from utils.config import cowswap_settlement
+
+# initial answer of the mock ETH price feeds, ~1250 USD per ETH
+MOCK_TOKEN_ETH_PRICE = 8 * 10**14
+
+
+def set_code(address, code):
+    """Places the runtime code at the address, the RPC method depends on the local node"""
+    for method in ("evm_setAccountCode", "hardhat_setCode", "anvil_setCode"):
+        try:
+            web3.provider.make_request(method, [address, code])
+        except Exception:
+            continue
+        if web3.eth.get_code(address).hex() == code:
+            return
+    raise RuntimeError(f"Local node does not support setting the code of {address}")
+
+
+def deploy_mocks(tx_params):
+    """Deploys the tokens, price feeds and DAO vault mocks to a local dev chain,
+    and places the GPv2 settlement mock code at the address hardcoded in OTCSeller"""
+    settlement = MockGPv2Settlement.deploy(tx_params)
+    set_code(cowswap_settlement, web3.eth.get_code(settlement.address).hex())
+    tokens = {
+        "dai": MockERC20.deploy("Dai Stablecoin", "DAI", 18, tx_params),
+        "usdc": MockERC20.deploy("USD Coin", "USDC", 6, tx_params),
+        "usdt": MockERC20.deploy("Tether USD", "USDT", 6, tx_params),
+    }
+    feeds = {f"chainlink_{name}_eth": MockChainlinkFeed.deploy(18, f"{name.upper()} / ETH", MOCK_TOKEN_ETH_PRICE, tx_params) for name in tokens}
+    return DotMap(
+        weth=MockWETH.deploy(tx_params).address,
+        **{name: token.address for name, token in tokens.items()},
+        **{name: feed.address for name, feed in feeds.items()},
+        vault=MockVault.deploy(tx_params).address,
+        settlement=cowswap_settlement,
+    )
@@ -1,19 +1,32 @@
+import time
 from datetime import datetime
-from brownie import chain, network, accounts, interface, OTCSeller, OTCFactory
+from brownie import chain, network, accounts, interface, OTCSeller, OTCSellerWithArgs, OTCFactory
 from brownie.utils import color
-from utils.cow import api_create_order, api_get_order_status, api_get_sell_fee
+from utils.cow import api_get_order, api_get_sell_fee, get_quote_cache
 from utils.deployed_state import read_or_update_state
 from utils.env import get_env
-from utils.helpers import formatUnit, parseUnit
+from utils.amount import Amount
+from utils.profiler import profile_rpc
+from utils.cassette import use_cassette
+from utils.ledger import OrderLedger
+from utils.fees import get_fee_strategy, fee_params
+from utils.order_sizing import QuoteCurve, min_buy_amount, optimize_split
+from utils.gpv2_order import SIGNING_SCHEME_PRESIGN, SIGNING_SCHEME_EIP1271
 import utils.log as log
+import utils.metrics as metrics
 from scripts.deploy import (
     deploy_factory,
     deploy_seller,
+    deploy_sellers,
+    prefetch_sellers,
+    read_sellers_plan,
+    verify_deployment,
     get_token_data,
     make_initialize_args,
     make_order,
     make_factory_constructor_args,
 )
+from scripts.order import OrderError, get_active_orders, get_oracle_price, submit_order, sign_order
 from utils.config import weth_token_address, lido_dao_agent_address
 from otc_seller_config import BENEFICIARY, MAX_MARGIN, CONST_PRICE
 
@@ -22,6 +35,13 @@ WEB3_INFURA_PROJECT_ID = get_env("WEB3_INFURA_PROJECT_ID")
 ETHERSCAN_TOKEN = get_env("ETHERSCAN_TOKEN")
 
 
+def rpcSelectors():
+    selectors = {}
+    for container in (OTCFactory, OTCSeller, interface.ERC20, interface.IChainlinkPriceFeedV3):
+        selectors.update(container.selectors)
+    return selectors
+
+
 def checkEnv():
     if not WEB3_INFURA_PROJECT_ID:
         log.error("`WEB3_INFURA_PROJECT_ID` env not found!")
@@ -67,14 +87,16 @@ def showTokensPrice(sellTokenAddress, buyTokenAddress, priceFeedAddress):
     reversePrice = (10 ** (18 + priceFeedDecimals)) // price
 
     log.info(f"{color('bright red')}!!! Check price feed response for correctness !!!")
-    directAmount = (parseUnit("1", sellTokenDecimals) * directPrice) / (10 ** (18 + sellTokenDecimals - buyTokenDecimals))
-    reverseAmount = (parseUnit("1", buyTokenDecimals) * reversePrice) / (10 ** (18 + buyTokenDecimals - sellTokenDecimals))
+    directAmount = Amount.parse(1, sellTokenDecimals).convert(directPrice, buyTokenDecimals)
+    reverseAmount = Amount.parse(1, buyTokenDecimals).convert(reversePrice, sellTokenDecimals)
 
-    log.note(f"Price for 1{sellTokenSymbol}", f"{formatUnit(directAmount, buyTokenDecimals)}{buyTokenSymbol}")
-    log.note(f"Price for 1{buyTokenSymbol}", f"{formatUnit(reverseAmount, sellTokenDecimals)}{sellTokenSymbol}")
+    log.note(f"Price for 1{sellTokenSymbol}", f"{directAmount}{buyTokenSymbol}")
+    log.note(f"Price for 1{buyTokenSymbol}", f"{reverseAmount}{sellTokenSymbol}")
 
 
-def deployFactory():
+@use_cassette
+@profile_rpc(rpcSelectors)
+def deployFactory(immutableArgs=False):
     log.info("-= OTCFactory deploy =-")
 
     checkEnv()
@@ -83,7 +105,8 @@ def deployFactory():
     log.note("NETWORK", network.show_active())
     log.note("DEPLOYER", deployer.address)
 
-    regArgs = make_factory_constructor_args(weth_token=weth_token_address, dao_vault=lido_dao_agent_address)
+    immutableArgs = str(immutableArgs).lower() in ("1", "true", "yes")
+    regArgs = make_factory_constructor_args(weth_token=weth_token_address, dao_vault=lido_dao_agent_address, immutable_args=immutableArgs)
 
     log.info("> factoryConstructorArgs:")
     for k, v in regArgs.items():
@@ -103,13 +126,14 @@ def deployFactory():
     proceedPrompt()
 
     log.note(f"OTCFactory deploy")
-    factory = deploy_factory({"from": deployer}, regArgs)
+    feeQuote = get_fee_strategy().quote("deployFactory")
+    factory = deploy_factory({"from": deployer, **fee_params(feeQuote)}, regArgs)
 
     if network.show_active() == "mainnet":
         proceed = log.prompt_yes_no("(Re)Try to publish source codes?")
         if proceed:
             OTCFactory.publish_source(factory)
-            OTCSeller.publish_source(factory.implementation())
+            (OTCSellerWithArgs if factory.immutableArgs() else OTCSeller).publish_source(factory.implementation())
             log.okay("Contract source published!")
     else:
         log.info(f"The current network '{network.show_active()}' is not 'mainnet'. Source publication skipped")
@@ -117,6 +141,8 @@ def deployFactory():
     log.note("All deployed metadata saved to", f"./deployed-{network.show_active()}.json")
 
 
+@use_cassette
+@profile_rpc(rpcSelectors)
 def deploySeller(sellTokenAddress, buyTokenAddress, priceFeedAddress, beneficiaryAddress=BENEFICIARY, maxMargin=MAX_MARGIN, constPrice=CONST_PRICE or 0):
     log.info("-= OTCSeller deploy =-")
 
@@ -145,15 +171,62 @@ def deploySeller(sellTokenAddress, buyTokenAddress, priceFeedAddress, beneficiar
     proceedPrompt()
 
     log.note(f"OTCSeller deploy")
-    seller = deploy_seller({"from": deployer}, args)
+    feeQuote = get_fee_strategy().quote("createSeller")
+    seller = deploy_seller({"from": deployer, **fee_params(feeQuote)}, args)
 
     log.note("All deployed metadata saved to", f"./deployed-{network.show_active()}.json")
 
 
-def signOrder(sellTokenAddress, buyTokenAddress, sellAmount, validPeriod=3600, beneficiaryAddress=BENEFICIARY):
+@use_cassette
+@profile_rpc(rpcSelectors)
+def deploySellers(planFilename="deploy-plan.json", maxMargin=MAX_MARGIN, constPrice=CONST_PRICE or 0):
+    log.info("-= OTCSeller bulk deploy =-")
+
+    checkEnv()
+    deployer = loadAccount("DEPLOYER")
+
+    log.note("NETWORK", network.show_active())
+    log.note("DEPLOYER", deployer.address)
+
+    deployedState = read_or_update_state()
+    if not deployedState.factoryAddress:
+        log.error("Factory not defined/deployed")
+        exit()
+    factory = OTCFactory.at(deployedState.factoryAddress)
+    log.info(f"Using factory at", factory.address)
+
+    sellersArgs = read_sellers_plan(planFilename, BENEFICIARY, maxMargin, constPrice)
+    planned = prefetch_sellers(factory, sellersArgs)
+
+    log.info(f"{color('bright red')}!!! Check sellers and price feed responses for correctness !!!")
+    for x in planned:
+        log.info(f"{x.sellTokenSymbol}:{x.buyTokenSymbol}", f"{x.sellerAddress} {'(exists, skipped)' if x.exists else ''}".strip())
+        for k, v in x.args.items():
+            log.note(k, v)
+        log.note(f"Price for 1{x.sellTokenSymbol}", f"{Amount(x.price, 18)}{x.buyTokenSymbol}")
+
+    if all(x.exists for x in planned):
+        log.okay("All planned sellers are already deployed")
+        return
+
+    proceedPrompt()
+
+    feeQuote = get_fee_strategy().quote("createSeller")
+    deployed = deploy_sellers({"from": deployer, **fee_params(feeQuote)}, factory, planned)
+    log.okay(f"{len(deployed)} OTCSeller(s) deployed")
+    log.note("All deployed metadata saved to", f"./deployed-{network.show_active()}.json")
+
+
+@use_cassette
+@profile_rpc(rpcSelectors)
+def signOrder(sellTokenAddress, buyTokenAddress, sellAmount, validPeriod=3600, beneficiaryAddress=BENEFICIARY, signingScheme=SIGNING_SCHEME_PRESIGN):
     log.info("-= Create and sign order =-")
+    if signingScheme not in (SIGNING_SCHEME_PRESIGN, SIGNING_SCHEME_EIP1271):
+        log.error(f"Unknown signing scheme `{signingScheme}`")
+        exit()
 
     txExecutor = loadAccount("EXECUTOR")
+    metrics.start()
 
     deployedState = read_or_update_state()
     if not deployedState.factoryAddress:
@@ -175,35 +248,39 @@ def signOrder(sellTokenAddress, buyTokenAddress, sellAmount, validPeriod=3600, b
 
     [sellToken, sellTokenSymbol, sellTokenDecimals] = get_token_data(sellTokenAddress)
     [buyToken, buyTokenSymbol, buyTokenDecimals] = get_token_data(buyTokenAddress)
-    sellAmount = parseUnit(sellAmount, sellTokenDecimals)
+    sellAmount = Amount.parse(sellAmount, sellTokenDecimals).raw
 
     if sellToken.balanceOf(sellerAddress) < sellAmount:
         log.error(f"Seller balance is below sell amount")
         exit()
 
     seller = OTCSeller.at(sellerAddress)
+    metrics.watch_seller(seller)
     receiver = seller.beneficiary()
     log.info(f"Getting fee amount...")
-    feeAmount, buyAmount = api_get_sell_fee(sellTokenAddress, buyTokenAddress, sellAmount, "mainnet")
+    # the quote of the signed order is never taken from the cache
+    feeAmount, quoteBuyAmount = api_get_sell_fee(sellTokenAddress, buyTokenAddress, sellAmount, "mainnet", cache=False)
     validTo = chain.time() + validPeriod
     appData = "0x0000000000000000000000000000000000000000000000000000000000000000"
 
     log.info("Order ready for sign", f"{sellTokenSymbol} -> {buyTokenSymbol}")
     log.note("sellToken", f"{sellTokenAddress} ({sellTokenSymbol})")
     log.note("buyToken", f"{buyTokenAddress} ({buyTokenSymbol})")
-    log.note("sellAmount", f"{formatUnit(sellAmount, sellTokenDecimals)}{sellTokenSymbol}")
-    log.note("buyAmount", f"{formatUnit(buyAmount, buyTokenDecimals)}{buyTokenSymbol}")
-    log.note("feeAmount", f"{formatUnit(feeAmount, sellTokenDecimals)}{sellTokenSymbol}")
+    log.note("sellAmount", f"{Amount(sellAmount, sellTokenDecimals)}{sellTokenSymbol}")
+    log.note("buyAmount", f"{Amount(quoteBuyAmount, buyTokenDecimals)}{buyTokenSymbol}")
+    log.note("feeAmount", f"{Amount(feeAmount, sellTokenDecimals)}{sellTokenSymbol}")
     log.note("validTo", datetime.fromtimestamp(validTo))
+    log.note("signingScheme", signingScheme)
     log.note("txExecutor", txExecutor)
 
     log.info(f"{color('bright red')}!!! Check min buy amount for correctness !!!")
-    [price, maxMargin] = factory.getPriceAndMaxMargin(sellTokenAddress, buyTokenAddress)
-    buyAmount = ((sellAmount * price * (10000 - maxMargin)) // 10000) // (10 ** (18 + sellTokenDecimals - buyTokenDecimals))
-    log.note("Sell amount", f"{formatUnit(sellAmount, sellTokenDecimals)}{sellTokenSymbol}")
-    log.note("Min buy amount", f"{formatUnit(buyAmount, buyTokenDecimals)}{buyTokenSymbol}")
+    buyAmount = seller.minBuyAmount(sellTokenAddress, buyTokenAddress, sellAmount)
+    log.note("Sell amount", f"{Amount(sellAmount, sellTokenDecimals)}{sellTokenSymbol}")
+    log.note("Min buy amount", f"{Amount(buyAmount, buyTokenDecimals)}{buyTokenSymbol}")
 
     proceedPrompt()
+    # the confirmation prompt wait is not a part of the sign flow time
+    started = time.monotonic()
 
     log.info("Checking order...")
     order = make_order(
@@ -217,45 +294,120 @@ def signOrder(sellTokenAddress, buyTokenAddress, sellAmount, validPeriod=3600, b
         fee_amount=feeAmount,
         partiallyFillable=False,
     )
-    orderUidCalculated = seller.getOrderUid(order)
-    if not seller.checkOrder(order, orderUidCalculated):
-        log.error(f"Check order failed!")
+    try:
+        orderUid = submit_order(seller, order, "mainnet", signingScheme)
+    except OrderError as err:
+        log.error(str(err))
+        metrics.observe_sign_order(started, "cli", "rejected")
         exit()
-    log.okay("Order is correct")
-    log.info("Creating CowSwap order (via API)...")
-    orderUid = api_create_order(
-        sell_token=sellTokenAddress,
-        buy_token=buyTokenAddress,
-        sell_amount=sellAmount,
-        buy_amount=buyAmount,
-        fee_amount=feeAmount,
-        valid_to=validTo,
-        sender=sellerAddress,
-        receiver=receiver,
-        partiallyFillable=False,
-        app_data=appData,
-        network="mainnet",
+
+    if signingScheme == SIGNING_SCHEME_EIP1271:
+        # validated by the seller isValidSignature, no sign tx
+        log.okay("Order is open")
+        metrics.observe_sign_order(started, "cli", "signed")
+        OrderLedger().record_order(order, orderUid, sellerAddress, quote=(feeAmount, quoteBuyAmount), oracle_price=get_oracle_price(seller, sellTokenAddress))
+        return
+
+    feeQuote = get_fee_strategy().quote("signOrder", validTo)
+    try:
+        tx = sign_order(seller, order, orderUid, {"from": txExecutor, **fee_params(feeQuote)})
+    except Exception:
+        metrics.observe_sign_order(started, "cli", "failed")
+        raise
+    metrics.observe_sign_order(started, "cli", "signed")
+    get_fee_strategy().record_inclusion(feeQuote, tx.txid, tx.block_number)
+    OrderLedger().record_order(
+        order, orderUid, sellerAddress, quote=(feeAmount, quoteBuyAmount), oracle_price=get_oracle_price(seller, sellTokenAddress), sign_tx=tx.txid
     )
 
-    if orderUid != orderUidCalculated:
-        log.error(f"OrderUid mismatch")
+
+@use_cassette
+@profile_rpc(rpcSelectors)
+def verifyDeployment(force=False):
+    log.info("-= Verify deployment =-")
+    force = str(force).lower() in ("1", "true", "yes")
+    deployedState = read_or_update_state()
+    if not deployedState.factoryAddress:
+        log.error("Factory not defined/deployed")
         exit()
+    factory = OTCFactory.at(deployedState.factoryAddress)
+    log.info(f"Using factory at", factory.address)
+
+    (stateUpdate, failed) = verify_deployment(factory, deployedState, force)
+    read_or_update_state(stateUpdate)
+    if failed:
+        log.error("Sellers check failed", ", ".join(failed))
+        exit(1)
+    log.okay("Deployment verified")
+
+
+def syncOrders():
+    log.info("-= Sync orders ledger =-")
+    ledger = OrderLedger()
+    for row in ledger.open_orders():
+        order = api_get_order(row["order_uid"], "mainnet")
+        # `executedSellAmount` includes the fee, the ledger keeps the executed amount comparable to the order sellAmount
+        executed = (order["executedSellAmountBeforeFees"], order["executedBuyAmount"], order["executedFeeAmount"])
+        ledger.set_status(row["order_uid"], order["status"], executed)
+        log.note(row["order_uid"], order["status"])
+    log.okay("Orders ledger synced")
+
+
+def activeOrders(sellerAddress, pageSize=100):
+    log.info("-= Seller active orders =-")
+    seller = OTCSeller.at(sellerAddress)
+    orders = get_active_orders(seller, int(pageSize))
+    for (orderUid, sellAmount, validTo, filledAmount, _) in orders:
+        log.note(orderUid, f"sellAmount {sellAmount}, filled {filledAmount}, validTo {datetime.fromtimestamp(validTo)}")
+    log.okay(f"{len(orders)} active order(s) of {seller.ordersCount()} registered")
+
 
-    log.okay("CowSwap order created, orderUid", orderUid)
-    log.info("Check order status...")
-    status = api_get_order_status(orderUid, "mainnet")
-    log.note("Order status", status)
-    if status != "presignaturePending":
-        log.error("Wrong order status, aborting...")
+def exportOrders(filename="orders.csv"):
+    ledger = OrderLedger()
+    if filename.endswith(".parquet"):
+        ledger.export_parquet(filename)
+    else:
+        ledger.export_csv(filename)
+    log.okay("Orders ledger exported to", filename)
+
+
+def planOrder(sellTokenAddress, buyTokenAddress, totalAmount, maxSlices=8, beneficiaryAddress=BENEFICIARY):
+    log.info("-= Plan order size =-")
+
+    deployedState = read_or_update_state()
+    if not deployedState.factoryAddress:
+        log.error("Factory not defined/deployed")
         exit()
+    factory = OTCFactory.at(deployedState.factoryAddress)
+    sellerAddress = factory.getSellerFor(beneficiaryAddress, sellTokenAddress, buyTokenAddress)
+    if not factory.isSellerExists(sellerAddress):
+        log.error(f"Seller for pair {sellTokenAddress}:{buyTokenAddress} is not defined/deployed")
+        exit()
+    seller = OTCSeller.at(sellerAddress)
 
-    log.info("Sending sign order tx...")
-    tx = seller.signOrder(order, orderUid, {"from": txExecutor})
-    assert "OrderSigned" in tx.events
-    assert tx.events["OrderSigned"]["orderUid"] == orderUid
-    assert "PreSignature" in tx.events
-    assert tx.events["PreSignature"]["orderUid"] == orderUid
-    assert tx.events["PreSignature"]["signed"] == True
+    [_, sellTokenSymbol, sellTokenDecimals] = get_token_data(sellTokenAddress)
+    [_, buyTokenSymbol, buyTokenDecimals] = get_token_data(buyTokenAddress)
+    totalAmount = Amount.parse(totalAmount, sellTokenDecimals).raw
+
+    # the floor is evaluated locally, so the slices don't cost a minBuyAmount call each
+    (price, maxMargin) = seller.priceAndMaxMargin() if sellTokenAddress == seller.tokenA() else seller.reversePriceAndMaxMargin()
+    curve = QuoteCurve(lambda amount: api_get_sell_fee(sellTokenAddress, buyTokenAddress, amount, "mainnet"))
+    plan = optimize_split(
+        totalAmount,
+        curve.quote,
+        lambda amount: min_buy_amount(amount, price, maxMargin, sellTokenDecimals, buyTokenDecimals),
+        max_slices=int(maxSlices),
+        curve=curve,
+    )
+    log.note("Quotes requested", f"{curve.requests} (cache {get_quote_cache().stats()})")
+    if plan is None:
+        log.error("No split passes the seller order checks")
+        exit()
 
-    log.info("> txHash:", tx.txid)
-    log.okay("Order signed")
+    log.okay(f"Best split: {plan.count} order(s)", f"fee {plan.fee_ratio * 100:.3f}%")
+    for (amount, fee, buy, floor) in plan.slices:
+        log.note(
+            f"{Amount(amount, sellTokenDecimals)}{sellTokenSymbol}",
+            f"fee {Amount(fee, sellTokenDecimals)}{sellTokenSymbol}, quote {Amount(buy, buyTokenDecimals)}{buyTokenSymbol}, min {Amount(floor, buyTokenDecimals)}{buyTokenSymbol}",
+        )
+    log.note("Expected proceeds", f"{Amount(plan.proceeds, buyTokenDecimals)}{buyTokenSymbol}")
@@ -0,0 +1,76 @@
+from brownie import interface
+from utils.cow import api_post_order, api_get_order_status
+from utils.gpv2_order import SIGNING_SCHEME_PRESIGN, SIGNING_SCHEME_EIP1271
+from utils.config import cowswap_vault_relayer
+import utils.log as log
+
+
+class OrderError(Exception):
+    pass
+
+
+# CowSwap API status of a just created order
+CREATED_STATUS = {SIGNING_SCHEME_PRESIGN: "presignaturePending", SIGNING_SCHEME_EIP1271: "open"}
+
+
+def submit_order(seller, order, network="mainnet", signing_scheme=SIGNING_SCHEME_PRESIGN):
+    """Checks the Order against the seller rules and creates it via CowSwap API, returns orderUid.
+    Presign orders are to be signed by `sign_order`, `eip1271` ones are valid once created"""
+    orderUidCalculated = seller.getOrderUid(order)
+    (checked, result) = seller.checkOrder(order, orderUidCalculated)
+    if not checked:
+        raise OrderError(f"Check order failed: {result}")
+    log.okay("Order is correct")
+    if signing_scheme == SIGNING_SCHEME_EIP1271:
+        check_relayer_allowance(seller, order)
+
+    log.info("Creating CowSwap order (via API)...")
+    orderUid = api_post_order(order.api_payload(seller.address, signing_scheme), network)
+    if orderUid != orderUidCalculated:
+        raise OrderError("OrderUid mismatch")
+    log.okay("CowSwap order created, orderUid", orderUid)
+
+    log.info("Check order status...")
+    status = api_get_order_status(orderUid, network)
+    log.note("Order status", status)
+    if status != CREATED_STATUS[signing_scheme]:
+        raise OrderError(f"Wrong order status: {status}")
+
+    return orderUid
+
+
+def check_relayer_allowance(seller, order):
+    """`eip1271` orders are filled within the relayer allowance added by the beneficiary `increaseRelayerAllowance`"""
+    allowance = interface.ERC20(order.sell_token).allowance(seller.address, cowswap_vault_relayer)
+    if allowance < order.sell_amount + order.fee_amount:
+        raise OrderError(f"Relayer allowance {allowance} is below the order sell and fee amount")
+
+
+def get_oracle_price(seller, sell_token):
+    """Seller price feed (or constant) price of the sell token in buy tokens, normalized to 1e18"""
+    (price, _) = seller.priceAndMaxMargin() if sell_token == seller.tokenA() else seller.reversePriceAndMaxMargin()
+    return price
+
+
+def get_active_orders(seller, page_size=100):
+    """Open orders of the seller registry, read by `getActiveOrders` pages of `page_size` entries"""
+    (orders, offset) = ([], 0)
+    count = seller.ordersCount()
+    while offset < count:
+        (page, offset) = seller.getActiveOrders(offset, page_size)
+        orders += page
+    return orders
+
+
+def sign_order(seller, order, orderUid, tx_params):
+    log.info("Sending sign order tx...")
+    tx = seller.signOrder(order, orderUid, tx_params)
+    assert "OrderSigned" in tx.events
+    assert tx.events["OrderSigned"]["orderUid"] == orderUid
+    assert "PreSignature" in tx.events
+    assert tx.events["PreSignature"]["orderUid"] == orderUid
+    assert tx.events["PreSignature"]["signed"] == True
+
+    log.info("> txHash:", tx.txid)
+    log.okay("Order signed")
+    return tx
@@ -0,0 +1,118 @@
+"""Chainlink rounds history of the seller price feeds, recorded without loading the brownie project.
+
+    python -m scripts.price_history [--network mainnet] [--rpc URL] [--dir DIR] <command> [args]
+
+Commands:
+    record <feed> [--since TIMESTAMP]     backfill the rounds updated since the timestamp, then the new ones
+    follow <feed> [--interval SECONDS]    record new rounds as they appear
+    price <feed> <timestamp>              feed answer effective at the timestamp and its age
+    stats <feed> [--from TS] [--to TS]    update intervals and answer changes over the period
+
+`<feed>` is a feed address or one of the known feed names: dai, usdc, usdt, ldo, steth.
+"""
+import argparse
+import math
+import os
+import time
+from datetime import datetime
+from utils.light_rpc import RpcClient
+from utils.price_history import RoundHistory, RoundRecorder
+from scripts.readonly import get_rpc_url
+import utils.log as log
+
+# same as the `chainlink_*_eth` feeds of utils/config.py, which can't be imported without brownie
+FEEDS = {
+    "dai": "0x773616E4d11A78F511299002da57A0a94577F1f4",
+    "usdc": "0x986b5E1e1755e3C2440e960477f25201B0a8bbD4",
+    "usdt": "0xEe9F2375b4bdF6387aa8265dD4FB8F16512A1d46",
+    "ldo": "0x4e844125952D32AcdF339BE976c98E22F6F318dB",
+    "steth": "0x86392dC19c0b719886221c78AB11eb8Cf5c52812",
+}
+
+
+def open_history(args):
+    address = FEEDS.get(args.feed.lower(), args.feed)
+    return (address, RoundHistory(os.path.join(args.dir or f"./price-history-{args.network}", address.lower())))
+
+
+def make_recorder(args, address, history):
+    client = RpcClient(args.rpc or get_rpc_url(args.network))
+    recorder = RoundRecorder(client, address, history, batch_size=args.batch_size, workers=args.workers)
+    if "decimals" not in history.meta:
+        history.set_meta(feed=address, decimals=recorder.feed.call("decimals"))
+    return recorder
+
+
+def cmd_record(args):
+    (address, history) = open_history(args)
+    recorder = make_recorder(args, address, history)
+    started = time.perf_counter()
+    added = recorder.backfill(args.since or 0) if args.since is not None or not len(history) else recorder.sync()
+    log.okay(f"{added} rounds recorded in {time.perf_counter() - started:.1f}s", f"{len(history)} stored")
+
+
+def cmd_follow(args):
+    (address, history) = open_history(args)
+    make_recorder(args, address, history).follow(args.interval)
+
+
+def cmd_price(args):
+    (_, history) = open_history(args)
+    decimals = history.meta.get("decimals", 18)
+    row = history.round_at(args.timestamp)
+    if row is None:
+        log.error("No rounds recorded before", datetime.fromtimestamp(args.timestamp))
+        return
+    (round_id, answer, updated_at) = row
+    log.note("roundId", round_id)
+    log.note("answer", answer / 10**decimals)
+    log.note("updatedAt", datetime.fromtimestamp(updated_at))
+    log.note("age", f"{args.timestamp - updated_at}s")
+
+
+def cmd_stats(args):
+    (_, history) = open_history(args)
+    rows = history.range(args.start or 0, args.end or int(time.time()))
+    if len(rows) < 2:
+        log.error("Not enough rounds recorded in the period", len(rows))
+        return
+    intervals = [b[2] - a[2] for (a, b) in zip(rows, rows[1:])]
+    changes = [math.log(b[1] / a[1]) for (a, b) in zip(rows, rows[1:]) if a[1] > 0 and b[1] > 0]
+    mean = sum(changes) / len(changes)
+    log.note("rounds", len(rows))
+    log.note("period", f"{datetime.fromtimestamp(rows[0][2])} - {datetime.fromtimestamp(rows[-1][2])}")
+    log.note("update interval avg/max", f"{sum(intervals) / len(intervals):.0f}s / {max(intervals)}s")
+    log.note("answer change per round stdev", f"{math.sqrt(sum((x - mean) ** 2 for x in changes) / len(changes)) * 100:.3f}%")
+    log.note("answer change per round max", f"{max(abs(x) for x in changes) * 100:.3f}%")
+
+
+COMMANDS = {"record": cmd_record, "follow": cmd_follow, "price": cmd_price, "stats": cmd_stats}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m scripts.price_history", description="Chainlink rounds history")
+    parser.add_argument("--network", default="mainnet")
+    parser.add_argument("--rpc", help="JSON-RPC endpoint url, defaults to RPC_URL env or Infura")
+    parser.add_argument("--dir", help="history directory, defaults to ./price-history-{NETWORK}")
+    parser.add_argument("--batch-size", type=int, default=100, help="getRoundData calls per JSON-RPC batch")
+    parser.add_argument("--workers", type=int, default=4, help="batches sent concurrently")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record = commands.add_parser("record")
+    record.add_argument("feed")
+    record.add_argument("--since", type=int)
+    follow = commands.add_parser("follow")
+    follow.add_argument("feed")
+    follow.add_argument("--interval", type=int, default=60)
+    price = commands.add_parser("price")
+    price.add_argument("feed")
+    price.add_argument("timestamp", type=int)
+    stats = commands.add_parser("stats")
+    stats.add_argument("feed")
+    stats.add_argument("--from", dest="start", type=int)
+    stats.add_argument("--to", dest="end", type=int)
+    args = parser.parse_args(argv)
+    COMMANDS[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
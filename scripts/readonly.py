@@ -0,0 +1,140 @@
+"""Fast-start read-only commands, talking to the node directly without loading the brownie project.
+
+    python -m scripts.readonly [--network mainnet] [--rpc URL] [--timing] <command> [args]
+
+Commands:
+    sellers                  list sellers from ./deployed-{NETWORK}.json
+    seller <sellerAddress>   seller config, prices and balances
+    price <sellerAddress>    seller Chainlink/constant price for both directions
+    order <orderUid>         CowSwap API status and on-chain state of an order
+"""
+import time
+
+started = time.perf_counter()
+
+import argparse
+import json
+import os
+import sys
+import urllib.request
+from utils.light_rpc import Contract, RpcClient, batch_call
+from utils.cassette import client_cassette
+from utils.amount import Amount
+import utils.log as log
+
+COWSWAP_SETTLEMENT = "0x9008D19f58AAbD9eD0D60971565AA8510560ab41"
+
+
+def get_rpc_url(network):
+    url = os.getenv("RPC_URL")
+    if url:
+        return url
+    infura_id = os.getenv("WEB3_INFURA_PROJECT_ID")
+    if not infura_id:
+        # same .env file as the brownie scripts, loaded only when the env is not exported
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        infura_id = os.getenv("WEB3_INFURA_PROJECT_ID")
+    if not infura_id:
+        log.error("Either `RPC_URL` or `WEB3_INFURA_PROJECT_ID` env is required")
+        sys.exit(1)
+    return f"https://{network}.infura.io/v3/{infura_id}"
+
+
+def token_info(client, addresses, holder=None):
+    calls = []
+    for address in addresses:
+        token = Contract(client, "ERC20", address)
+        calls += [(token, "symbol", ()), (token, "decimals", ())]
+        if holder:
+            calls.append((token, "balanceOf", (holder,)))
+    results = batch_call(client, calls)
+    step = 3 if holder else 2
+    return [results[i : i + step] for i in range(0, len(results), step)]
+
+
+def cmd_sellers(client, args):
+    filename = f"./deployed-{args.network}.json"
+    if not os.path.exists(filename):
+        log.error("Deployed state not found", filename)
+        return
+    with open(filename) as fp:
+        state = json.load(fp)
+    log.info("Factory", state.get("factoryAddress"))
+    for seller in state.get("sellers", []):
+        log.note(f"{seller.get('tokenASymbol')}:{seller.get('tokenBSymbol')}", seller["sellerAddress"])
+
+
+def cmd_seller(client, args):
+    seller = Contract(client, "OTCSeller", args.address)
+    [beneficiary, tokenA, tokenB, pairConfig, (price, maxMargin)] = batch_call(
+        client,
+        [(seller, "beneficiary", ()), (seller, "tokenA", ()), (seller, "tokenB", ()), (seller, "getPairConfig", ()), (seller, "priceAndMaxMargin", ())],
+    )
+    [[symbolA, decimalsA, balanceA], [symbolB, decimalsB, balanceB]] = token_info(client, [tokenA, tokenB], args.address)
+    (priceFeed, _, reverse, constantPrice) = pairConfig
+
+    log.info("Seller", args.address)
+    log.note("beneficiary", beneficiary)
+    log.note("tokenA", f"{tokenA} ({symbolA})")
+    log.note("tokenB", f"{tokenB} ({symbolB})")
+    log.note("priceFeed", priceFeed)
+    log.note("constantPrice", constantPrice)
+    log.note("reverse", reverse)
+    log.note("maxMargin", f"{maxMargin / 100}%")
+    log.note(f"Price for 1{symbolA}", f"{Amount(price, 18)}{symbolB}")
+    log.note(f"Balance {symbolA}", Amount(balanceA, decimalsA))
+    log.note(f"Balance {symbolB}", Amount(balanceB, decimalsB))
+
+
+def cmd_price(client, args):
+    seller = Contract(client, "OTCSeller", args.address)
+    [tokenA, tokenB, (price, maxMargin), (reversePrice, _)] = batch_call(
+        client, [(seller, "tokenA", ()), (seller, "tokenB", ()), (seller, "priceAndMaxMargin", ()), (seller, "reversePriceAndMaxMargin", ())]
+    )
+    [[symbolA, _], [symbolB, _]] = token_info(client, [tokenA, tokenB])
+    log.note(f"Price for 1{symbolA}", f"{Amount(price, 18)}{symbolB}")
+    log.note(f"Price for 1{symbolB}", f"{Amount(reversePrice, 18)}{symbolA}")
+    log.note("maxMargin", f"{maxMargin / 100}%")
+
+
+def cmd_order(client, args):
+    settlement = Contract(client, "Settlement", COWSWAP_SETTLEMENT)
+    [filledAmount, preSignature] = batch_call(client, [(settlement, "filledAmount", (args.orderUid,)), (settlement, "preSignature", (args.orderUid,))])
+    with urllib.request.urlopen(f"https://api.cow.fi/{args.network}/api/v1/orders/{args.orderUid}", timeout=30) as response:
+        order = json.load(response)
+    log.note("Order status", order["status"])
+    log.note("sellAmount", order["sellAmount"])
+    log.note("buyAmount", order["buyAmount"])
+    log.note("executedSellAmount", order.get("executedSellAmount"))
+    log.note("executedBuyAmount", order.get("executedBuyAmount"))
+    log.note("filledAmount (on-chain)", filledAmount)
+    log.note("presigned (on-chain)", preSignature != 0)
+
+
+COMMANDS = {"sellers": cmd_sellers, "seller": cmd_seller, "price": cmd_price, "order": cmd_order}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m scripts.readonly", description="Fast-start read-only commands")
+    parser.add_argument("--network", default="mainnet")
+    parser.add_argument("--rpc", help="JSON-RPC endpoint url, defaults to RPC_URL env or Infura")
+    parser.add_argument("--timing", action="store_true", help="print elapsed time since the module import")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("sellers")
+    commands.add_parser("seller").add_argument("address")
+    commands.add_parser("price").add_argument("address")
+    commands.add_parser("order").add_argument("orderUid")
+    args = parser.parse_args(argv)
+
+    client = None if args.command == "sellers" else RpcClient(args.rpc or get_rpc_url(args.network))
+    with client_cassette(client):
+        COMMANDS[args.command](client, args)
+
+    if args.timing:
+        log.info("Elapsed", f"{(time.perf_counter() - started) * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
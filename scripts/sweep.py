@@ -0,0 +1,160 @@
+"""Sweeps the sale proceeds and stray assets of the sellers to their beneficiaries.
+
+    EXECUTOR=<account> brownie run --network mainnet sweep main [<recoverFilename>]
+
+Balances of the pair tokens, the `SWEEP_TOKENS` and ether (by the Multicall2 `getEthBalance`) of all our sellers are read in multicall batches.
+Transfers of the sellers of the DAO Agent beneficiary are aggregated into a single Agent EVM script of one vote,
+the EXECUTOR must hold LDO to start it. For the sellers whose beneficiary is the EXECUTOR, transfers are sent as pipelined txs.
+
+`recoverFilename` lists the ERC721/ERC1155 tokens to recover, which can't be found by balances:
+    [{"seller": "0x...", "standard": "erc721", "token": "0x...", "tokenId": 1},
+     {"seller": "0x...", "standard": "erc1155", "token": "0x...", "tokenId": 1, "amount": 10}]
+"""
+import json
+from brownie import interface, multicall, OTCSeller
+from brownie.network.multicall import MULTICALL2_ABI
+from utils.deployed_state import read_or_update_state
+from utils.dao import create_vote, encode_agent_execute
+from utils.evm_script import encode_call_script
+from utils.fees import get_fee_strategy, fee_params
+from utils.helpers import view_call
+from utils.tx_pipeline import TxPipeline, CONFIRMED
+import utils.log as log
+from scripts.ingest import find_our_sellers
+from scripts.main import checkEnv, loadAccount, proceedPrompt
+from utils.config import (
+    weth_token_address,
+    dai_token_address,
+    usdc_token_address,
+    usdt_token_address,
+    ldo_token_address,
+    steth_token_address,
+    lido_dao_agent_address,
+    lido_dao_voting_address,
+    lido_dao_token_manager_address,
+)
+
+# stray ERC20 tokens looked up on every seller besides its pair tokens
+SWEEP_TOKENS = [weth_token_address, dai_token_address, usdc_token_address, usdt_token_address, ldo_token_address, steth_token_address]
+
+
+def find_assets(sellerAddresses, tokens=SWEEP_TOKENS):
+    """[(seller, beneficiary, token, balance), ...] of the non-zero seller balances, `token` is None for ether.
+    All balances are read in multicall batches, contract objects are made only for the sellers with assets to sweep"""
+    with multicall():
+        pairs = [(address, *(view_call(OTCSeller.abi, address, name)() for name in ("beneficiary", "tokenA", "tokenB"))) for address in sellerAddresses]
+    pairs = [(address, str(beneficiary), str(tokenA), str(tokenB)) for (address, beneficiary, tokenA, tokenB) in pairs]
+
+    with multicall():
+        balances = [
+            (address, beneficiary, token, view_call(interface.ERC20.abi, token, "balanceOf")(address))
+            for (address, beneficiary, tokenA, tokenB) in pairs
+            # the pair tokens go first, a token is read once per seller
+            for token in {x.lower(): x for x in (tokenA, tokenB, *tokens)}.values()
+        ]
+        # received ether is wrapped by the seller, a balance is only possible by a forced transfer
+        balances += [
+            (address, beneficiary, None, view_call(MULTICALL2_ABI, multicall.address, "getEthBalance")(address)) for (address, beneficiary, _, _) in pairs
+        ]
+    sellers = {}
+    assets = []
+    for (address, beneficiary, token, balance) in balances:
+        if int(balance) > 0:
+            if address not in sellers:
+                sellers[address] = OTCSeller.at(address)
+            assets.append((sellers[address], beneficiary, token, int(balance)))
+    return assets
+
+
+def read_recover_file(filename):
+    with open(filename) as fp:
+        return json.load(fp)
+
+
+def make_sweep_actions(assets, recover=()):
+    """[(seller, beneficiary, method, args), ...] of the transfers to the seller beneficiaries"""
+    actions = [
+        (seller, beneficiary, "transferEther", (balance,)) if token is None else (seller, beneficiary, "transferERC20", (token, balance))
+        for (seller, beneficiary, token, balance) in assets
+    ]
+    for item in recover:
+        seller = OTCSeller.at(item["seller"])
+        if item["standard"] == "erc721":
+            (method, args) = ("transferERC721", (item["token"], int(item["tokenId"]), "0x"))
+        elif item["standard"] == "erc1155":
+            (method, args) = ("transferERC1155", (item["token"], int(item["tokenId"]), int(item["amount"]), "0x"))
+        else:
+            raise ValueError(f"Unknown token standard `{item['standard']}` of the recover entry")
+        actions.append((seller, str(seller.beneficiary()), method, args))
+    return actions
+
+
+def encode_sweep_script(actions, agent):
+    """The transfers called by the Agent, pair token transfers are allowed only for the beneficiary"""
+    return encode_call_script(
+        [
+            encode_agent_execute(target=seller.address, call_value=0, call_data=getattr(seller, method).encode_input(*args), agent=agent)
+            for (seller, _, method, args) in actions
+        ]
+    )
+
+
+def start_dao_vote_sweep(tx_params, actions):
+    agent = interface.Agent(lido_dao_agent_address)
+    return create_vote(
+        voting=interface.Voting(lido_dao_voting_address),
+        token_manager=interface.TokenManager(lido_dao_token_manager_address),
+        vote_desc=f"Sweep {len(actions)} asset(s) of {len({seller.address for (seller, _, _, _) in actions})} OTC seller(s) to the DAO Agent",
+        evm_script=encode_sweep_script(actions, agent),
+        tx_params=tx_params,
+    )
+
+
+def send_sweep_txs(actions, account, tx_params=None):
+    pipeline = TxPipeline(account)
+    for (seller, _, method, args) in actions:
+        entry = pipeline.submit(getattr(seller, method), *args, tx_params=tx_params)
+        log.info(f"{method} {seller.address} > txHash:", entry.txid)
+    return pipeline.wait_all()
+
+
+def main(recoverFilename=None):
+    log.info("-= Sellers assets sweep =-")
+
+    checkEnv()
+    executor = loadAccount("EXECUTOR")
+    deployedState = read_or_update_state()
+    sellers = find_our_sellers(deployedState)
+    if not sellers:
+        log.error("No deployed sellers found")
+        exit()
+    log.note("Sellers", len(sellers))
+
+    actions = make_sweep_actions(find_assets(sellers), read_recover_file(recoverFilename) if recoverFilename else ())
+    if not actions:
+        log.okay("Nothing to sweep")
+        return
+    for (seller, beneficiary, method, args) in actions:
+        log.note(f"{seller.address} -> {beneficiary}", f"{method}{args}")
+
+    daoActions = [x for x in actions if x[1] == lido_dao_agent_address]
+    ownActions = [x for x in actions if x[1] == executor.address]
+    skipped = len(actions) - len(daoActions) - len(ownActions)
+    if skipped:
+        log.warn("Transfers to other beneficiaries are skipped", skipped)
+    log.info("Agent EVM script transfers", len(daoActions))
+    log.info("EXECUTOR beneficiary transfers", len(ownActions))
+    proceedPrompt()
+
+    feeQuote = get_fee_strategy().quote("sweep")
+    tx_params = fee_params(feeQuote)
+    if daoActions:
+        (vote_id, tx) = start_dao_vote_sweep({"from": executor, **tx_params}, daoActions)
+        log.okay(f"Sweep vote #{vote_id} started, txHash", tx.txid)
+    if ownActions:
+        entries = send_sweep_txs(ownActions, executor, tx_params)
+        failed = [entry.txid for entry in entries if entry.status != CONFIRMED]
+        if failed:
+            log.error("Sweep txs failed", ", ".join(failed))
+        else:
+            log.okay("Sweep txs confirmed", len(entries))
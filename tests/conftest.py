@@ -1,6 +1,7 @@
 import sys
 import pytest
-from brownie import chain, web3
+from dotmap import DotMap
+from brownie import chain, network, web3, MockERC20
 import utils.log as log
 from scripts.deploy import (
     deploy_factory,
@@ -10,6 +11,7 @@ from scripts.deploy import (
     make_order,
     make_initialize_args,
 )
+from scripts.local_chain import deploy_mocks
 
 from utils.config import (
     weth_token_address,
@@ -19,15 +21,20 @@ from utils.config import (
     lido_dao_voting_address,
     lido_dao_token_manager_address,
     dai_token_address,
+    usdc_token_address,
+    usdt_token_address,
     ldo_vote_executors_for_tests,
     cowswap_settlement,
     chainlink_dai_eth,
+    chainlink_usdc_eth,
+    chainlink_usdt_eth,
 )
 
 
 def pytest_configure(config):
     # import sys
     sys._called_from_test = True
+    config.addinivalue_line("markers", "offline: pure Python tests, run without the chain isolation")
 
 
 def pytest_unconfigure(config):
@@ -36,8 +43,36 @@ def pytest_unconfigure(config):
 
 
 @pytest.fixture(scope="function", autouse=True)
-def shared_setup(fn_isolation):
-    pass
+def shared_setup(request):
+    if request.node.get_closest_marker("offline") is None:
+        request.getfixturevalue("fn_isolation")
+
+
+@pytest.fixture(scope="session")
+def local_chain():
+    """True when tests run on a plain local dev chain instead of the mainnet fork"""
+    return "fork" not in network.show_active()
+
+
+@pytest.fixture(scope="module")
+def mocks(module_isolation, local_chain, accounts):
+    """Addresses of the tokens, price feeds, DAO vault and CowSwap settlement used by the tests.
+    On the mainnet fork these are the mainnet contracts, on a local chain the mocks are deployed,
+    and the settlement mock code is placed at the address hardcoded in OTCSeller"""
+    if not local_chain:
+        return DotMap(
+            weth=weth_token_address,
+            dai=dai_token_address,
+            usdc=usdc_token_address,
+            usdt=usdt_token_address,
+            chainlink_dai_eth=chainlink_dai_eth,
+            chainlink_usdc_eth=chainlink_usdc_eth,
+            chainlink_usdt_eth=chainlink_usdt_eth,
+            vault=lido_dao_agent_address,
+            settlement=cowswap_settlement,
+        )
+
+    return deploy_mocks({"from": accounts[0]})
 
 
 @pytest.fixture(scope="module")
@@ -51,13 +86,13 @@ def stranger(accounts):
 
 
 @pytest.fixture(scope="module")
-def dai_token(interface):
-    return interface.Dai(dai_token_address)
+def dai_token(interface, mocks):
+    return interface.Dai(mocks.dai)
 
 
 @pytest.fixture(scope="module")
-def weth_token(interface):
-    return interface.ERC20(weth_token_address)
+def weth_token(interface, mocks):
+    return interface.ERC20(mocks.weth)
 
 
 @pytest.fixture(scope="module")
@@ -96,6 +131,7 @@ class Helpers:
     eth_banker = None
     # dao_voting = None
     dai_token = None
+    local_chain = False
 
     @staticmethod
     def fund_with_eth(addr, amount="1000 ether"):
@@ -103,6 +139,9 @@ class Helpers:
 
     @staticmethod
     def fund_with_dai(addr, amount):
+        if Helpers.local_chain:
+            MockERC20.at(Helpers.dai_token.address).mint(addr, amount, {"from": Helpers.accounts[0]})
+            return
         stranger = Helpers.accounts.at("0x075e72a5edf65f0a5f44699c7654c1a76941ddc8", force=True)
         Helpers.dai_token.transfer(addr, amount, {"from": stranger})
 
@@ -141,11 +180,12 @@ class Helpers:
 
 
 @pytest.fixture(scope="module")
-def helpers(accounts, dao_voting, dai_token):
+def helpers(accounts, dao_voting, dai_token, local_chain):
     Helpers.accounts = accounts
-    Helpers.eth_banker = accounts.at("0xBE0eB53F46cd790Cd13851d5EFf43D12404d33E8", force=True)
+    Helpers.eth_banker = accounts[0] if local_chain else accounts.at("0xBE0eB53F46cd790Cd13851d5EFf43D12404d33E8", force=True)
     Helpers.dao_voting = dao_voting
     Helpers.dai_token = dai_token
+    Helpers.local_chain = local_chain
     return Helpers
 
 
@@ -161,24 +201,25 @@ def beneficiary(accounts):
 
 
 @pytest.fixture(scope="module")
-def deployFactoryConstructorArgs():
-    def run():
+def deployFactoryConstructorArgs(mocks):
+    def run(immutable_args=False):
         return make_factory_constructor_args(
-            weth_token=weth_token_address,
-            dao_vault=lido_dao_agent_address,
+            weth_token=mocks.weth,
+            dao_vault=mocks.vault,
+            immutable_args=immutable_args,
         )
 
     return run
 
 
 @pytest.fixture(scope="module")
-def createSellerInitializeArgs():
+def createSellerInitializeArgs(mocks):
     def run(receiver, max_margin):
         # NOTE: sellToken and buyToken mast be set in order according chainlink price feed
         # i.e., in the case of selling ETH for DAI, the sellToken must be set to DAI,
         # as the chainlink price feed returns the ETH amount for 1DAI
         return make_initialize_args(
-            receiver=receiver, sell_token=dai_token_address, buy_token=weth_token_address, price_feed=chainlink_dai_eth, max_margin=max_margin, const_price=0
+            receiver=receiver, sell_token=mocks.dai, buy_token=mocks.weth, price_feed=mocks.chainlink_dai_eth, max_margin=max_margin, const_price=0
         )
 
     return run
@@ -197,11 +238,11 @@ def deploy_seller_eth_for_dai(accounts, deployFactoryConstructorArgs, createSell
 
 
 @pytest.fixture(scope="module")
-def make_order_sell_weth_for_dai(app_data):
+def make_order_sell_weth_for_dai(app_data, mocks):
     def run(sell_amount, buy_amount, fee_amount, receiver, valid_to):
         return make_order(
-            sell_token=weth_token_address,
-            buy_token=dai_token_address,
+            sell_token=mocks.weth,
+            buy_token=mocks.dai,
             receiver=receiver,
             sell_amount=sell_amount,
             buy_amount=buy_amount,
@@ -0,0 +1,43 @@
+import pytest
+from hypothesis import given, strategies as st
+from utils.amount import Amount, format_amounts
+
+# pure Python, runs without the chain isolation
+pytestmark = pytest.mark.offline
+
+decimals_strategy = st.integers(min_value=0, max_value=36)
+uint128_strategy = st.integers(min_value=0, max_value=2**128 - 1)
+
+
+@given(raw=st.integers(min_value=-(2**255), max_value=2**255 - 1), decimals=decimals_strategy)
+def test_amount_format_parse_roundtrip(raw, decimals):
+    amount = Amount(raw, decimals)
+    assert Amount.parse(amount.format(), decimals) == amount
+    assert format_amounts([raw], decimals) == [amount.format()]
+
+
+@given(raw=uint128_strategy, decimals=decimals_strategy, precision=decimals_strategy)
+def test_amount_format_precision(raw, decimals, precision):
+    # truncated formatting never rounds up and drops only the digits past the precision
+    truncated = Amount.parse(Amount(raw, decimals).format(precision), decimals)
+    assert truncated <= raw
+    assert raw - truncated.raw < 10 ** max(0, decimals - precision)
+
+
+@given(raw=uint128_strategy, price=uint128_strategy, sell_decimals=st.integers(0, 24), buy_decimals=st.integers(0, 24))
+def test_amount_convert(raw, price, sell_decimals, buy_decimals):
+    converted = Amount(raw, sell_decimals).convert(price, buy_decimals)
+    assert converted.decimals == buy_decimals
+    assert converted.raw == raw * price * 10**buy_decimals // 10 ** (18 + sell_decimals)
+
+
+def test_amount_parse():
+    assert Amount.parse("10.5", 18).raw == 10_500_000_000_000_000_000
+    assert Amount.parse("0.000001", 6).raw == 1
+    assert Amount.parse(1.25, 2).raw == 125
+    assert str(Amount(1, 18)) == "0.000000000000000001"
+    assert str(Amount(10**24, 6)) == "1000000000000000000"
+    with pytest.raises(ValueError):
+        Amount.parse("0.0000001", 6)
+    with pytest.raises(ValueError):
+        Amount.parse("1,5")
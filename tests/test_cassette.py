@@ -0,0 +1,64 @@
+import pytest
+from utils.cassette import Cassette, CassetteMiss, CASSETTE_ENV, client_cassette
+from utils.cow import COW_API_URL_ENV, api_get_quote, session
+from utils.cow_standin import CowApiStandIn
+from utils.gpv2_order import domain_separator
+from utils.light_rpc import RpcClient
+
+# the light client and the local API stand-in, runs without the chain isolation; brownie calls are in test_unit
+pytestmark = pytest.mark.offline
+
+WETH = "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"
+DAI = "0x6B175474E89094C44Da98b954EedeAC495271d0F"
+SETTLEMENT = "0x9008D19f58AAbD9eD0D60971565AA8510560ab41"
+SELLER = "0x00000000000000000000000000000000000000A1"
+UNREACHABLE = "http://127.0.0.1:1"
+
+
+def node_post(payload):
+    """In-process node answering the requests of the recorded client"""
+    results = {"eth_chainId": "0x1", "eth_getBalance": "0xde0b6b3a7640000", "eth_getCode": "0x6080"}
+    messages = payload if isinstance(payload, list) else [payload]
+    items = [{"jsonrpc": "2.0", "id": m["id"], "result": results[m["method"]]} for m in messages]
+    return items if isinstance(payload, list) else items[0]
+
+
+def test_cassette(monkeypatch, tmp_path):
+    monkeypatch.setenv(CASSETTE_ENV, str(tmp_path / "cassette.json.gz"))
+    valid_to = 2**31
+    client = RpcClient(UNREACHABLE)
+    monkeypatch.setattr(client, "_post", node_post)
+    with CowApiStandIn(domain_separator(1, SETTLEMENT), 3000 * 10**18) as api:
+        monkeypatch.setenv(COW_API_URL_ENV, api.url)
+        with client_cassette(client) as cassette:
+            assert cassette.mode == "record"
+            cassette.install_session(session)
+            recorded = (
+                client.batch([("eth_chainId", []), ("eth_getBalance", [SELLER, "latest"])]),
+                client.request("eth_getCode", [SELLER, "latest"]),
+            )
+            quote = api_get_quote(WETH, DAI, 10**18, valid_to, SELLER, cache=False)
+        assert api.requests == 1
+
+    # nothing is sent in the replay mode
+    monkeypatch.setenv(COW_API_URL_ENV, UNREACHABLE)
+    client = RpcClient(UNREACHABLE)
+    with client_cassette(client) as cassette:
+        assert cassette.mode == "replay"
+        cassette.install_session(session)
+        assert client.request("eth_getCode", [SELLER.lower(), "latest"]) == recorded[1]
+        assert client.batch([("eth_chainId", []), ("eth_getBalance", [SELLER, "latest"])]) == recorded[0]
+        assert api_get_quote(WETH, DAI, 10**18, valid_to, SELLER, cache=False) == quote
+        # a request with no exact match falls back to the next unused one of the endpoint, the only quote is used already
+        with pytest.raises(CassetteMiss):
+            api_get_quote(WETH, DAI, 10**18, valid_to + 1, SELLER, cache=False)
+    assert type(session.get_adapter("https://api.cow.fi")).__name__ == "HTTPAdapter"
+
+    # a strict cassette serves only the exact matches
+    strict = Cassette(str(tmp_path / "cassette.json.gz"), strict=True)
+    strict.install_session(session)
+    try:
+        with pytest.raises(CassetteMiss):
+            api_get_quote(WETH, DAI, 10**18, valid_to + 1, SELLER, cache=False)
+    finally:
+        strict.close()
@@ -0,0 +1,56 @@
+import pytest
+from utils.cow import QuoteCache, COW_API_URL_ENV, api_get_quote, api_post_order, api_get_order_status
+from utils.cow_standin import CowApiStandIn, PRESIGNATURE_PENDING
+from utils.gpv2_order import Order, domain_separator
+from utils.order_sizing import check_order_amounts, min_buy_amount
+
+# pure Python and the local API stand-in, runs without the chain isolation
+pytestmark = pytest.mark.offline
+
+WETH = "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"
+DAI = "0x6B175474E89094C44Da98b954EedeAC495271d0F"
+SETTLEMENT = "0x9008D19f58AAbD9eD0D60971565AA8510560ab41"
+SELLER = "0x00000000000000000000000000000000000000a1"
+
+
+def test_quote_cache():
+    cache = QuoteCache(ttl=60, max_size=2)
+    requests = []
+
+    def request():
+        requests.append(1)
+        return (10**16, 1000 * 10**18)
+
+    key = cache.key("mainnet", DAI, WETH, 10**18)
+    # nearby amounts share the entry, the cached quote is scaled to the requested amount
+    assert cache.key("mainnet", DAI.lower(), WETH, 10**18 + 10**13) == key
+    assert cache.cached(key, 10**18, request) == (10**16, 1000 * 10**18)
+    assert cache.cached(key, 2 * 10**18 - 10**16, request) == (10**16, 2000 * 10**18)
+    assert len(requests) == 1
+    # the final quote is always requested
+    cache.cached(key, 10**18, request, cache=False)
+    assert len(requests) == 2
+    assert cache.stats() == {"hits": 1, "misses": 1, "bypasses": 1, "size": 1}
+
+    for amount in (10 * 10**18, 100 * 10**18):
+        cache.cached(cache.key("mainnet", DAI, WETH, amount), amount, request)
+    assert key not in cache.entries
+
+
+def test_cow_api_standin(monkeypatch):
+    # 3000 DAI per WETH
+    price = 3000 * 10**18
+    sell_amount = 100 * 10**18
+    domain = domain_separator(1, SETTLEMENT)
+    with CowApiStandIn(domain, price) as api:
+        monkeypatch.setenv(COW_API_URL_ENV, api.url)
+        valid_to = 2**31
+        (fee_amount, buy_amount) = api_get_quote(WETH, DAI, sell_amount, valid_to, SELLER, cache=False)
+        order = Order(WETH, DAI, SELLER, sell_amount - fee_amount, buy_amount, valid_to, fee_amount=fee_amount)
+        # the quote passes the seller checkOrder amount rules with a 1% max margin
+        assert check_order_amounts(order.sell_amount, order.buy_amount, order.fee_amount, min_buy_amount(order.sell_amount, price, 100, 18, 18)) == (True, "")
+
+        orderUid = api_post_order(order.api_payload(SELLER))
+        assert orderUid == order.uid(domain, SELLER)
+        assert api_get_order_status(orderUid) == PRESIGNATURE_PENDING
+        assert api.requests == 3
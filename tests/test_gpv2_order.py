@@ -0,0 +1,55 @@
+import pytest
+from utils.gpv2_order import Order, KIND_BUY, domain_separator
+
+# pure Python, runs without the chain isolation; the uid equivalence with the contract is in test_unit
+pytestmark = pytest.mark.offline
+
+WETH = "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"
+DAI = "0x6B175474E89094C44Da98b954EedeAC495271d0F"
+SETTLEMENT = "0x9008D19f58AAbD9eD0D60971565AA8510560ab41"
+SELLER = "0x00000000000000000000000000000000000000A1"
+
+
+def make_orders(count=3):
+    return [Order(WETH, DAI, SELLER, 100 * 10**18, i * 10**18, 2**31, fee_amount=i) for i in range(1, count + 1)]
+
+
+def test_order_model():
+    domain = domain_separator(1, SETTLEMENT)
+    orders = make_orders()
+    for order in orders:
+        # round trips through the API payload and the ABI tuple
+        assert Order.from_api(order.api_payload(SELLER)) == order
+        assert Order.from_tuple(tuple(order)) == order
+        assert order.api_payload(SELLER)["partiallyFillable"] == False
+        # digest, owner and validTo packed
+        uid = bytes.fromhex(order.uid(domain, SELLER)[2:])
+        assert (uid[:32], uid[32:52], int.from_bytes(uid[52:], "big")) == (order.digest(domain), bytes.fromhex(SELLER[2:]), order.valid_to)
+
+    assert len(set(orders + [Order.from_tuple(orders[0])])) == 3
+    assert len({order.uid(domain, SELLER) for order in orders}) == 3
+    assert orders[0].uid(domain, SELLER) != orders[0].uid(domain_separator(5, SETTLEMENT), SELLER)
+    with pytest.raises(AttributeError):
+        orders[0].sell_amount = 0
+    assert orders[0].typed_data(1, SETTLEMENT)["message"]["kind"] == "sell"
+    assert Order(WETH, DAI, SELLER, 1, 1, 1, kind=KIND_BUY).eip712_message["kind"] == "buy"
+    with pytest.raises(ValueError):
+        Order(WETH, DAI, SELLER, 1, 1, 1, kind="sell")
+
+
+def test_order_tuple():
+    order = make_orders(1)[0]
+    # the order is the GPv2Order.Data tuple, contract calls take it as is
+    assert isinstance(order, tuple) and len(order) == 12
+    assert order[3] == order.sell_amount == 100 * 10**18
+    [_, _, _, sell_amount, buy_amount, *_] = order
+    assert (sell_amount, buy_amount) == (order.sell_amount, order.buy_amount)
+    # the cached encodings are kept off the tuple
+    order.api_payload(SELLER)
+    order.struct_hash
+    assert len(order) == 12 and tuple(order) == tuple(make_orders(1)[0])
+    # replaced fields are normalized
+    replaced = order._replace(sell_amount=5.0, receiver=SELLER.lower())
+    assert (replaced.sell_amount, replaced.receiver) == (5, SELLER)
+    with pytest.raises(AttributeError):
+        order.cached = None
@@ -8,6 +8,13 @@ from otc_seller_config import MAX_MARGIN
 SELL_AMOUNT = Wei("10000 ether")
 
 
+@pytest.fixture(scope="module", autouse=True)
+def mainnet_fork_only(local_chain):
+    # the DAO vote and CowSwap API flow needs the mainnet contracts and orderbook
+    if local_chain:
+        pytest.skip("integration tests require the mainnet fork")
+
+
 @pytest.fixture
 def sell_amount():
     return SELL_AMOUNT
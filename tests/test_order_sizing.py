@@ -0,0 +1,31 @@
+import pytest
+from utils.order_sizing import QuoteCurve, check_order_amounts, optimize_split, split_amounts
+
+# pure Python, runs without the chain isolation
+pytestmark = pytest.mark.offline
+
+
+def test_optimize_split():
+    price = 1000
+
+    def quote(amount):
+        # fixed gas fee and a 1bps price impact per 1e18 sold
+        fee = 10**16
+        return (fee, (amount - fee) * price * (10**22 - amount) // 10**22)
+
+    curve = QuoteCurve(quote)
+    plan = optimize_split(100 * 10**18, quote, lambda amount: amount * price * 9900 // 10000, max_slices=16, curve=curve)
+    proceeds = {count: sum(quote(x)[1] for x in split_amounts(100 * 10**18, count)) for count in range(1, 17)}
+
+    assert plan.sell_amount == 100 * 10**18
+    assert plan.proceeds == max(proceeds.values())
+    assert curve.requests < 16
+    # no order passes the floor above the quoted price
+    assert optimize_split(100 * 10**18, quote, lambda amount: amount * price, max_slices=16) is None
+
+
+def test_check_order_amounts():
+    sell_amount = 100 * 10**18
+    assert check_order_amounts(sell_amount, 1, sell_amount // 10 + 1, 0) == (False, "Order fee to high")
+    assert check_order_amounts(sell_amount, 1, 0, 2) == (False, "buyAmount too low")
+    assert check_order_amounts(sell_amount, 2, sell_amount // 10, 2) == (True, "")
@@ -0,0 +1,36 @@
+import pytest
+from utils.price_history import RoundHistory, make_round_id, split_round_id
+
+# the local store only, runs without the chain isolation; the feed backfill is in test_unit
+pytestmark = pytest.mark.offline
+
+STARTED = 1_600_000_000
+
+
+def make_rounds(rounds, phase=1):
+    return [(make_round_id(phase, round), 10**15 + round, STARTED + round * 100) for round in rounds]
+
+
+def test_round_history(tmp_path):
+    history = RoundHistory(str(tmp_path / "history"))
+    assert history.price_at(STARTED) is None and history.prices_at([STARTED]) == [None]
+    assert history.add(make_rounds(range(1, 8))) == 7
+    assert split_round_id(history.last_round_id()) == (1, 7)
+
+    assert history.price_at(STARTED + 99) is None
+    assert history.price_at(STARTED + 250) == 10**15 + 2
+    assert history.age_at(STARTED + 250) == 50
+    assert history.prices_at([STARTED + 100, STARTED + 799, STARTED + 10**6]) == [10**15 + 1, 10**15 + 7, 10**15 + 7]
+    assert history.prices_at([STARTED + 100, STARTED + 799]) == history._prices_at([STARTED + 100, STARTED + 799])
+    assert [split_round_id(x[0])[1] for x in history.range(STARTED + 300, STARTED + 500)] == [3, 4, 5]
+
+    # newer rounds are appended, a missing round backfilled later is merged in
+    assert history.add(make_rounds([9])) == 1
+    assert history.round_at(STARTED + 900) == (make_round_id(1, 9), 10**15 + 9, STARTED + 900)
+    assert history.add(make_rounds([8, 9])) == 1
+    assert [split_round_id(x[0])[1] for x in history.rows()] == list(range(1, 10))
+    # reopened from the files
+    assert RoundHistory(str(tmp_path / "history")).rows() == history.rows()
+
+    with pytest.raises(ValueError):
+        history.add([(make_round_id(1, 10), 2**63, STARTED + 1000)])
@@ -1,9 +1,46 @@
 import pytest
-from brownie import chain, reverts, Wei, OTCSeller
-from scripts.deploy import check_deployed_factory, check_deployed_seller, make_order
-
-from utils.config import lido_dao_agent_address, cowswap_vault_relayer, PRE_SIGNED
-from otc_seller_config import MAX_MARGIN
+import requests
+from dotmap import DotMap
+from web3 import HTTPProvider
+from brownie import chain, interface, reverts, web3, Contract, Wei, MockChainlinkFeed, MockERC20, OTCFactory, OTCSeller
+from scripts.deploy import (
+    check_deployed_factory,
+    check_deployed_seller,
+    is_immutable_args_factory,
+    make_order,
+    make_initialize_args,
+    predict_seller_address,
+    prefetch_sellers,
+    deploy_sellers,
+)
+from scripts.daemon import FundingTrigger, OrderManager
+from scripts.deploy import fingerprint_sellers, is_fingerprint_moved, verify_deployment
+from scripts.ingest import make_factory_ingester
+from scripts.order import get_active_orders
+from scripts.sweep import encode_sweep_script, find_assets, make_sweep_actions, send_sweep_txs
+
+from utils.config import (
+    lido_dao_agent_address,
+    cowswap_vault_relayer,
+    cowswap_settlement,
+    PRE_SIGNED,
+)
+from utils.tx_pipeline import TxPipeline, CONFIRMED
+from utils.fees import FeeStrategy
+from utils.ledger import OrderLedger, FULFILLED
+from utils.events import CONFIRMATIONS, EventSource, LogIngester
+from utils.order_queue import OrderQueue, PENDING, PROCESSING, SIGNED
+from utils.cassette import Cassette, CassetteMiss, CASSETTE_MIDDLEWARE
+from utils.amount import Amount
+from utils.gpv2_order import domain_separator
+from utils.light_rpc import RpcClient
+from utils.order_sizing import min_buy_amount
+from utils.price_history import RoundHistory, RoundRecorder
+from utils.profiler import RpcProfiler
+from utils.rpc import add_request_hook, remove_request_hook
+import utils.metrics as metrics
+import utils.tx_pipeline as tx_pipeline
+from otc_seller_config import MAX_MARGIN, DAEMON_MAX_SELL_AMOUNT
 
 SELL_AMOUNT = Wei("100 ether")
 
@@ -31,9 +68,9 @@ def factory(factory_and_seller):
 
 
 @pytest.fixture
-def simulate_seller_refill(accounts, seller, weth_token):
+def simulate_seller_refill(accounts, seller, weth_token, local_chain):
     def run(sell_amount):
-        dao_agent_account = accounts.at(lido_dao_agent_address, force=True)
+        dao_agent_account = accounts[0] if local_chain else accounts.at(lido_dao_agent_address, force=True)
         # simulate ETH transfer from Agent to Seller
         dao_agent_account.transfer(seller.address, sell_amount)
         assert weth_token.balanceOf(seller.address) >= sell_amount
@@ -85,7 +122,7 @@ def test_initialize(accounts, factory, seller):
     dummyAddress = "0x0000000000000000000000000000000000000001"
     impl = OTCSeller.at(factory.implementation())
     # try initialize impl
-    with reverts("Only factory can call"):
+    with reverts(revert_pattern="OnlyFactory.*"):
         impl.initialize(dummyAddress, dummyAddress, dummyAddress, dummyAddress, 1, 1, {"from": accounts[0]})
     # retry initialize
     with reverts("Initializable: contract is already initialized"):
@@ -238,6 +275,41 @@ def test_check_wrong_order(factory, seller, sell_amount, beneficiary, weth_token
     assert checked == False and result == "buyAmount too low", result
 
 
+def test_pair_config(seller, beneficiary, stranger, mocks):
+    (price_feed, max_margin, reverse, constant_price) = seller.getPairConfig()
+    assert (price_feed, max_margin, constant_price) == (mocks.chainlink_dai_eth, MAX_MARGIN, 0)
+
+    with reverts(revert_pattern="OnlyBeneficiary.*"):
+        seller.setPairConfig(mocks.chainlink_dai_eth, MAX_MARGIN, 0, {"from": stranger})
+    with reverts(revert_pattern="WrongMaxMargin.*"):
+        seller.setPairConfig(mocks.chainlink_dai_eth, 501, 0, {"from": beneficiary})
+    # constantPrice is packed to uint96
+    with reverts(revert_pattern="WrongPriceSource.*"):
+        seller.setPairConfig(mocks.chainlink_dai_eth, MAX_MARGIN, 2**96, {"from": beneficiary})
+
+    tx = seller.setPairConfig(mocks.chainlink_dai_eth, MAX_MARGIN + 1, 2**96 - 1, {"from": beneficiary})
+    assert tx.events["PairConfigSet"]["config"][3] == 2**96 - 1
+    assert seller.getPairConfig() == (mocks.chainlink_dai_eth, MAX_MARGIN + 1, reverse, 2**96 - 1)
+    assert seller.priceAndMaxMargin() == (2**96 - 1, MAX_MARGIN + 1)
+
+
+def test_sign_wrong_order(accounts, seller, sell_amount, beneficiary, make_order_sell_weth_for_dai, simulate_seller_refill):
+    (price, _) = seller.reversePriceAndMaxMargin()
+    order = make_order_sell_weth_for_dai(
+        sell_amount=sell_amount, buy_amount=price * sell_amount // 10**18 // 2, fee_amount=0, receiver=beneficiary, valid_to=chain.time() + 3600
+    )
+    orderUid = seller.getOrderUid(order)
+    assert seller.checkOrder(order, orderUid) == (False, "buyAmount too low")
+    with reverts(revert_pattern="OrderCheckFailed.*"):
+        seller.signOrder(order, orderUid, {"from": accounts[0]})
+
+    order = make_order_sell_weth_for_dai(
+        sell_amount=sell_amount, buy_amount=price * sell_amount // 10**18, fee_amount=0, receiver=beneficiary, valid_to=chain.time() + 3600
+    )
+    with reverts(revert_pattern="InsufficientBalance.*"):
+        seller.signOrder(order, seller.getOrderUid(order), {"from": accounts[0]})
+
+
 def test_sign_order(seller, sell_amount, signed_order, weth_token, dai_token, cow_settlement):
     (_, orderUid, tx) = signed_order
     assert "OrderSigned" in tx.events
@@ -264,3 +336,538 @@ def test_cancel_order(accounts, seller, beneficiary, signed_order, cow_settlemen
     assert tx.events["PreSignature"]["signed"] == False
 
     assert cow_settlement.preSignature(orderUid) == 0
+    # invalidated for the eip1271 orders too
+    assert cow_settlement.filledAmount(orderUid) == 2**256 - 1
+
+
+def test_order_registry(accounts, seller, beneficiary, stranger, sell_amount, signed_order, make_order_sell_weth_for_dai, simulate_seller_refill):
+    (order, orderUid, _) = signed_order
+    assert seller.ordersCount() == 1
+    assert seller.getOrder(orderUid) == (orderUid, order.sell_amount, order.valid_to, 0, 1)
+    assert get_active_orders(seller, page_size=1) == [seller.getOrder(orderUid)]
+
+    # a short living order is not active after its validTo
+    short_order = make_order_sell_weth_for_dai(
+        sell_amount=order.sell_amount, buy_amount=order.buy_amount, fee_amount=order.fee_amount, receiver=beneficiary, valid_to=chain.time() + 60
+    )
+    shortOrderUid = seller.getOrderUid(short_order)
+    simulate_seller_refill(sell_amount)
+    seller.signOrder(short_order, shortOrderUid, {"from": stranger})
+    assert [x[0] for x in get_active_orders(seller)] == [orderUid, shortOrderUid]
+    chain.sleep(120)
+    chain.mine()
+    assert seller.getOrder(shortOrderUid)[4] == 3
+    (orders, next) = seller.getActiveOrders(0, 10)
+    assert ([x[0] for x in orders], next) == ([orderUid], 2)
+    assert seller.getActiveOrders(2, 10) == ([], 2)
+
+    tx = seller.pruneOrders(0, 10, {"from": stranger})
+    assert tx.return_value == 1
+    assert tx.events["OrderPruned"]["orderUid"] == shortOrderUid
+    assert seller.ordersCount() == 1
+    assert seller.getOrder(shortOrderUid)[4] == 0
+
+    # canceled orders are removed
+    seller.cancelOrder(orderUid, {"from": beneficiary})
+    assert seller.ordersCount() == 0
+    assert seller.getOrder(orderUid) == ("0x", 0, 0, 0, 0)
+
+
+def test_eip1271_signature(accounts, seller, sell_amount, beneficiary, stranger, weth_token, make_order_sell_weth_for_dai, cow_settlement):
+    fee_amount = sell_amount // 1000
+    (price, _) = seller.reversePriceAndMaxMargin()
+    buy_amount = price * (sell_amount - fee_amount) // 10**18
+    valid_to = chain.time() + 3600
+    order = make_order_sell_weth_for_dai(
+        sell_amount=sell_amount - fee_amount, buy_amount=buy_amount, fee_amount=fee_amount, receiver=beneficiary, valid_to=valid_to
+    )
+    digest = order.digest(cow_settlement.domainSeparator())
+
+    assert seller.isValidSignature(digest, order.eip1271_signature) == "0x1626ba7e"
+    assert order.api_payload(seller.address, "eip1271")["signature"] == order.eip1271_signature
+    with reverts(revert_pattern="OrderHashMismatch.*"):
+        seller.isValidSignature(b"\x01" * 32, order.eip1271_signature)
+    # same rules as checkOrder, reverted with the OrderCheck reason
+    for (wrong_order, reason) in [
+        (make_order_sell_weth_for_dai(sell_amount=sell_amount, buy_amount=buy_amount // 2, fee_amount=fee_amount, receiver=beneficiary, valid_to=valid_to), 10),
+        (make_order_sell_weth_for_dai(sell_amount=sell_amount, buy_amount=buy_amount, fee_amount=fee_amount, receiver=stranger, valid_to=valid_to), 3),
+    ]:
+        with reverts(revert_pattern=f"OrderCheckFailed.*{reason}.*"):
+            seller.isValidSignature(wrong_order.digest(cow_settlement.domainSeparator()), wrong_order.eip1271_signature)
+
+    with reverts(revert_pattern="OnlyBeneficiary.*"):
+        seller.increaseRelayerAllowance(weth_token, sell_amount, {"from": stranger})
+    with reverts(revert_pattern="WrongToken.*"):
+        seller.increaseRelayerAllowance(stranger, sell_amount, {"from": beneficiary})
+    with reverts(revert_pattern="OnlyBeneficiary.*"):
+        seller.decreaseRelayerAllowance(weth_token, sell_amount, {"from": stranger})
+    for amount in (sell_amount, sell_amount * 2):
+        tx = seller.increaseRelayerAllowance(weth_token, sell_amount, {"from": beneficiary})
+        assert tx.events["RelayerAllowanceSet"]["allowance"] == amount
+        assert weth_token.allowance(seller.address, cowswap_vault_relayer) == amount
+
+
+def test_relayer_allowance_with_presigned_order(seller, beneficiary, sell_amount, signed_order, weth_token, cow_settlement):
+    (order, orderUid, _) = signed_order
+    presigned = weth_token.allowance(seller.address, cowswap_vault_relayer)
+    assert presigned >= order.sell_amount
+
+    # the ERC-1271 budget is added on top of the allowance of the presigned order
+    tx = seller.increaseRelayerAllowance(weth_token, sell_amount, {"from": beneficiary})
+    assert tx.events["RelayerAllowanceSet"]["allowance"] == presigned + sell_amount
+    tx = seller.decreaseRelayerAllowance(weth_token, sell_amount, {"from": beneficiary})
+    assert tx.events["RelayerAllowanceSet"]["allowance"] == presigned
+    # the presigned order is still covered
+    assert weth_token.allowance(seller.address, cowswap_vault_relayer) == presigned
+    assert cow_settlement.preSignature(orderUid) == PRE_SIGNED
+    with reverts("SafeERC20: decreased allowance below zero"):
+        seller.decreaseRelayerAllowance(weth_token, presigned + 1, {"from": beneficiary})
+
+
+def test_pipelined_sign_orders(accounts, seller, sell_amount, beneficiary, make_order_sell_weth_for_dai, simulate_seller_refill, cow_settlement):
+    orders_count = 3
+    fee_amount = sell_amount * 0.001
+    (chainlink_price, _) = seller.priceAndMaxMargin()
+    buy_amount = chainlink_price * (sell_amount - fee_amount)
+    simulate_seller_refill(sell_amount * orders_count)
+
+    pipeline = TxPipeline(accounts[0], poll_interval=0.1)
+    orderUids = []
+    for i in range(orders_count):
+        order = make_order_sell_weth_for_dai(
+            sell_amount=sell_amount, buy_amount=buy_amount, fee_amount=fee_amount, receiver=beneficiary, valid_to=chain.time() + 3600 + i
+        )
+        orderUid = seller.getOrderUid(order)
+        pipeline.submit(seller.signOrder, order, orderUid)
+        orderUids.append(orderUid)
+
+    txs = pipeline.wait_all(timeout=60)
+    assert [tx.status for tx in txs] == [CONFIRMED] * orders_count
+    nonces = [tx.nonce for tx in txs]
+    assert nonces == list(range(nonces[0], nonces[0] + orders_count))
+    for orderUid in orderUids:
+        assert cow_settlement.preSignature(orderUid) == PRE_SIGNED
+
+
+def test_pipeline_lagging_receipt(monkeypatch, accounts, stranger, weth_token):
+    pipeline = TxPipeline(accounts[0], poll_interval=0.1)
+    entry = pipeline.submit(weth_token.approve, stranger, 1)
+    get_receipt = tx_pipeline.get_receipt
+    calls = []
+
+    def lagging_get_receipt(txids):
+        # the first lookup misses the receipt of the already mined tx
+        calls.append(txids)
+        return None if len(calls) == 1 else get_receipt(txids)
+
+    monkeypatch.setattr(tx_pipeline, "get_receipt", lagging_get_receipt)
+    pipeline.poll()
+    assert entry.status == CONFIRMED
+    assert len(calls) == 2
+
+
+def test_fee_profile_selection():
+    strategy = FeeStrategy()
+    assert strategy.profile_for("createSeller") == "low"
+    assert strategy.profile_for("signOrder") == "normal"
+    assert strategy.profile_for("unknownOperation") == "normal"
+    now = chain.time()
+    # the operation profile is the floor, a long validity doesn't make it cheaper
+    assert strategy.profile_for("signOrder", now + 3600) == "normal"
+    assert strategy.profile_for("sweep", now + 3600) == "low"
+    # escalated when the time left before validTo is short, 10% of 600s is 5 blocks
+    assert strategy.profile_for("createSeller", now + 600) == "normal"
+    assert strategy.profile_for("signOrder", now + 600) == "normal"
+    assert strategy.profile_for("signOrder", now + 60) == "urgent"
+    assert strategy.profile_for("signOrder", now - 60) == "urgent"
+
+
+def test_order_ledger(seller, signed_order, weth_token, dai_token):
+    (order, orderUid, tx) = signed_order
+    (chainlink_price, _) = seller.priceAndMaxMargin()
+    ledger = OrderLedger()
+    ledger.record_order(order, orderUid, seller.address, quote=(order[7], order[4]), oracle_price=chainlink_price, sign_tx=tx.txid)
+
+    [row] = ledger.query(seller=seller.address, pair=(dai_token.address, weth_token.address), status="signed")
+    assert row["order_uid"] == orderUid
+    assert int(row["sell_amount"]) == order[3]
+
+    # two partial fills with the fee included in the Trade sell amount, the second one with 1% surplus over the floor
+    half = order[3] // 2
+    fee = order[3] // 1000
+    ledger.add_fill(orderUid, tx.txid, 0, tx.block_number, half + fee, order[4] // 2, fee)
+    assert ledger.get(orderUid)["status"] == "signed"
+    # the sell amount with the fee reaches the order sell amount, but the order isn't filled yet
+    ledger.add_fill(orderUid, tx.txid, 1, tx.block_number, order[3] - half - fee, (order[4] - order[4] // 2 - order[4] // 1000) * 101 // 100, fee)
+    assert ledger.get(orderUid)["status"] == "signed"
+    assert int(ledger.get(orderUid)["executed_sell_amount"]) == order[3] - 2 * fee
+    ledger.add_fill(orderUid, tx.txid, 2, tx.block_number, 3 * fee, order[4] // 1000 * 2 * 101 // 100, fee)
+    assert ledger.get(orderUid)["status"] == FULFILLED
+    assert [h["status"] for h in ledger.history(orderUid)] == ["signed", FULFILLED]
+    assert int(ledger.get(orderUid)["executed_fee_amount"]) == 3 * fee
+
+    [realized] = ledger.realized_vs_floor(seller=seller.address)
+    assert realized["executed_sell_amount"] == order[3]
+    assert realized["floor_buy_amount"] == order[4]
+    assert 0 <= realized["surplus_bps"] <= 100
+
+
+def test_ledger_rollback_fills(seller, signed_order):
+    (order, orderUid, tx) = signed_order
+    ledger = OrderLedger()
+    ledger.record_order(order, orderUid, seller.address, sign_tx=tx.txid)
+    fee = order[3] // 1000
+    ledger.add_fill(orderUid, tx.txid, 0, tx.block_number + 1, order[3] + fee, order[4], fee)
+    assert ledger.get(orderUid)["status"] == FULFILLED
+    assert int(ledger.get(orderUid)["executed_sell_amount"]) == order[3]
+
+    # the fill is reorged out
+    ledger.rollback_fills(tx.block_number)
+    assert (ledger.get(orderUid)["status"], ledger.get(orderUid)["executed_sell_amount"]) == ("signed", "0")
+
+    # a partially filled order cancelled later stays cancelled
+    ledger.add_fill(orderUid, tx.txid, 0, tx.block_number + 1, order[3] // 2 + fee, order[4] // 2, fee)
+    ledger.set_status(orderUid, "cancelled")
+    ledger.rollback_fills(tx.block_number)
+    assert ledger.get(orderUid)["status"] == "cancelled"
+    assert ledger.get(orderUid)["executed_sell_amount"] == "0"
+
+
+def test_ingester_reorg(accounts, stranger):
+    # the test chain state is reverted by the isolation fixture to this snapshot
+    chain.snapshot()
+    token = MockERC20.deploy("Reorg Token", "REORG", 18, {"from": accounts[0]})
+    rolled_back = []
+    source = EventSource(interface.ERC20.abi, ["Transfer"], address=token.address)
+    ingester = LogIngester("reorg", [source], chain.height + 1, on_rollback=rolled_back.append)
+
+    tx = token.mint(stranger, 1, {"from": accounts[0]})
+    # the blocks within the confirmation depth are left for the next run
+    ingester.catch_up()
+    assert ingester.query(event="Transfer") == []
+    chain.mine(CONFIRMATIONS)
+    ingester.catch_up()
+    [event] = ingester.query(event="Transfer")
+    assert event["block_number"] == tx.block_number
+    assert not ingester.check_reorg()
+
+    # the mint is reorged out by a longer fork of empty blocks
+    chain.revert()
+    chain.mine(CONFIRMATIONS + 2)
+    assert ingester.check_reorg()
+    assert ingester.query(event="Transfer") == []
+    assert rolled_back and rolled_back[0] < tx.block_number
+    ingester.catch_up()
+    assert ingester.query(event="Transfer") == []
+    assert ingester.checkpoint()[0] == chain.height - CONFIRMATIONS
+
+
+def test_seller_index(factory, seller, beneficiary, weth_token, dai_token):
+    (ingester, index) = make_factory_ingester(factory.address, factory.tx.block_number)
+    chain.mine(CONFIRMATIONS)
+    ingester.catch_up()
+
+    assert [x["seller"] for x in index.by_token(dai_token.address)] == [seller.address]
+    assert [x["seller"] for x in index.by_pair(weth_token.address, dai_token.address)] == [seller.address]
+    assert [x["seller"] for x in index.by_beneficiary(beneficiary.address)] == [seller.address]
+    assert index.get(seller.address)["beneficiary"] == beneficiary.address
+
+    # rolled back index is re-ingested from the checkpoint
+    ingester.rollback(factory.tx.block_number - 1, ingester._block_hash(factory.tx.block_number - 1))
+    assert index.all() == []
+    ingester.catch_up()
+    assert len(index.all()) == 1
+
+
+def test_min_buy_amount_equivalence(seller, sell_amount, weth_token, dai_token):
+    # tokenA of the seller is DAI, so selling WETH uses the reverse price
+    (price, maxMargin) = seller.reversePriceAndMaxMargin()
+    assert min_buy_amount(sell_amount, price, maxMargin, 18, 18) == seller.minBuyAmount(weth_token, dai_token, sell_amount)
+
+
+def test_deploy_sellers(accounts, factory, seller, beneficiary, createSellerInitializeArgs, mocks):
+    assert predict_seller_address(factory.address, factory.implementation(), beneficiary.address, mocks.weth, mocks.dai) == seller.address
+
+    sellersArgs = [
+        createSellerInitializeArgs(beneficiary, MAX_MARGIN),
+        make_initialize_args(beneficiary, mocks.usdc, mocks.weth, mocks.chainlink_usdc_eth, MAX_MARGIN, 0),
+        make_initialize_args(beneficiary, mocks.usdt, mocks.weth, mocks.chainlink_usdt_eth, MAX_MARGIN, 0),
+    ]
+    planned = prefetch_sellers(factory, sellersArgs)
+    assert [x.exists for x in planned] == [True, False, False]
+    assert [(x.sellTokenSymbol, x.sellTokenDecimals) for x in planned[1:]] == [("USDC", 6), ("USDT", 6)]
+
+    deployed = deploy_sellers({"from": accounts[0]}, factory, planned)
+    assert [x.address for x in deployed] == [x.sellerAddress for x in planned[1:]]
+    for x in planned[1:]:
+        assert factory.getSellerFor(beneficiary, x.args.sellTokenAddress, x.args.buyTokenAddress) == x.sellerAddress
+        assert factory.isSellerExists(x.sellerAddress)
+
+
+def test_legacy_factory_clone_mode(accounts, factory, mocks, deployFactoryConstructorArgs):
+    assert is_immutable_args_factory(factory) is False
+    # a factory deployed before the immutable args mode has no getter, stood in by a contract without it
+    stand_in = MockERC20.deploy("Legacy Factory", "LEGACY", 18, {"from": accounts[0]})
+    legacy = Contract.from_abi("LegacyFactory", stand_in.address, OTCFactory.abi, persist=False)
+    assert is_immutable_args_factory(legacy) is False
+    check_deployed_factory(factory=factory, factoryConstructorArgs=deployFactoryConstructorArgs())
+
+
+def test_immutable_args_seller(
+    accounts, beneficiary, stranger, sell_amount, deployFactoryConstructorArgs, createSellerInitializeArgs, make_order_sell_weth_for_dai, mocks, cow_settlement
+):
+    factory = OTCFactory.deploy(mocks.weth, mocks.vault, True, {"from": accounts[0]})
+    check_deployed_factory(factory=factory, factoryConstructorArgs=deployFactoryConstructorArgs(immutable_args=True))
+    args = createSellerInitializeArgs(receiver=beneficiary, max_margin=MAX_MARGIN)
+    createArgs = (args.beneficiaryAddress, args.sellTokenAddress, args.buyTokenAddress, args.chainLinkPriceFeedAddress, args.maxMargin, args.constantPrice)
+    sellerAddress = predict_seller_address(factory.address, factory.implementation(), beneficiary.address, mocks.weth, mocks.dai, True)
+    assert factory.getSellerFor(beneficiary, mocks.weth, mocks.dai) == sellerAddress
+
+    factory.createSeller(*createArgs, {"from": stranger})
+    seller = OTCSeller.at(sellerAddress)
+    check_deployed_seller(factory=factory, seller=seller, sellerInitializeArgs=args)
+    # EIP-1167 runtime code followed by the beneficiary and sorted pair tokens
+    assert len(web3.eth.get_code(seller.address)) == 0x2D + 60
+    assert (seller.beneficiary(), seller.tokenA(), seller.tokenB()) == (beneficiary.address, mocks.dai, mocks.weth)
+    assert seller.getPairConfig() == (mocks.chainlink_dai_eth, MAX_MARGIN, int(mocks.dai, 16) > int(mocks.weth, 16), 0)
+    with reverts("Seller exists"):
+        factory.createSeller(args.beneficiaryAddress, args.buyTokenAddress, args.sellTokenAddress, *createArgs[3:], {"from": stranger})
+
+    accounts[0].transfer(seller.address, sell_amount)
+    (price, _) = seller.reversePriceAndMaxMargin()
+    fee_amount = sell_amount // 1000
+    order = make_order_sell_weth_for_dai(
+        sell_amount=sell_amount - fee_amount,
+        buy_amount=price * (sell_amount - fee_amount) // 10**18,
+        fee_amount=fee_amount,
+        receiver=beneficiary,
+        valid_to=chain.time() + 3600,
+    )
+    orderUid = seller.getOrderUid(order)
+    seller.signOrder(order, orderUid, {"from": stranger})
+    assert cow_settlement.preSignature(orderUid) == PRE_SIGNED
+
+    with reverts(revert_pattern="OnlyBeneficiary.*"):
+        seller.cancelOrder(orderUid, {"from": stranger})
+    seller.cancelOrder(orderUid, {"from": beneficiary})
+
+
+def test_order_uid(seller, sell_amount, beneficiary, make_order_sell_weth_for_dai, cow_settlement):
+    # the Python order hashing matches GPv2Settlement and OTCSeller
+    domain = domain_separator(chain.id, cowswap_settlement)
+    assert domain == cow_settlement.domainSeparator()
+    for i in range(1, 4):
+        order = make_order_sell_weth_for_dai(sell_amount=sell_amount, buy_amount=i * 10**18, fee_amount=i, receiver=beneficiary, valid_to=chain.time() + 3600)
+        assert order.uid(domain, seller.address) == seller.getOrderUid(order)
+
+
+def test_price_history_recorder(accounts, tmp_path):
+    feed = MockChainlinkFeed.deploy(18, "DAI / ETH", 10**15, {"from": accounts[0]})
+    started = feed.getRoundData(1)[3]
+    for round in range(2, 8):
+        feed.setRound(round, 10**15 + round, started + round * 100, {"from": accounts[0]})
+
+    history = RoundHistory(str(tmp_path / "backfill"))
+    recorder = RoundRecorder(RpcClient(web3.provider.endpoint_uri), feed.address, history, batch_size=3, workers=2)
+    assert recorder.backfill() == 7
+    assert history.price_at(started + 250) == 10**15 + 2
+
+    # round 8 is missing
+    feed.setRound(9, 10**15 + 9, started + 900, {"from": accounts[0]})
+    assert recorder.sync() == 1
+    assert history.round_at(started + 900) == (9, 10**15 + 9, started + 900)
+
+    partial = RoundHistory(str(tmp_path / "since"))
+    assert RoundRecorder(RpcClient(web3.provider.endpoint_uri), feed.address, partial, batch_size=2).backfill(since=started + 500) == 4
+    assert [x[0] for x in partial.rows()] == [5, 6, 7, 9]
+
+
+def test_rpc_profiler(seller):
+    with RpcProfiler() as profiler:
+        block_number = web3.eth.block_number
+        seller.tokenA()
+    # the request function cached by web3 before the profiler started still goes through the hooks
+    calls = len(profiler.calls)
+    assert {"eth_blockNumber", "eth_call"} <= {method for (method, _, _, _, _) in profiler.calls}
+    assert not any(error for (_, _, _, _, error) in profiler.calls)
+    assert profiler.report()["methods"]["eth_blockNumber"]["count"] == 1
+
+    # removed hooks are not called
+    assert web3.eth.block_number >= block_number
+    assert len(profiler.calls) == calls
+
+
+def test_metrics(seller, signed_order):
+    # disabled exporter, the hooks are no-ops
+    assert not metrics.enabled()
+    metrics.observe_sign_order(0, "cli", "signed")
+    metrics.watch_seller(seller)
+    assert metrics.cow_endpoint("https://api.cow.fi/mainnet/api/v1/orders/0x01?x=1") == "orders"
+    assert metrics.cow_endpoint("https://api.cow.fi/mainnet/api/v1/quote") == "quote"
+
+    prometheus_client = pytest.importorskip("prometheus_client")
+    (order, orderUid, tx) = signed_order
+    ledger = OrderLedger()
+    ledger.record_order(order, orderUid, seller.address, sign_tx=tx.txid)
+    exporter = metrics.Metrics(prometheus_client)
+    exporter.ledger = ledger
+    exporter.watch_seller(seller)
+    # RPC metrics are fed by the request hooks of the web3 requests
+    add_request_hook(exporter.observe_rpc)
+    try:
+        web3.eth.block_number
+        with pytest.raises(ValueError):
+            web3.manager.request_blocking("otc_unsupportedMethod", [])
+    finally:
+        remove_request_hook(exporter.observe_rpc)
+    registry = exporter.registry
+    assert registry.get_sample_value("otc_orders", {"status": "signed"}) == 1
+    assert registry.get_sample_value("otc_seller_balance", {"seller": seller.address, "token": "WETH"}) is not None
+    assert registry.get_sample_value("otc_rpc_request_seconds_count", {"method": "eth_blockNumber"}) == 1
+    assert not registry.get_sample_value("otc_rpc_errors_total", {"method": "eth_blockNumber"})
+    assert registry.get_sample_value("otc_rpc_errors_total", {"method": "otc_unsupportedMethod"}) == 1
+
+
+def test_cassette_brownie_calls(monkeypatch, tmp_path, seller):
+    filename = str(tmp_path / "calls.json.gz")
+    with Cassette(filename) as cassette:
+        assert cassette.mode == "record"
+        recorded = (seller.tokenA(), seller.beneficiary(), web3.eth.block_number)
+
+    # the node is unreachable, brownie calls are served from the cassette
+    monkeypatch.setattr(web3, "provider", HTTPProvider("http://127.0.0.1:1"))
+    with RpcProfiler() as profiler:
+        with Cassette(filename) as cassette:
+            assert cassette.mode == "replay"
+            assert (seller.tokenA(), seller.beneficiary(), web3.eth.block_number) == recorded
+            with pytest.raises(CassetteMiss):
+                seller.tokenB()
+    # the request hooks see the replayed requests
+    assert {"eth_call", "eth_blockNumber"} <= {method for (method, _, _, _, _) in profiler.calls}
+    assert CASSETTE_MIDDLEWARE not in web3.middleware_onion
+    with pytest.raises(requests.exceptions.ConnectionError):
+        web3.eth.block_number
+
+
+def test_verify_deployment(factory, seller, beneficiary, deployFactoryConstructorArgs, mocks):
+    sellerInfo = DotMap({"sellerAddress": seller.address, "tokenA": seller.tokenA(), "tokenB": seller.tokenB()})
+    deployedState = DotMap({"factoryDeployConstructorArgs": deployFactoryConstructorArgs().toDict(), "sellers": [sellerInfo]})
+    (stateUpdate, failed) = verify_deployment(factory, deployedState)
+    assert failed == []
+    fingerprint = stateUpdate["sellers"][0].fingerprint
+    assert fingerprint.pairConfig == [mocks.chainlink_dai_eth, MAX_MARGIN, 0]
+
+    # nothing moved, the pair config is not read again
+    chain.mine()
+    assert not is_fingerprint_moved(fingerprint, fingerprint_sellers([seller.address], {seller.address: fingerprint})[seller.address])
+
+    tx = seller.setPairConfig(mocks.chainlink_dai_eth, MAX_MARGIN + 1, 0, {"from": beneficiary})
+    moved = fingerprint_sellers([seller.address], {seller.address: fingerprint})[seller.address]
+    assert is_fingerprint_moved(fingerprint, moved)
+    assert moved.pairConfigLog[0] == tx.block_number
+    assert moved.pairConfig == [mocks.chainlink_dai_eth, MAX_MARGIN + 1, 0]
+
+    (stateUpdate, failed) = verify_deployment(factory, DotMap({**deployedState.toDict(), **stateUpdate}))
+    assert failed == []
+    assert stateUpdate["sellers"][0].pairConfig["maxMargin"] == MAX_MARGIN + 1
+
+
+def test_fingerprint_capped_logs(monkeypatch, seller, beneficiary, mocks):
+    fingerprint = fingerprint_sellers([seller.address], {})[seller.address]
+    chain.mine(20)
+    tx = seller.setPairConfig(mocks.chainlink_dai_eth, MAX_MARGIN + 1, 0, {"from": beneficiary})
+    chain.mine(20)
+
+    # the node rejects eth_getLogs of more than 8 blocks, the code of checked sellers is not read again
+    (get_logs, get_code, ranges, code_reads) = (web3.eth.get_logs, web3.eth.get_code, [], [])
+
+    def capped_get_logs(params):
+        if params["toBlock"] - params["fromBlock"] >= 8:
+            raise ValueError("query exceeds max block range 8")
+        ranges.append((params["fromBlock"], params["toBlock"]))
+        return get_logs(params)
+
+    def counted_get_code(address, *args, **kwargs):
+        code_reads.append(address)
+        return get_code(address, *args, **kwargs)
+
+    monkeypatch.setattr(web3.eth, "get_logs", capped_get_logs)
+    monkeypatch.setattr(web3.eth, "get_code", counted_get_code)
+    moved = fingerprint_sellers([seller.address], {seller.address: fingerprint})[seller.address]
+    assert moved.pairConfigLog[0] == tx.block_number
+    assert ranges[0][0] == fingerprint.block + 1 and ranges[-1][1] == moved.block
+    # the moved seller code is read once, the unmoved one is not read at all
+    assert code_reads.count(seller.address) == 1
+    code_reads.clear()
+    assert not is_fingerprint_moved(moved, fingerprint_sellers([seller.address], {seller.address: moved})[seller.address])
+    assert code_reads == []
+
+
+def test_sweep(monkeypatch, accounts, seller, beneficiary, stranger, sell_amount, weth_token, mocks):
+    stray = MockERC20.deploy("Stray Token", "STRAY", 18, {"from": accounts[0]})
+    stray.mint(seller.address, 10**18, {"from": accounts[0]})
+    # ether sent to the seller is wrapped
+    stranger.transfer(seller.address, sell_amount)
+    assert seller.balance() == 0
+
+    assets = find_assets([seller.address], tokens=[mocks.dai, stray.address])
+    assert sorted((token, balance) for (_, _, token, balance) in assets) == sorted([(mocks.weth, sell_amount), (stray.address, 10**18)])
+    actions = make_sweep_actions(assets)
+    assert {method for (_, _, method, _) in actions} == {"transferERC20"}
+    assert encode_sweep_script(actions, interface.Agent(lido_dao_agent_address)).startswith("0x00000001")
+
+    # pair token transfers are allowed only for the beneficiary
+    before = weth_token.balanceOf(beneficiary)
+    entries = send_sweep_txs(actions, beneficiary)
+    assert all(entry.status == CONFIRMED for entry in entries)
+    assert weth_token.balanceOf(beneficiary) - before == sell_amount
+    assert stray.balanceOf(beneficiary) == 10**18
+
+    # ether balances are read by the multicall too, no code is fetched for the sellers without assets
+    (get_code, code_reads) = (web3.eth.get_code, [])
+
+    def counted_get_code(address, *args, **kwargs):
+        code_reads.append(address)
+        return get_code(address, *args, **kwargs)
+
+    monkeypatch.setattr(web3.eth, "get_code", counted_get_code)
+    monkeypatch.setattr(web3.eth, "get_balance", None)
+    assert find_assets([seller.address], tokens=[mocks.dai, stray.address]) == []
+    assert seller.address not in code_reads
+
+
+def test_daemon_recover(accounts, factory, beneficiary, stranger, weth_token, dai_token):
+    manager = OrderManager(factory, accounts[0], OrderQueue())
+    tx = weth_token.approve(stranger, 1, {"from": accounts[0]})
+    dropped = "0x" + "ab" * 32
+    # the first sign tx was replaced by a fee bumped one which got mined
+    bumped = manager.queue.push(weth_token.address, dai_token.address, "1", 3600, beneficiary.address)
+    manager.queue.update(bumped, PROCESSING, tx_hash=f"{dropped},{tx.txid}")
+    # the only sign tx was dropped, the order was never presigned
+    lost = manager.queue.push(weth_token.address, dai_token.address, "1", 3600, beneficiary.address)
+    manager.queue.update(lost, PROCESSING, tx_hash=dropped)
+
+    manager.recover()
+    assert (manager.queue.get(bumped)["status"], manager.queue.get(bumped)["tx_hash"]) == (SIGNED, tx.txid)
+    assert manager.queue.get(lost)["status"] == PENDING
+
+
+def test_autosell_trigger(monkeypatch, accounts, factory, seller, beneficiary, stranger, sell_amount, weth_token, mocks):
+    monkeypatch.setitem(DAEMON_MAX_SELL_AMOUNT, mocks.weth, 1)
+    manager = OrderManager(factory, accounts[0], OrderQueue())
+    trigger = FundingTrigger(manager, [seller], chain.height + 1)
+    trigger.poll()
+    assert manager.queue.list() == []
+
+    # ether sent to the seller is wrapped, the WETH deposit triggers the sale of the limit
+    stranger.transfer(seller.address, Wei("2 ether"))
+    trigger.poll()
+    [intent] = manager.queue.list(PENDING)
+    assert (intent["sell_token"], intent["buy_token"], intent["beneficiary"]) == (mocks.weth, mocks.dai, beneficiary.address)
+    assert intent["sell_amount"] == "1"
+
+    # the queued amount is reserved, only the rest of the balance is sold
+    stranger.transfer(seller.address, sell_amount)
+    trigger.poll()
+    [_, intent] = manager.queue.list(PENDING)
+    assert Amount.parse(intent["sell_amount"]).raw == min(Wei("1 ether"), weth_token.balanceOf(seller.address) - Wei("1 ether"))
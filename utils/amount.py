@@ -0,0 +1,150 @@
+from decimal import Decimal
+
+
+class Amount:
+    """Token amount as the raw integer and the token decimals, parsed and formatted without floats"""
+
+    __slots__ = ("raw", "decimals")
+
+    def __init__(self, raw, decimals=18):
+        if isinstance(raw, float):
+            raise TypeError("Raw amount must be an integer, use Amount.parse for human readable values")
+        self.raw = int(raw)
+        self.decimals = int(decimals)
+
+    @classmethod
+    def parse(cls, value, decimals=18):
+        """Parses a human readable amount, e.g. `10.5` ETH, into the raw integer amount"""
+        if isinstance(value, Amount):
+            return value.to_decimals(decimals)
+        text = (repr(value) if isinstance(value, float) else str(value)).strip().replace("_", "")
+        if "e" in text.lower():
+            # scientific notation, e.g. from float repr
+            text = format(Decimal(text), "f")
+        negative = text.startswith("-")
+        (whole, _, fraction) = text.lstrip("+-").partition(".")
+        if not (whole or fraction) or not (whole or "0").isdigit() or (fraction and not fraction.isdigit()):
+            raise ValueError(f"Invalid amount: {value!r}")
+        fraction = fraction.rstrip("0")
+        if len(fraction) > decimals:
+            raise ValueError(f"Amount {value!r} has more than {decimals} decimals")
+        raw = int(whole or "0") * 10**decimals + int(fraction.ljust(decimals, "0") or "0")
+        return cls(-raw if negative else raw, decimals)
+
+    def format(self, precision=None):
+        """Human readable amount without trailing zeros, `precision` truncates the fractional digits"""
+        return format_amounts([self.raw], self.decimals, precision)[0]
+
+    def to_decimals(self, decimals):
+        """Same amount with other decimals, truncated when decimals are reduced"""
+        if decimals >= self.decimals:
+            return Amount(self.raw * 10 ** (decimals - self.decimals), decimals)
+        return Amount(_div(self.raw, 10 ** (self.decimals - decimals)), decimals)
+
+    def convert(self, price, decimals):
+        """Amount of the other token with `decimals` at `price` normalized to 1e18, as OTCSeller.minBuyAmount does"""
+        shift = 18 + self.decimals - decimals
+        if shift >= 0:
+            return Amount(_div(self.raw * int(price), 10**shift), decimals)
+        return Amount(self.raw * int(price) * 10**-shift, decimals)
+
+    def bps(self, bps):
+        """Share of the amount in BPS, rounded down"""
+        return Amount(_div(self.raw * int(bps), 10_000), self.decimals)
+
+    def _other(self, other):
+        if isinstance(other, Amount):
+            if other.decimals != self.decimals:
+                raise ValueError(f"Decimals mismatch: {self.decimals} and {other.decimals}")
+            return other.raw
+        if isinstance(other, int):
+            return other
+        return NotImplemented
+
+    def __add__(self, other):
+        raw = self._other(other)
+        return NotImplemented if raw is NotImplemented else Amount(self.raw + raw, self.decimals)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        raw = self._other(other)
+        return NotImplemented if raw is NotImplemented else Amount(self.raw - raw, self.decimals)
+
+    def __mul__(self, other):
+        if not isinstance(other, int) or isinstance(other, bool):
+            return NotImplemented
+        return Amount(self.raw * other, self.decimals)
+
+    __rmul__ = __mul__
+
+    def __neg__(self):
+        return Amount(-self.raw, self.decimals)
+
+    def __eq__(self, other):
+        if isinstance(other, Amount):
+            return (self.raw, self.decimals) == (other.raw, other.decimals)
+        if isinstance(other, int):
+            return self.raw == other
+        return NotImplemented
+
+    def __lt__(self, other):
+        raw = self._other(other)
+        return NotImplemented if raw is NotImplemented else self.raw < raw
+
+    def __le__(self, other):
+        raw = self._other(other)
+        return NotImplemented if raw is NotImplemented else self.raw <= raw
+
+    def __gt__(self, other):
+        raw = self._other(other)
+        return NotImplemented if raw is NotImplemented else self.raw > raw
+
+    def __ge__(self, other):
+        raw = self._other(other)
+        return NotImplemented if raw is NotImplemented else self.raw >= raw
+
+    def __hash__(self):
+        # consistent with the equality to plain integers
+        return hash(self.raw)
+
+    def __bool__(self):
+        return self.raw != 0
+
+    def __int__(self):
+        return self.raw
+
+    __index__ = __int__
+
+    def __str__(self):
+        return self.format()
+
+    def __repr__(self):
+        return f"Amount({self.format()}, decimals={self.decimals})"
+
+
+def _div(a, b):
+    # integer division truncating towards zero, as in Solidity
+    return a // b if a >= 0 else -(-a // b)
+
+
+def format_amounts(raws, decimals=18, precision=None):
+    """Formats a list of raw amounts of the same token, the divisor and padding are computed once"""
+    unit = 10**decimals
+    cut = 10 ** (decimals - precision) if precision is not None and precision < decimals else 1
+    width = decimals if cut == 1 else precision
+    result = []
+    for raw in raws:
+        raw = int(raw)
+        (whole, fraction) = divmod(abs(raw), unit)
+        fraction //= cut
+        sign = "-" if raw < 0 and (whole or fraction) else ""
+        if fraction:
+            result.append(f"{sign}{whole}.{fraction:0{width}d}".rstrip("0"))
+        else:
+            result.append(f"{sign}{whole}")
+    return result
+
+
+def parse_amounts(values, decimals=18):
+    return [Amount.parse(value, decimals).raw for value in values]
@@ -0,0 +1,284 @@
+"""Record/replay of the JSON-RPC and CowSwap API traffic of a command, for offline and deterministic script runs.
+
+    CASSETTE=signOrder.json.gz brownie run --network mainnet main signOrder ...
+
+In the `record` mode every JSON-RPC request of the brownie web3 (or of a `light_rpc.RpcClient`) and every
+`utils.cow` HTTP exchange is captured to a gzipped JSON file, in the `replay` mode they are served back from it
+and nothing is sent. The mode is set by the CASSETTE_MODE env, by default a missing cassette is recorded and an
+existing one is replayed.
+
+Requests are matched by their normalized form: JSON-RPC ids are dropped, hex strings are lowercased and JSON
+bodies are compared with sorted keys. Repeated identical requests get the recorded responses in order, e.g. the
+receipt polling, and the last one is served again once they run out. A request with no exact match (a `validTo`
+derived from the clock changes the quote body and the order calldata) gets the next unused response recorded
+for the same method and target, unless the cassette is strict.
+"""
+import functools
+import gzip
+import json
+import os
+import re
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from threading import Lock
+from urllib.parse import parse_qsl, urlsplit
+import utils.log as log
+
+# read by `os.getenv`, the module is also used by the light client tools which don't load `.env`
+CASSETTE_ENV = "CASSETTE"
+CASSETTE_MODE_ENV = "CASSETTE_MODE"
+RECORD = "record"
+REPLAY = "replay"
+VERSION = 1
+
+RPC = "rpc"
+HTTP = "http"
+CASSETTE_MIDDLEWARE = "otc_cassette"
+# order uids and addresses in the API paths
+HEX_PATH_PART = re.compile(r"/0x[0-9a-fA-F]+")
+
+
+class CassetteMiss(Exception):
+    pass
+
+
+def _normalize(value):
+    if isinstance(value, str) and value.startswith("0x"):
+        return value.lower()
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def _dumps(value):
+    return json.dumps(_normalize(value), sort_keys=True, separators=(",", ":"), default=str)
+
+
+def rpc_key(method, params):
+    return _dumps([method, params])
+
+
+def rpc_group(method, params):
+    """Fallback match of a JSON-RPC request, calls are grouped by the target and the function selector"""
+    if method in ("eth_call", "eth_estimateGas") and params and isinstance(params[0], dict):
+        tx = params[0]
+        data = tx.get("data") or tx.get("input") or "0x"
+        return _dumps([method, tx.get("to"), data[:10]])
+    return method
+
+
+def _path(url):
+    # the API base url is not a part of the key, so a cassette is replayed against any COW_API_URL
+    parts = urlsplit(url)
+    return re.sub(r"^.*?(?=/[\w-]+/api/v1/)", "", parts.path), sorted(parse_qsl(parts.query))
+
+
+def http_key(method, url, body):
+    (path, query) = _path(url)
+    if isinstance(body, bytes):
+        body = body.decode()
+    try:
+        body = json.loads(body) if body else None
+    except ValueError:
+        pass
+    return _dumps([method, path, query, body])
+
+
+def http_group(method, url):
+    return f"{method} {HEX_PATH_PART.sub('/0x', _path(url)[0])}"
+
+
+class Cassette:
+    def __init__(self, filename, mode=None, strict=False):
+        self.filename = filename
+        self.mode = mode or (REPLAY if os.path.exists(filename) else RECORD)
+        if self.mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown cassette mode `{self.mode}`")
+        self.strict = strict
+        # [kind, key, group, response] in the recording order
+        self.interactions = []
+        self.fuzzy = 0
+        self._lock = Lock()
+        self._restore = []
+        if self.mode == REPLAY:
+            self._load()
+
+    def _load(self):
+        with gzip.open(self.filename, "rt") as fp:
+            data = json.load(fp)
+        if data.get("version") != VERSION:
+            raise ValueError(f"Cassette {self.filename} version {data.get('version')} is not supported")
+        self.interactions = data["interactions"]
+        self._by_key = defaultdict(deque)
+        self._by_group = defaultdict(deque)
+        self._last = {}
+        self._used = set()
+        for (i, (kind, key, group, _)) in enumerate(self.interactions):
+            self._by_key[(kind, key)].append(i)
+            self._by_group[(kind, group)].append(i)
+
+    def save(self):
+        with gzip.open(self.filename, "wt") as fp:
+            json.dump({"version": VERSION, "interactions": self.interactions}, fp, separators=(",", ":"))
+        log.info(f"Cassette saved to {self.filename}", f"{len(self.interactions)} interactions")
+
+    def record(self, kind, key, group, response):
+        with self._lock:
+            self.interactions.append([kind, key, group, response])
+
+    def _next(self, indexes):
+        while indexes:
+            i = indexes.popleft()
+            if i not in self._used:
+                return i
+        return None
+
+    def play(self, kind, key, group):
+        with self._lock:
+            i = self._next(self._by_key[(kind, key)])
+            if i is None:
+                i = self._last.get((kind, key))
+            if i is None and not self.strict:
+                i = self._next(self._by_group[(kind, group)])
+                if i is not None:
+                    self.fuzzy += 1
+            if i is None:
+                raise CassetteMiss(f"No recorded {kind} response for {key}")
+            self._used.add(i)
+            self._last[(kind, key)] = i
+            return self.interactions[i][3]
+
+    # JSON-RPC of the brownie web3
+
+    def rpc_request(self, method, params, make_request):
+        (key, group) = (rpc_key(method, params), rpc_group(method, params))
+        if self.mode == REPLAY:
+            return self.play(RPC, key, group)
+        response = make_request(method, params)
+        self.record(RPC, key, group, response)
+        return response
+
+    def install_web3(self, w3):
+        """Injects the cassette as the innermost web3 middleware, right above the provider, so the requests are
+        recorded as sent and replayed without reaching the provider. Patching `provider.make_request` is not enough,
+        web3 caches the request function bound to it on the first request. The `utils.rpc` hooks are the outermost
+        middleware, they see the replayed requests too"""
+
+        def cassette_middleware(make_request, w3):
+            return functools.partial(self.rpc_request, make_request=make_request)
+
+        w3.middleware_onion.inject(cassette_middleware, name=CASSETTE_MIDDLEWARE, layer=0)
+        self._restore.append(lambda: w3.middleware_onion.remove(CASSETTE_MIDDLEWARE))
+
+    # JSON-RPC of the light client, batches are recorded per request
+
+    def install_client(self, client):
+        post = client._post
+
+        def cassette_post(payload):
+            messages = payload if isinstance(payload, list) else [payload]
+            if self.mode == REPLAY:
+                items = [{**self.play(RPC, rpc_key(m["method"], m["params"]), rpc_group(m["method"], m["params"])), "id": m["id"]} for m in messages]
+            else:
+                result = post(payload)
+                items = result if isinstance(result, list) else [result]
+                by_id = {item["id"]: item for item in items}
+                for m in messages:
+                    self.record(RPC, rpc_key(m["method"], m["params"]), rpc_group(m["method"], m["params"]), by_id[m["id"]])
+            return items if isinstance(payload, list) else items[0]
+
+        client._post = cassette_post
+        self._restore.append(lambda: setattr(client, "_post", post))
+
+    # CowSwap API HTTP exchanges of a requests session
+
+    def install_session(self, session):
+        prefixes = ("http://", "https://")
+        previous = {prefix: session.get_adapter(prefix) for prefix in prefixes}
+        for prefix in prefixes:
+            session.mount(prefix, _http_adapter(self, previous[prefix]))
+        self._restore.append(lambda: [session.mount(prefix, previous[prefix]) for prefix in prefixes])
+
+    def __enter__(self):
+        from brownie import web3
+        from utils.cow import session
+
+        self.install_web3(web3)
+        self.install_session(session)
+        log.info(f"Cassette {self.mode}", self.filename)
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        while self._restore:
+            self._restore.pop()()
+        if self.mode == RECORD:
+            self.save()
+        elif self.fuzzy:
+            log.warn("Cassette requests replayed without an exact match", self.fuzzy)
+
+
+def _http_adapter(cassette, real):
+    # requests is imported only when a session is recorded, the light client tools don't pay for it
+    from requests.adapters import BaseAdapter
+    from requests.models import Response
+    from requests.structures import CaseInsensitiveDict
+
+    class CassetteAdapter(BaseAdapter):
+        def send(self, request, **kwargs):
+            (key, group) = (http_key(request.method, request.url, request.body), http_group(request.method, request.url))
+            if cassette.mode == REPLAY:
+                return self._response(request, cassette.play(HTTP, key, group))
+            response = real.send(request, **kwargs)
+            cassette.record(
+                HTTP, key, group, {"status": response.status_code, "headers": {"Content-Type": response.headers.get("Content-Type")}, "body": response.text}
+            )
+            return response
+
+        def _response(self, request, recorded):
+            response = Response()
+            response.status_code = recorded["status"]
+            response.headers = CaseInsensitiveDict({k: v for k, v in recorded["headers"].items() if v})
+            response._content = recorded["body"].encode()
+            response.encoding = "utf-8"
+            response.url = request.url
+            response.request = request
+            return response
+
+        def close(self):
+            pass
+
+    return CassetteAdapter()
+
+
+@contextmanager
+def client_cassette(client):
+    """Records or replays the `light_rpc.RpcClient` requests if the CASSETTE env is set"""
+    filename = os.getenv(CASSETTE_ENV)
+    if not filename or client is None:
+        yield None
+        return
+    cassette = Cassette(filename, os.getenv(CASSETTE_MODE_ENV))
+    cassette.install_client(client)
+    try:
+        yield cassette
+    finally:
+        cassette.close()
+
+
+def use_cassette(fn):
+    """Runs the wrapped command with a cassette if the CASSETTE env is set"""
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        filename = os.getenv(CASSETTE_ENV)
+        if not filename:
+            return fn(*args, **kwargs)
+        with Cassette(filename, os.getenv(CASSETTE_MODE_ENV)):
+            return fn(*args, **kwargs)
+
+    return wrapper
@@ -1,6 +1,8 @@
 import os
 from brownie import network, accounts, web3
 
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
 # eth_token_address ='0xEeeeeEeeeEeEeeEeEeEeeEEEeeeeEeeeeeeeEEeE'
 eth_token_address = "0x0000000000000000000000000000000000000000"
 weth_token_address = "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"
@@ -1,13 +1,155 @@
+import json
+import math
+import sqlite3
+import time
+from collections import OrderedDict
+from threading import Lock
 import requests
+from utils.env import get_env
+from utils.gpv2_order import Order, KIND_SELL, BALANCE_ERC20, ZERO_APP_DATA, SIGNING_SCHEME_PRESIGN
 
-KIND_SELL = "f3b277728b3fee749481eb3e0b3b48980dbbab78658fc419025cb16eee346775"
-BALANCE_ERC20 = "5a28e9363bb942b639270062aa6bb295f434bcdfc42c97267bf003f272060dc9"
 
+# keep-alive connections to api.cow.fi are reused between requests
+session = requests.Session()
 
-def api_get_sell_fee(sell_token, buy_token, sell_amount, network="mainnet"):
-    fee_url = f"https://api.cow.fi/{network}/api/v1/feeAndQuote/sell"
+# quotes of nearly identical orders are reused for this number of seconds
+QUOTE_CACHE_TTL = 30
+QUOTE_CACHE_SIZE = 256
+# sell amounts within this relative distance, in BPS, share a cache entry
+QUOTE_AMOUNT_BUCKET_BPS = 10
+# validTo values within this window, in seconds, share a cache entry
+QUOTE_VALID_TO_WINDOW = 600
+# set to a sqlite filename to keep the cached quotes between runs
+QUOTE_CACHE_DB_ENV = "QUOTE_CACHE_DB"
+# set to point the client to another CowSwap API instance, e.g. a local stand-in
+COW_API_URL_ENV = "COW_API_URL"
+COW_API_URL = "https://api.cow.fi"
+
+QUOTE_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS quotes (
+    key TEXT PRIMARY KEY,
+    sell_amount TEXT NOT NULL,
+    fee_amount TEXT NOT NULL,
+    buy_amount TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+
+class QuoteCache:
+    """TTL and LRU bounded cache of (fee, buy amount after fee) quotes.
+
+    Entries are keyed by network, pair, bucketed sell amount and validTo window, a quote of a nearby amount is scaled to the requested one.
+    It's meant for sizing and previews, the quote of an order that gets signed must be requested with `cache=False`.
+    """
+
+    def __init__(
+        self, ttl=QUOTE_CACHE_TTL, max_size=QUOTE_CACHE_SIZE, bucket_bps=QUOTE_AMOUNT_BUCKET_BPS, valid_to_window=QUOTE_VALID_TO_WINDOW, filename=None
+    ):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.bucket_bps = bucket_bps
+        self.valid_to_window = valid_to_window
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self._lock = Lock()
+        self._db = None
+        if filename:
+            self._db = sqlite3.connect(filename, check_same_thread=False)
+            self._db.executescript(QUOTE_CACHE_SCHEMA)
+
+    def key(self, network, sell_token, buy_token, sell_amount, valid_to=None, *extra):
+        bucket = int(math.log(max(1, int(sell_amount))) / math.log1p(self.bucket_bps / 10_000))
+        window = None if valid_to is None else int(valid_to) // self.valid_to_window
+        return json.dumps([network, sell_token.lower(), buy_token.lower(), bucket, window, *extra])
+
+    def _load(self, key):
+        if self._db is None:
+            return None
+        row = self._db.execute("SELECT sell_amount, fee_amount, buy_amount, created_at FROM quotes WHERE key = ?", (key,)).fetchone()
+        return None if row is None else (int(row[0]), int(row[1]), int(row[2]), row[3])
+
+    def get(self, key, sell_amount):
+        now = time.time()
+        with self._lock:
+            entry = self.entries.get(key) or self._load(key)
+            if entry is None or now - entry[3] > self.ttl:
+                self.entries.pop(key, None)
+                self.misses += 1
+                return None
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            self._evict()
+            self.hits += 1
+        (cached_amount, fee_amount, buy_amount, _) = entry
+        if cached_amount != sell_amount and cached_amount > fee_amount:
+            buy_amount = buy_amount * (int(sell_amount) - fee_amount) // (cached_amount - fee_amount)
+        return (fee_amount, buy_amount)
+
+    def put(self, key, sell_amount, quote):
+        entry = (int(sell_amount), *quote, time.time())
+        with self._lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            self._evict()
+            if self._db is not None:
+                with self._db:
+                    self._db.execute("INSERT OR REPLACE INTO quotes VALUES (?, ?, ?, ?, ?)", (key, *(str(x) for x in entry[:3]), entry[3]))
+                    self._db.execute("DELETE FROM quotes WHERE created_at < ?", (entry[3] - self.ttl,))
+
+    def _evict(self):
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def cached(self, key, sell_amount, request, cache=True):
+        """Returns the cached quote or the `request()` result, `cache=False` always requests a fresh quote"""
+        if not cache:
+            with self._lock:
+                self.bypasses += 1
+        else:
+            quote = self.get(key, sell_amount)
+            if quote is not None:
+                return quote
+        quote = request()
+        self.put(key, sell_amount, quote)
+        return quote
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "bypasses": self.bypasses, "size": len(self.entries)}
+
+
+_quote_cache = None
+
+
+def get_quote_cache():
+    global _quote_cache
+    if _quote_cache is None:
+        _quote_cache = QuoteCache(filename=get_env(QUOTE_CACHE_DB_ENV))
+    return _quote_cache
+
+
+def add_response_hook(hook):
+    """hook(response) is called after every CowSwap API response, e.g. to export the request metrics"""
+    if hook not in session.hooks["response"]:
+        session.hooks["response"].append(hook)
+
+
+def api_url(network, path):
+    return f"{(get_env(COW_API_URL_ENV) or COW_API_URL).rstrip('/')}/{network}/api/v1/{path}"
+
+
+def api_get_sell_fee(sell_token, buy_token, sell_amount, network="mainnet", cache=True):
+    quote_cache = get_quote_cache()
+    key = quote_cache.key(network, sell_token, buy_token, sell_amount, None, "feeAndQuote")
+    return quote_cache.cached(key, sell_amount, lambda: _request_sell_fee(sell_token, buy_token, sell_amount, network), cache)
+
+
+def _request_sell_fee(sell_token, buy_token, sell_amount, network):
+    fee_url = api_url(network, "feeAndQuote/sell")
     get_params = {"sellToken": sell_token, "buyToken": buy_token, "sellAmountBeforeFee": sell_amount}
-    r = requests.get(fee_url, params=get_params)
+    r = session.get(fee_url, params=get_params)
     assert r.ok and r.status_code == 200
     fee_amount = int(r.json()["fee"]["amount"])
     buy_amount_after_fee = int(r.json()["buyAmountAfterFee"])
@@ -16,8 +158,18 @@ def api_get_sell_fee(sell_token, buy_token, sell_amount, network="mainnet"):
     return (fee_amount, buy_amount_after_fee)
 
 
-def api_get_quote(sell_token, buy_token, sell_amount, valid_to, sender, partiallyFillable=False, network="mainnet"):
-    quote_url = f"https://api.cow.fi/{network}/api/v1/quote"
+def api_get_quote(
+    sell_token, buy_token, sell_amount, valid_to, sender, partiallyFillable=False, network="mainnet", cache=True, signing_scheme=SIGNING_SCHEME_PRESIGN
+):
+    quote_cache = get_quote_cache()
+    key = quote_cache.key(network, sell_token, buy_token, sell_amount, valid_to, "quote", sender.lower(), partiallyFillable, signing_scheme)
+    return quote_cache.cached(
+        key, sell_amount, lambda: _request_quote(sell_token, buy_token, sell_amount, valid_to, sender, partiallyFillable, network, signing_scheme), cache
+    )
+
+
+def _request_quote(sell_token, buy_token, sell_amount, valid_to, sender, partiallyFillable, network, signing_scheme=SIGNING_SCHEME_PRESIGN):
+    quote_url = api_url(network, "quote")
     order_payload = {
         "sellToken": sell_token,
         "buyToken": buy_token,
@@ -30,10 +182,11 @@ def api_get_quote(sell_token, buy_token, sell_amount, valid_to, sender, partiall
         "kind": "sell",
         "sellTokenBalance": "erc20",
         "buyTokenBalance": "erc20",
-        "signingScheme": "presign",  # Very important. this tells the api you are going to sign on chain
+        # Very important, "presign" tells the api you are going to sign on chain, "eip1271" includes the isValidSignature gas
+        "signingScheme": signing_scheme,
     }
 
-    r = requests.post(quote_url, json=order_payload)
+    r = session.post(quote_url, json=order_payload)
     assert r.ok and r.status_code == 200
     fee_amount = int(r.json()["fee"]["amount"])
     buy_amount_after_fee = int(r.json()["buyAmountAfterFee"])
@@ -42,12 +195,24 @@ def api_get_quote(sell_token, buy_token, sell_amount, valid_to, sender, partiall
     return (fee_amount, buy_amount_after_fee)
 
 
-def api_get_order_status(orderUid, network="mainnet"):
-    order_url = f"https://api.cow.fi/{network}/api/v1/orders/{orderUid}"
-    r = requests.get(order_url)
+def api_get_order(orderUid, network="mainnet"):
+    order_url = api_url(network, f"orders/{orderUid}")
+    r = session.get(order_url)
     assert r.ok and r.status_code == 200
-    status = r.json()["status"]
-    return status
+    return r.json()
+
+
+def api_get_order_status(orderUid, network="mainnet"):
+    return api_get_order(orderUid, network)["status"]
+
+
+def api_post_order(payload, network="mainnet"):
+    order_url = api_url(network, "orders")
+    r = session.post(order_url, json=payload)
+
+    assert r.ok and r.status_code == 201
+    order_uid = r.json()
+    return order_uid
 
 
 def api_create_order(
@@ -60,30 +225,11 @@ def api_create_order(
     sender,
     receiver,
     partiallyFillable=False,
-    app_data="0x0000000000000000000000000000000000000000000000000000000000000000",
+    app_data=ZERO_APP_DATA,
     network="mainnet",
+    signing_scheme=SIGNING_SCHEME_PRESIGN,
 ):
-    order_url = f"https://api.cow.fi/{network}/api/v1/orders"
-    partiallyFillable = False
-    order_payload = {
-        "sellToken": sell_token,
-        "buyToken": buy_token,
-        "sellAmount": str(sell_amount),  # sell amount before fee
-        "buyAmount": str(buy_amount),  # buy amount after fee
-        "validTo": valid_to,
-        "appData": app_data,
-        "feeAmount": str(fee_amount),
-        "kind": "sell",
-        "partiallyFillable": partiallyFillable,
-        "receiver": receiver,
-        "signature": "0x",
-        "from": sender,
-        "sellTokenBalance": "erc20",
-        "buyTokenBalance": "erc20",
-        "signingScheme": "presign",  # Very important. this tells the api you are going to sign on chain
-    }
-    r = requests.post(order_url, json=order_payload)
-
-    assert r.ok and r.status_code == 201
-    order_uid = r.json()
-    return order_uid
+    order = Order(sell_token, buy_token, receiver, sell_amount, buy_amount, valid_to, app_data, fee_amount, partially_fillable=partiallyFillable)
+    # signingScheme "presign" is very important, it tells the api you are going to sign on chain,
+    # "eip1271" orders are signed by the encoded order and valid once posted
+    return api_post_order(order.api_payload(sender, signing_scheme), network)
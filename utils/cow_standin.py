@@ -0,0 +1,115 @@
+import json
+import random
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from utils.gpv2_order import Order
+
+# status of a presign order created via API and not yet signed on chain
+PRESIGNATURE_PENDING = "presignaturePending"
+
+ORDER_PATH = re.compile(r"^/(?P<network>[\w-]+)/api/v1/orders(?:/(?P<uid>0x[0-9a-fA-F]+))?$")
+QUOTE_PATH = re.compile(r"^/(?P<network>[\w-]+)/api/v1/(?P<kind>quote|feeAndQuote/sell)$")
+
+
+class CowApiStandIn:
+    """Local stand-in of the CowSwap orderbook API: quotes, order creation and status, with injected latency.
+
+    Quotes are `price` buy tokens per sell token (normalized to 1e18, for same decimals tokens) minus `fee_bps` fee.
+    Created orders get the uid computed for the `domain` separator, so it matches `OTCSeller.getOrderUid`.
+    """
+
+    def __init__(self, domain, price, fee_bps=10, latency=0.0, jitter=0.0, host="127.0.0.1", port=0):
+        self.domain = domain
+        self.price = int(price)
+        self.fee_bps = fee_bps
+        self.latency = latency
+        self.jitter = jitter
+        self.orders = {}
+        self.requests = 0
+        self._lock = Lock()
+        self._server = ThreadingHTTPServer((host, port), _handler(self))
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        (host, port) = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread = Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def delay(self):
+        with self._lock:
+            self.requests += 1
+        if self.latency or self.jitter:
+            time.sleep(self.latency + random.uniform(0, self.jitter))
+
+    def quote(self, data):
+        sell_amount = int(data.get("sellAmountBeforeFee") or data["sellAmount"])
+        fee_amount = max(1, sell_amount * self.fee_bps // 10_000)
+        buy_amount = (sell_amount - fee_amount) * self.price // 10**18
+        return {
+            "quote": {**data, "sellAmount": str(sell_amount - fee_amount), "buyAmount": str(buy_amount), "feeAmount": str(fee_amount)},
+            "fee": {"amount": str(fee_amount)},
+            "buyAmountAfterFee": str(buy_amount),
+        }
+
+    def create_order(self, payload):
+        uid = Order.from_api(payload).uid(self.domain, payload["from"])
+        status = PRESIGNATURE_PENDING if payload.get("signingScheme") == "presign" else "open"
+        with self._lock:
+            self.orders[uid] = {**payload, "uid": uid, "owner": payload["from"], "status": status}
+        return uid
+
+    def get_order(self, uid):
+        with self._lock:
+            return self.orders.get(uid.lower())
+
+
+def _handler(api):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def reply(self, code, body):
+            data = json.dumps(body).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def read_json(self):
+            return json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+
+        def do_GET(self):
+            api.delay()
+            (path, _, query) = self.path.partition("?")
+            if QUOTE_PATH.match(path):
+                params = dict(x.split("=", 1) for x in query.split("&") if "=" in x)
+                return self.reply(200, api.quote(params))
+            match = ORDER_PATH.match(path)
+            order = match and match["uid"] and api.get_order(match["uid"])
+            if not order:
+                return self.reply(404, {"errorType": "NotFound", "description": "Order was not found"})
+            self.reply(200, order)
+
+        def do_POST(self):
+            api.delay()
+            if QUOTE_PATH.match(self.path):
+                return self.reply(200, api.quote(self.read_json()))
+            match = ORDER_PATH.match(self.path)
+            if not match or match["uid"]:
+                return self.reply(404, {"errorType": "NotFound", "description": "Unknown path"})
+            self.reply(201, api.create_order(self.read_json()))
+
+    return Handler
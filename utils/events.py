@@ -0,0 +1,254 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from brownie import web3
+from eth_utils import event_abi_to_log_topic
+from utils.store import open_db
+import utils.log as log
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    ingester TEXT NOT NULL,
+    event TEXT NOT NULL,
+    block_number INTEGER NOT NULL,
+    tx_hash TEXT NOT NULL,
+    log_index INTEGER NOT NULL,
+    address TEXT NOT NULL,
+    key TEXT,
+    order_uid TEXT,
+    args TEXT NOT NULL,
+    PRIMARY KEY (ingester, tx_hash, log_index)
+);
+CREATE INDEX IF NOT EXISTS events_key ON events (ingester, event, key, block_number);
+CREATE INDEX IF NOT EXISTS events_address ON events (ingester, address, block_number);
+CREATE INDEX IF NOT EXISTS events_order_uid ON events (order_uid);
+CREATE INDEX IF NOT EXISTS events_block ON events (ingester, block_number);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    ingester TEXT PRIMARY KEY,
+    block_number INTEGER NOT NULL,
+    block_hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS block_hashes (
+    ingester TEXT NOT NULL,
+    block_number INTEGER NOT NULL,
+    block_hash TEXT NOT NULL,
+    PRIMARY KEY (ingester, block_number)
+);
+"""
+
+# number of checkpointed block hashes kept to find the common ancestor on reorg
+REORG_DEPTH = 128
+# blocks behind the head left for the next runs, most reorgs don't reach them
+CONFIRMATIONS = 3
+
+
+def to_hex(value):
+    # HexBytes.hex() is 0x-prefixed while bytes.hex() is not
+    return "0x" + bytes(value).hex()
+
+
+def _to_json(value):
+    if isinstance(value, bytes):
+        return to_hex(value)
+    if isinstance(value, int) and not isinstance(value, bool):
+        return str(value)
+    if isinstance(value, (list, tuple)):
+        return [_to_json(x) for x in value]
+    return value
+
+
+def address_topic(address):
+    return "0x" + address[2:].lower().rjust(64, "0")
+
+
+class EventSource:
+    """Events of a single ABI to ingest, `key_arg` is the event argument the stored events are indexed by"""
+
+    def __init__(self, abi, event_names, address=None, topics=None, key_arg=None):
+        contract = web3.eth.contract(abi=abi)
+        self.events = {}
+        for name in event_names:
+            event = getattr(contract.events, name)
+            self.events[to_hex(event_abi_to_log_topic(event._get_event_abi()))] = event()
+        self.address = address
+        self.topics = topics or []
+        self.key_arg = key_arg
+
+    def filter_params(self, from_block, to_block):
+        params = {"fromBlock": from_block, "toBlock": to_block, "topics": [list(self.events), *self.topics]}
+        if self.address:
+            params["address"] = self.address
+        return params
+
+    def decode(self, raw_log):
+        topic = raw_log["topics"][0]
+        return self.events[to_hex(topic) if isinstance(topic, bytes) else topic].processLog(raw_log)
+
+
+class LogIngester:
+    """Streams logs of the event sources into the local events store.
+
+    Ranges of eth_getLogs are sized adaptively: halved when the node rejects the query, doubled while the result stays small.
+    Every stored range is checkpointed with its last block hash, a hash mismatch on the next run rolls back to the common ancestor.
+    """
+
+    def __init__(
+        self,
+        name,
+        sources,
+        start_block,
+        conn=None,
+        initial_range=2000,
+        min_range=1,
+        max_range=200_000,
+        target_logs=2000,
+        confirmations=CONFIRMATIONS,
+        on_events=None,
+        on_rollback=None,
+    ):
+        self.name = name
+        self.sources = sources
+        self.start_block = start_block
+        self.conn = conn or open_db("events", SCHEMA)
+        if conn:
+            conn.executescript(SCHEMA)
+        self.range = initial_range
+        self.min_range = min_range
+        self.max_range = max_range
+        self.target_logs = target_logs
+        self.confirmations = confirmations
+        self.on_events = on_events
+        self.on_rollback = on_rollback
+        self._executor = ThreadPoolExecutor(max_workers=max(1, len(sources)))
+
+    def checkpoint(self):
+        row = self.conn.execute("SELECT block_number, block_hash FROM checkpoints WHERE ingester = ?", (self.name,)).fetchone()
+        return (row["block_number"], row["block_hash"]) if row else (self.start_block - 1, None)
+
+    def safe_head(self):
+        """Last block to ingest, `confirmations` blocks behind the chain head"""
+        return web3.eth.block_number - self.confirmations
+
+    def _block_hash(self, block_number):
+        return to_hex(web3.eth.get_block(block_number)["hash"])
+
+    def check_reorg(self):
+        (block_number, block_hash) = self.checkpoint()
+        if block_hash is None or self._block_hash(block_number) == block_hash:
+            return False
+        rows = self.conn.execute("SELECT block_number, block_hash FROM block_hashes WHERE ingester = ? ORDER BY block_number DESC", (self.name,)).fetchall()
+        ancestor = None
+        for row in rows:
+            if self._block_hash(row["block_number"]) == row["block_hash"]:
+                ancestor = (row["block_number"], row["block_hash"])
+                break
+        if ancestor is None:
+            # deeper than the kept hashes, re-ingest everything after the oldest one
+            oldest = rows[-1]["block_number"] if rows else self.start_block
+            ancestor = (oldest - 1, self._block_hash(oldest - 1))
+        log.warn(f"[{self.name}] reorg detected, rolling back to block", ancestor[0])
+        self.rollback(*ancestor)
+        return True
+
+    def rollback(self, block_number, block_hash):
+        with self.conn:
+            self.conn.execute("DELETE FROM events WHERE ingester = ? AND block_number > ?", (self.name, block_number))
+            self.conn.execute("DELETE FROM block_hashes WHERE ingester = ? AND block_number > ?", (self.name, block_number))
+            self._save_checkpoint(block_number, block_hash)
+        if self.on_rollback:
+            self.on_rollback(block_number)
+
+    def _save_checkpoint(self, block_number, block_hash):
+        self.conn.execute("INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?)", (self.name, block_number, block_hash))
+        self.conn.execute("INSERT OR REPLACE INTO block_hashes VALUES (?, ?, ?)", (self.name, block_number, block_hash))
+        self.conn.execute(
+            "DELETE FROM block_hashes WHERE ingester = ? AND block_number NOT IN (SELECT block_number FROM block_hashes WHERE ingester = ? ORDER BY block_number DESC LIMIT ?)",
+            (self.name, self.name, REORG_DEPTH),
+        )
+
+    def _fetch(self, from_block, to_block):
+        def get_logs(source):
+            return [source.decode(raw_log) for raw_log in web3.eth.get_logs(source.filter_params(from_block, to_block))]
+
+        events = []
+        for (source, source_events) in zip(self.sources, self._executor.map(get_logs, self.sources)):
+            events += [(source, event) for event in source_events]
+        return sorted(events, key=lambda x: (x[1].blockNumber, x[1].logIndex))
+
+    def _store(self, events, to_block, to_block_hash):
+        rows = []
+        for source, event in events:
+            args = {k: _to_json(v) for k, v in event.args.items()}
+            rows.append(
+                (
+                    self.name,
+                    event.event,
+                    event.blockNumber,
+                    to_hex(event.transactionHash),
+                    event.logIndex,
+                    event.address,
+                    args.get(source.key_arg) if source.key_arg else event.address,
+                    args.get("orderUid"),
+                    json.dumps(args),
+                )
+            )
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._save_checkpoint(to_block, to_block_hash)
+
+    def step(self, head):
+        """Ingests the next range up to `head`, returns the number of stored events"""
+        (last_block, _) = self.checkpoint()
+        from_block = last_block + 1
+        to_block = min(head, from_block + self.range - 1)
+        # the range end hash is read before the logs, so the checkpoint never gets a hash of another fork than the logs
+        to_block_hash = self._block_hash(to_block)
+        try:
+            events = self._fetch(from_block, to_block)
+        except ValueError as err:
+            # the node rejected the query (too many results or response too large)
+            if self.range <= self.min_range:
+                raise
+            self.range = max(self.min_range, self.range // 2)
+            log.warn(f"[{self.name}] getLogs failed, range reduced to {self.range} blocks", str(err))
+            return 0
+        # a reorg while the logs were queried changes the range end hash, the range is queried again then
+        if any(to_hex(event.blockHash) != to_block_hash for event in events if event.blockNumber == to_block) or self._block_hash(to_block) != to_block_hash:
+            log.warn(f"[{self.name}] reorg during getLogs of blocks {from_block}-{to_block}, retrying")
+            return 0
+        self._store(events, to_block, to_block_hash)
+        if self.on_events and events:
+            self.on_events([event for _, event in events])
+        if len(events) < self.target_logs // 2:
+            self.range = min(self.max_range, self.range * 2)
+        return len(events)
+
+    def catch_up(self, head=None):
+        head = self.safe_head() if head is None else head
+        self.check_reorg()
+        started = time.monotonic()
+        total = 0
+        while self.checkpoint()[0] < head:
+            total += self.step(head)
+        log.okay(f"[{self.name}] ingested {total} events up to block {head}", f"{time.monotonic() - started:.1f}s")
+        return total
+
+    def follow(self, poll_interval=12, should_stop=lambda: False):
+        while not should_stop():
+            self.catch_up()
+            time.sleep(poll_interval)
+
+    def query(self, event=None, key=None, address=None, order_uid=None, from_block=None, to_block=None):
+        conditions, params = ["ingester = ?"], [self.name]
+        for column, value in (("event", event), ("key", key), ("address", address), ("order_uid", order_uid)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if from_block is not None:
+            conditions.append("block_number >= ?")
+            params.append(from_block)
+        if to_block is not None:
+            conditions.append("block_number <= ?")
+            params.append(to_block)
+        rows = self.conn.execute(f"SELECT * FROM events WHERE {' AND '.join(conditions)} ORDER BY block_number, log_index", params).fetchall()
+        return [{**dict(row), "args": json.loads(row["args"])} for row in rows]
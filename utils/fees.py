@@ -0,0 +1,153 @@
+import time
+from collections import deque
+from brownie import chain, web3
+from utils.store import open_db
+import utils.log as log
+
+BLOCK_TIME = 12
+
+# fee profiles ordered from the cheapest to the most expensive one
+# target_blocks is the inclusion delay the profile is expected to achieve
+PROFILES = {
+    "low": {"percentile": 10, "base_fee_multiplier": 1.25, "target_blocks": 20},
+    "normal": {"percentile": 50, "base_fee_multiplier": 2, "target_blocks": 3},
+    "urgent": {"percentile": 90, "base_fee_multiplier": 2.5, "target_blocks": 1},
+}
+PERCENTILES = sorted({p["percentile"] for p in PROFILES.values()})
+
+OPERATION_PROFILES = {
+    "deployFactory": "low",
+    "createSeller": "low",
+    "signOrder": "normal",
+    "cancelOrder": "urgent",
+    "sweep": "low",
+}
+
+# an order must be signed within this share of its validity window
+VALIDITY_WINDOW_SHARE = 0.1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS inclusion_log (
+    tx_hash TEXT PRIMARY KEY,
+    operation TEXT NOT NULL,
+    profile TEXT NOT NULL,
+    max_fee INTEGER NOT NULL,
+    priority_fee INTEGER NOT NULL,
+    sent_block INTEGER NOT NULL,
+    predicted_blocks INTEGER NOT NULL,
+    included_block INTEGER NOT NULL,
+    created_at INTEGER NOT NULL
+);
+"""
+
+
+class FeeQuote:
+    def __init__(self, operation, profile, max_fee, priority_fee, block_number):
+        self.operation = operation
+        self.profile = profile
+        self.max_fee = max_fee
+        self.priority_fee = priority_fee
+        self.block_number = block_number
+        self.predicted_blocks = PROFILES[profile]["target_blocks"]
+
+    @property
+    def tx_params(self):
+        return {"max_fee": self.max_fee, "priority_fee": self.priority_fee}
+
+
+class FeeHistoryCache:
+    """Rolling window of eth_feeHistory, only blocks mined since the last refresh are requested"""
+
+    def __init__(self, blocks=20):
+        self.blocks = blocks
+        self.rewards = deque(maxlen=blocks)
+        self.next_base_fee = None
+        self.last_block = None
+
+    def refresh(self):
+        latest = web3.eth.block_number
+        if latest == self.last_block:
+            return
+        count = self.blocks if self.last_block is None else min(self.blocks, latest - self.last_block)
+        history = web3.eth.fee_history(count, latest, PERCENTILES)
+        for rewards in history["reward"]:
+            self.rewards.append(dict(zip(PERCENTILES, rewards)))
+        # the last value is the base fee of the next block
+        self.next_base_fee = history["baseFeePerGas"][-1]
+        self.last_block = latest
+
+    def tip(self, percentile):
+        tips = sorted(rewards[percentile] for rewards in self.rewards)
+        return tips[len(tips) // 2] if tips else 0
+
+
+class FeeStrategy:
+    def __init__(self, history=None):
+        self.history = history or FeeHistoryCache()
+        self._db = None
+
+    def profile_for(self, operation, valid_to=None):
+        floor = OPERATION_PROFILES.get(operation, "normal")
+        if valid_to is None:
+            return floor
+        # the operation profile escalated to the cheapest one expected to include the tx within the allowed share
+        # of the time left before validTo
+        blocks_left = max(0, valid_to - chain.time()) * VALIDITY_WINDOW_SHARE / BLOCK_TIME
+        names = list(PROFILES)
+        for name in names[names.index(floor) :]:
+            if PROFILES[name]["target_blocks"] <= blocks_left:
+                return name
+        return "urgent"
+
+    def quote(self, operation, valid_to=None):
+        """Returns the fee quote for the operation or None when the network doesn't support EIP-1559"""
+        try:
+            self.history.refresh()
+        except Exception as err:
+            log.warn("Fee history not available, using default gas pricing", str(err))
+            return None
+        profile = self.profile_for(operation, valid_to)
+        config = PROFILES[profile]
+        priority_fee = self.history.tip(config["percentile"])
+        max_fee = int(self.history.next_base_fee * config["base_fee_multiplier"]) + priority_fee
+        return FeeQuote(operation, profile, max_fee, priority_fee, self.history.last_block)
+
+    def record_inclusion(self, quote, tx_hash, block_number):
+        if quote is None:
+            return
+        included_blocks = block_number - quote.block_number
+        log.note(
+            f"{quote.operation} inclusion ({quote.profile})",
+            f"predicted {quote.predicted_blocks} blocks, actual {included_blocks} blocks",
+        )
+        if self._db is None:
+            self._db = open_db("fees", SCHEMA)
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO inclusion_log VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    tx_hash,
+                    quote.operation,
+                    quote.profile,
+                    quote.max_fee,
+                    quote.priority_fee,
+                    quote.block_number,
+                    quote.predicted_blocks,
+                    block_number,
+                    int(time.time()),
+                ),
+            )
+
+
+_strategy = None
+
+
+def get_fee_strategy():
+    global _strategy
+    if _strategy is None:
+        _strategy = FeeStrategy()
+    return _strategy
+
+
+def fee_params(quote):
+    return quote.tx_params if quote else {}
@@ -0,0 +1,234 @@
+from collections import namedtuple
+from utils.light_rpc import keccak, to_checksum_address
+
+# GPv2Order marker values, keccak256 of the kind/balance names
+KIND_SELL = "f3b277728b3fee749481eb3e0b3b48980dbbab78658fc419025cb16eee346775"
+KIND_BUY = "6ed88e868af0a1983e3886d5f3e95a2fafbd6c3450bc229e27342283dc429ccc"
+BALANCE_ERC20 = "5a28e9363bb942b639270062aa6bb295f434bcdfc42c97267bf003f272060dc9"
+BALANCE_EXTERNAL = "abee3b73373acd583a130924aad6dc38cfdc44ba0555ba94ce2ff63980ea0632"
+BALANCE_INTERNAL = "4ac99ace14ee0a5ef932dc609df0943ab7ac16b7583634612f8dc35a4289a6ce"
+
+KIND_NAMES = {KIND_SELL: "sell", KIND_BUY: "buy"}
+BALANCE_NAMES = {BALANCE_ERC20: "erc20", BALANCE_EXTERNAL: "external", BALANCE_INTERNAL: "internal"}
+
+ORDER_TYPE = [
+    ("sellToken", "address"),
+    ("buyToken", "address"),
+    ("receiver", "address"),
+    ("sellAmount", "uint256"),
+    ("buyAmount", "uint256"),
+    ("validTo", "uint32"),
+    ("appData", "bytes32"),
+    ("feeAmount", "uint256"),
+    ("kind", "string"),
+    ("partiallyFillable", "bool"),
+    ("sellTokenBalance", "string"),
+    ("buyTokenBalance", "string"),
+]
+ORDER_TYPE_HASH = None
+
+DOMAIN_NAME = "Gnosis Protocol"
+DOMAIN_VERSION = "v2"
+DOMAIN_TYPE = [("name", "string"), ("version", "string"), ("chainId", "uint256"), ("verifyingContract", "address")]
+
+ZERO_APP_DATA = "0x0000000000000000000000000000000000000000000000000000000000000000"
+
+# CowSwap API signing schemes: presigned on chain by `signOrder`, or validated by the seller `isValidSignature`
+SIGNING_SCHEME_PRESIGN = "presign"
+SIGNING_SCHEME_EIP1271 = "eip1271"
+
+
+def _type_hash(name, fields):
+    return keccak(f"{name}({','.join(f'{type_} {field}' for field, type_ in fields)})".encode())
+
+
+def _word(value):
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, int):
+        return value.to_bytes(32, "big")
+    data = bytes.fromhex(value[2:] if value.startswith("0x") else value)
+    # addresses are left padded, bytes32 values are taken as is
+    return data.rjust(32, b"\0")
+
+
+def domain_separator(chain_id, settlement):
+    """EIP-712 domain separator of the GPv2Settlement contract"""
+    return keccak(
+        _type_hash("EIP712Domain", DOMAIN_TYPE) + keccak(DOMAIN_NAME.encode()) + keccak(DOMAIN_VERSION.encode()) + _word(int(chain_id)) + _word(settlement)
+    )
+
+
+_OrderFields = namedtuple(
+    "_OrderFields",
+    [
+        "sell_token",
+        "buy_token",
+        "receiver",
+        "sell_amount",
+        "buy_amount",
+        "valid_to",
+        "app_data",
+        "fee_amount",
+        "kind",
+        "partially_fillable",
+        "sell_token_balance",
+        "buy_token_balance",
+    ],
+)
+
+
+class Order(_OrderFields):
+    """Immutable GPv2 order, the tuple is the GPv2Order.Data contract call argument as is.
+    The CowSwap API payload, EIP-712 struct and struct hash are computed lazily and cached on the instance, off the tuple"""
+
+    def __new__(
+        cls,
+        sell_token,
+        buy_token,
+        receiver,
+        sell_amount,
+        buy_amount,
+        valid_to,
+        app_data=ZERO_APP_DATA,
+        fee_amount=0,
+        kind=KIND_SELL,
+        partially_fillable=False,
+        sell_token_balance=BALANCE_ERC20,
+        buy_token_balance=BALANCE_ERC20,
+    ):
+        if kind not in KIND_NAMES:
+            raise ValueError(f"Unknown order kind: {kind}")
+        if sell_token_balance not in BALANCE_NAMES or buy_token_balance not in BALANCE_NAMES:
+            raise ValueError("Unknown token balance marker")
+        return super().__new__(
+            cls,
+            to_checksum_address(str(sell_token)),
+            to_checksum_address(str(buy_token)),
+            to_checksum_address(str(receiver)),
+            int(sell_amount),
+            int(buy_amount),
+            int(valid_to),
+            app_data if isinstance(app_data, str) else "0x" + bytes(app_data).hex(),
+            int(fee_amount),
+            kind,
+            bool(partially_fillable),
+            sell_token_balance,
+            buy_token_balance,
+        )
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Order is immutable")
+
+    def _cached(self, name, compute):
+        value = self.__dict__.get(name)
+        if value is None:
+            value = self.__dict__[name] = compute()
+        return value
+
+    @classmethod
+    def _make(cls, values):
+        # `_replace` goes through the fields normalization too
+        return cls(*values)
+
+    @classmethod
+    def from_tuple(cls, values):
+        return cls(*values)
+
+    @classmethod
+    def from_api(cls, data):
+        """Order from the CowSwap API order (or payload) JSON"""
+        kinds = {name: marker for marker, name in KIND_NAMES.items()}
+        balances = {name: marker for marker, name in BALANCE_NAMES.items()}
+        return cls(
+            data["sellToken"],
+            data["buyToken"],
+            data["receiver"],
+            data["sellAmount"],
+            data["buyAmount"],
+            data["validTo"],
+            data["appData"],
+            data["feeAmount"],
+            kinds[data["kind"]],
+            data["partiallyFillable"],
+            balances[data.get("sellTokenBalance", "erc20")],
+            balances[data.get("buyTokenBalance", "erc20")],
+        )
+
+    def __repr__(self):
+        return f"Order({self.sell_amount} {self.sell_token} -> {self.buy_amount} {self.buy_token}, validTo={self.valid_to})"
+
+    @property
+    def eip712_message(self):
+        """EIP-712 struct of the order, as signed by EOA owners"""
+        return self._cached(
+            "_eip712",
+            lambda: {
+                "sellToken": self.sell_token,
+                "buyToken": self.buy_token,
+                "receiver": self.receiver,
+                "sellAmount": self.sell_amount,
+                "buyAmount": self.buy_amount,
+                "validTo": self.valid_to,
+                "appData": self.app_data,
+                "feeAmount": self.fee_amount,
+                "kind": KIND_NAMES[self.kind],
+                "partiallyFillable": self.partially_fillable,
+                "sellTokenBalance": BALANCE_NAMES[self.sell_token_balance],
+                "buyTokenBalance": BALANCE_NAMES[self.buy_token_balance],
+            },
+        )
+
+    def typed_data(self, chain_id, settlement):
+        return {
+            "types": {
+                "EIP712Domain": [{"name": field, "type": type_} for field, type_ in DOMAIN_TYPE],
+                "Order": [{"name": field, "type": type_} for field, type_ in ORDER_TYPE],
+            },
+            "primaryType": "Order",
+            "domain": {"name": DOMAIN_NAME, "version": DOMAIN_VERSION, "chainId": int(chain_id), "verifyingContract": settlement},
+            "message": self.eip712_message,
+        }
+
+    @property
+    def struct_hash(self):
+        """GPv2Order.hash struct hash, the string fields are encoded by their marker values"""
+        global ORDER_TYPE_HASH
+        if ORDER_TYPE_HASH is None:
+            ORDER_TYPE_HASH = _type_hash("Order", ORDER_TYPE)
+        return self._cached("_struct_hash", lambda: keccak(ORDER_TYPE_HASH + b"".join(_word(value) for value in self)))
+
+    def digest(self, domain):
+        return keccak(b"\x19\x01" + bytes(domain) + self.struct_hash)
+
+    def uid(self, domain, owner):
+        """Order UID as packed by GPv2Order.packOrderUidParams: digest, owner and validTo"""
+        return "0x" + (self.digest(domain) + bytes.fromhex(owner[2:]) + self.valid_to.to_bytes(4, "big")).hex()
+
+    @property
+    def eip1271_signature(self):
+        """ABI encoded order data, the signature checked by `OTCSeller.isValidSignature`"""
+        return "0x" + b"".join(_word(value) for value in self).hex()
+
+    def api_payload(self, sender, signing_scheme=SIGNING_SCHEME_PRESIGN, signature=None):
+        """CowSwap API order creation payload, the `eip1271` signature defaults to the encoded order"""
+        if signature is None:
+            signature = self.eip1271_signature if signing_scheme == SIGNING_SCHEME_EIP1271 else "0x"
+        payload = self._cached(
+            "_payload",
+            lambda: {
+                "sellToken": self.sell_token,
+                "buyToken": self.buy_token,
+                "sellAmount": str(self.sell_amount),  # sell amount before fee
+                "buyAmount": str(self.buy_amount),  # buy amount after fee
+                "validTo": self.valid_to,
+                "appData": self.app_data,
+                "feeAmount": str(self.fee_amount),
+                "kind": KIND_NAMES[self.kind],
+                "partiallyFillable": self.partially_fillable,
+                "receiver": self.receiver,
+                "sellTokenBalance": BALANCE_NAMES[self.sell_token_balance],
+                "buyTokenBalance": BALANCE_NAMES[self.buy_token_balance],
+            },
+        )
+        return {**payload, "from": sender, "signature": signature, "signingScheme": signing_scheme}
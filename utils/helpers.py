@@ -1,6 +1,5 @@
 import sys
 import utils.log as log
-from brownie import Wei
 
 
 def proceed_or_abort():
@@ -20,14 +19,10 @@ def is_called_from_test():
         return False
 
 
-def parseUnit(amount, decimals=18):
-    if decimals < 18:
-        return Wei(f"{amount} ether") // 10 ** (18 - decimals)
-    return Wei(f"{amount} ether")
+def view_call(abi, address, name):
+    """brownie call of the `name` view function of the contract at `address`, also batched by `multicall`.
+    Unlike a contract object, it's made without fetching the contract code"""
+    from brownie.network.contract import ContractCall
 
-
-def formatUnit(amount, decimals=18):
-    if decimals < 18:
-        corr = 18 - decimals
-        return str(Wei(amount * 10 ** (corr)).to("ether"))[:-corr]
-    return str(Wei(amount).to("ether"))
+    [fn] = [x for x in abi if x["type"] == "function" and x["name"] == name]
+    return ContractCall(address, fn, name, None)
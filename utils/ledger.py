@@ -0,0 +1,244 @@
+import csv
+import time
+from utils.store import open_db
+
+# amounts are kept as decimal strings, they don't fit into sqlite integers. The order executed sell amount excludes
+# the fee, like the order sell amount, fills keep the settlement `Trade` amounts with the fee included
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    order_uid TEXT PRIMARY KEY,
+    seller TEXT NOT NULL,
+    pair TEXT NOT NULL,
+    sell_token TEXT NOT NULL,
+    buy_token TEXT NOT NULL,
+    receiver TEXT NOT NULL,
+    sell_amount TEXT NOT NULL,
+    buy_amount TEXT NOT NULL,
+    fee_amount TEXT NOT NULL,
+    valid_to INTEGER NOT NULL,
+    app_data TEXT NOT NULL,
+    quote_fee_amount TEXT,
+    quote_buy_amount TEXT,
+    oracle_price TEXT,
+    sign_tx TEXT,
+    status TEXT NOT NULL,
+    executed_sell_amount TEXT NOT NULL DEFAULT '0',
+    executed_buy_amount TEXT NOT NULL DEFAULT '0',
+    executed_fee_amount TEXT NOT NULL DEFAULT '0',
+    created_at INTEGER NOT NULL,
+    updated_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS orders_seller ON orders (seller, created_at);
+CREATE INDEX IF NOT EXISTS orders_pair ON orders (pair, created_at);
+CREATE INDEX IF NOT EXISTS orders_status ON orders (status, created_at);
+CREATE INDEX IF NOT EXISTS orders_created_at ON orders (created_at);
+CREATE TABLE IF NOT EXISTS order_status_history (
+    order_uid TEXT NOT NULL,
+    status TEXT NOT NULL,
+    at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS order_status_history_uid ON order_status_history (order_uid, at);
+CREATE TABLE IF NOT EXISTS fills (
+    tx_hash TEXT NOT NULL,
+    log_index INTEGER NOT NULL,
+    order_uid TEXT NOT NULL,
+    block_number INTEGER NOT NULL,
+    sell_amount TEXT NOT NULL,
+    buy_amount TEXT NOT NULL,
+    fee_amount TEXT NOT NULL,
+    PRIMARY KEY (tx_hash, log_index)
+);
+CREATE INDEX IF NOT EXISTS fills_order_uid ON fills (order_uid);
+"""
+
+SIGNED = "signed"
+FULFILLED = "fulfilled"
+# statuses after which the order can't change anymore
+FINAL_STATUSES = ("fulfilled", "cancelled", "expired")
+
+EXPORT_COLUMNS = [
+    "order_uid",
+    "seller",
+    "sell_token",
+    "buy_token",
+    "sell_amount",
+    "buy_amount",
+    "fee_amount",
+    "valid_to",
+    "oracle_price",
+    "sign_tx",
+    "status",
+    "executed_sell_amount",
+    "executed_buy_amount",
+    "executed_fee_amount",
+    "created_at",
+]
+
+
+def pair_key(token_a, token_b):
+    return ":".join(sorted((token_a.lower(), token_b.lower())))
+
+
+def executed_amounts(fills):
+    """Executed (sell, buy, fee) amounts of the order fills, the `Trade` sell amount includes the fee"""
+    (sell, buy, fee) = [sum(int(fill[k]) for fill in fills) for k in ("sell_amount", "buy_amount", "fee_amount")]
+    return [sell - fee, buy, fee]
+
+
+class OrderLedger:
+    def __init__(self, conn=None):
+        self.conn = conn or open_db("ledger", SCHEMA)
+        if conn:
+            conn.executescript(SCHEMA)
+
+    def record_order(self, order, order_uid, seller_address, quote=None, oracle_price=None, sign_tx=None, status=SIGNED):
+        """Records the `make_order` fields, `quote` is the (fee_amount, buy_amount) pair returned by the CowSwap API"""
+        [sell_token, buy_token, receiver, sell_amount, buy_amount, valid_to, app_data, fee_amount, _, _, _, _] = order
+        (quote_fee, quote_buy) = quote or (None, None)
+        now = int(time.time())
+        with self.conn:
+            self.conn.execute(
+                """INSERT OR REPLACE INTO orders (order_uid, seller, pair, sell_token, buy_token, receiver, sell_amount, buy_amount, fee_amount, valid_to,
+                app_data, quote_fee_amount, quote_buy_amount, oracle_price, sign_tx, status, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (
+                    order_uid,
+                    seller_address,
+                    pair_key(str(sell_token), str(buy_token)),
+                    str(sell_token),
+                    str(buy_token),
+                    str(receiver),
+                    str(sell_amount),
+                    str(buy_amount),
+                    str(fee_amount),
+                    int(valid_to),
+                    str(app_data),
+                    None if quote_fee is None else str(quote_fee),
+                    None if quote_buy is None else str(quote_buy),
+                    None if oracle_price is None else str(oracle_price),
+                    sign_tx,
+                    status,
+                    now,
+                    now,
+                ),
+            )
+            self.conn.execute("INSERT INTO order_status_history VALUES (?, ?, ?)", (order_uid, status, now))
+
+    def get(self, order_uid):
+        return self.conn.execute("SELECT * FROM orders WHERE order_uid = ?", (order_uid,)).fetchone()
+
+    def set_status(self, order_uid, status, executed=None):
+        """Moves the order to `status`, `executed` is an optional (sell, buy, fee) executed amounts tuple, sell without the fee"""
+        row = self.get(order_uid)
+        if row is None:
+            return False
+        now = int(time.time())
+        with self.conn:
+            if executed is not None:
+                self.conn.execute(
+                    "UPDATE orders SET executed_sell_amount = ?, executed_buy_amount = ?, executed_fee_amount = ?, updated_at = ? WHERE order_uid = ?",
+                    (*(str(int(x)) for x in executed), now, order_uid),
+                )
+            if row["status"] != status:
+                self.conn.execute("UPDATE orders SET status = ?, updated_at = ? WHERE order_uid = ?", (status, now, order_uid))
+                self.conn.execute("INSERT INTO order_status_history VALUES (?, ?, ?)", (order_uid, status, now))
+        return True
+
+    def add_fill(self, order_uid, tx_hash, log_index, block_number, sell_amount, buy_amount, fee_amount):
+        """Adds a settlement trade of the order, executed amounts are recalculated from all the order fills"""
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO fills VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (tx_hash, log_index, order_uid, block_number, str(sell_amount), str(buy_amount), str(fee_amount)),
+            )
+        executed = executed_amounts(self.fills(order_uid))
+        row = self.get(order_uid)
+        if row is not None:
+            status = FULFILLED if executed[0] >= int(row["sell_amount"]) else row["status"]
+            self.set_status(order_uid, status, executed)
+
+    def rollback_fills(self, block_number):
+        """Drops fills of blocks after `block_number`, e.g. on chain reorg"""
+        order_uids = [row["order_uid"] for row in self.conn.execute("SELECT DISTINCT order_uid FROM fills WHERE block_number > ?", (block_number,))]
+        with self.conn:
+            self.conn.execute("DELETE FROM fills WHERE block_number > ?", (block_number,))
+        for order_uid in order_uids:
+            executed = executed_amounts(self.fills(order_uid))
+            row = self.get(order_uid)
+            if row is not None:
+                # only the status reached by the fills is downgraded, cancelled and expired orders stay as they are
+                status = SIGNED if row["status"] == FULFILLED and executed[0] < int(row["sell_amount"]) else row["status"]
+                self.set_status(order_uid, status, executed)
+
+    def fills(self, order_uid):
+        return self.conn.execute("SELECT * FROM fills WHERE order_uid = ? ORDER BY block_number, log_index", (order_uid,)).fetchall()
+
+    def history(self, order_uid):
+        return self.conn.execute("SELECT status, at FROM order_status_history WHERE order_uid = ? ORDER BY rowid", (order_uid,)).fetchall()
+
+    def query(self, seller=None, pair=None, status=None, since=None, until=None):
+        conditions, params = [], []
+        if seller:
+            conditions.append("seller = ?")
+            params.append(seller)
+        if pair:
+            conditions.append("pair = ?")
+            params.append(pair_key(*pair) if isinstance(pair, (tuple, list)) else pair)
+        if status:
+            statuses = [status] if isinstance(status, str) else list(status)
+            conditions.append(f"status IN ({', '.join('?' * len(statuses))})")
+            params += statuses
+        if since is not None:
+            conditions.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("created_at < ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self.conn.execute(f"SELECT * FROM orders {where} ORDER BY created_at", params).fetchall()
+
+    def status_counts(self):
+        return {row["status"]: row["count"] for row in self.conn.execute("SELECT status, COUNT(*) AS count FROM orders GROUP BY status")}
+
+    def open_orders(self):
+        return self.conn.execute(f"SELECT * FROM orders WHERE status NOT IN ({', '.join('?' * len(FINAL_STATUSES))})", FINAL_STATUSES).fetchall()
+
+    def realized_vs_floor(self, **filters):
+        """Realized price of (partially) executed orders compared to the signed buyAmount floor, in BPS"""
+        result = []
+        for row in self.query(**filters):
+            executed_sell, executed_buy = int(row["executed_sell_amount"]), int(row["executed_buy_amount"])
+            sell_amount, floor_buy = int(row["sell_amount"]), int(row["buy_amount"])
+            if executed_sell == 0 or floor_buy == 0:
+                continue
+            # the floor scaled to the executed part of the order
+            floor_for_executed = floor_buy * executed_sell // sell_amount
+            result.append(
+                {
+                    "order_uid": row["order_uid"],
+                    "seller": row["seller"],
+                    "executed_sell_amount": executed_sell,
+                    "executed_buy_amount": executed_buy,
+                    "floor_buy_amount": floor_for_executed,
+                    "surplus_bps": (executed_buy - floor_for_executed) * 10000 // floor_for_executed if floor_for_executed else 0,
+                }
+            )
+        return result
+
+    def export_columns(self, columns=EXPORT_COLUMNS, **filters):
+        rows = self.query(**filters)
+        return {column: [row[column] for row in rows] for column in columns}
+
+    def export_csv(self, filename, columns=EXPORT_COLUMNS, **filters):
+        data = self.export_columns(columns, **filters)
+        with open(filename, "w", newline="") as fp:
+            writer = csv.writer(fp)
+            writer.writerow(columns)
+            writer.writerows(zip(*(data[column] for column in columns)))
+
+    def export_parquet(self, filename, columns=EXPORT_COLUMNS, **filters):
+        # pyarrow is an optional dependency, only required for this export
+        import pyarrow
+        import pyarrow.parquet
+
+        pyarrow.parquet.write_table(pyarrow.table(self.export_columns(columns, **filters)), filename)
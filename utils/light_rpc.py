@@ -0,0 +1,180 @@
+# Minimal JSON-RPC client and ABI codec for read-only tools.
+# Must not import brownie or web3: their import and project loading is what makes the brownie path slow to start.
+import itertools
+import json
+import os
+import urllib.request
+from functools import lru_cache
+
+ABI_DIR = os.path.join(os.path.dirname(__file__), "abi")
+DYNAMIC_TYPES = ("bytes", "string")
+
+
+class RpcError(Exception):
+    pass
+
+
+@lru_cache(maxsize=None)
+def load_abi(name):
+    with open(os.path.join(ABI_DIR, f"{name}.json")) as fp:
+        return {item["name"]: item for item in json.load(fp) if item["type"] == "function"}
+
+
+def keccak(data):
+    # imported lazily, only the first selector or checksum calculation pays for it
+    from eth_hash.auto import keccak as _keccak
+
+    return _keccak(data)
+
+
+def to_checksum_address(address):
+    address = address.lower().replace("0x", "")
+    address_hash = keccak(address.encode()).hex()
+    return "0x" + "".join(c.upper() if int(address_hash[i], 16) >= 8 else c for i, c in enumerate(address))
+
+
+def _canonical_type(param):
+    if param["type"].startswith("tuple"):
+        return "(" + ",".join(_canonical_type(c) for c in param["components"]) + ")" + param["type"][5:]
+    return param["type"]
+
+
+@lru_cache(maxsize=None)
+def function_selector(signature):
+    return keccak(signature.encode())[:4]
+
+
+def _to_bytes(value):
+    return bytes.fromhex(value[2:] if value.startswith("0x") else value) if isinstance(value, str) else bytes(value)
+
+
+def _encode_static(typ, value):
+    if typ == "address":
+        return int(value, 16).to_bytes(32, "big")
+    if typ == "bool":
+        return int(bool(value)).to_bytes(32, "big")
+    if typ.startswith("bytes"):
+        return _to_bytes(value).ljust(32, b"\0")
+    if typ.startswith("int"):
+        return int(value).to_bytes(32, "big", signed=True)
+    return int(value).to_bytes(32, "big")
+
+
+def encode_args(types, values):
+    head, tail = [], []
+    tail_offset = 32 * len(types)
+    for typ, value in zip(types, values):
+        if typ in DYNAMIC_TYPES:
+            data = value.encode() if typ == "string" else _to_bytes(value)
+            head.append(tail_offset.to_bytes(32, "big"))
+            encoded = len(data).to_bytes(32, "big") + data.ljust((len(data) + 31) // 32 * 32, b"\0")
+            tail.append(encoded)
+            tail_offset += len(encoded)
+        else:
+            head.append(_encode_static(typ, value))
+    return b"".join(head + tail)
+
+
+def _decode_static(typ, word):
+    if typ == "address":
+        return to_checksum_address(word[12:].hex())
+    if typ == "bool":
+        return word[-1] == 1
+    if typ.startswith("bytes"):
+        return "0x" + word[: int(typ[5:])].hex()
+    if typ.startswith("int"):
+        return int.from_bytes(word, "big", signed=True)
+    return int.from_bytes(word, "big")
+
+
+def _decode(param, data, pos, base=0):
+    typ = param["type"]
+    if typ == "tuple":
+        # only static tuples are supported, components are encoded in place
+        return tuple(_decode(c, data, pos + 32 * i, base) for i, c in enumerate(param["components"]))
+    if typ in DYNAMIC_TYPES:
+        offset = base + int.from_bytes(data[pos : pos + 32], "big")
+        length = int.from_bytes(data[offset : offset + 32], "big")
+        value = data[offset + 32 : offset + 32 + length]
+        return value.decode() if typ == "string" else "0x" + value.hex()
+    return _decode_static(typ, data[pos : pos + 32])
+
+
+def _words(param):
+    return len(param["components"]) if param["type"] == "tuple" else 1
+
+
+def decode_outputs(outputs, data):
+    values, pos = [], 0
+    for param in outputs:
+        values.append(_decode(param, data, pos))
+        pos += 32 * _words(param)
+    return values[0] if len(values) == 1 else tuple(values)
+
+
+class RpcClient:
+    def __init__(self, url, timeout=30):
+        self.url = url
+        self.timeout = timeout
+        # the client may be shared by threads, `next` of the counter is atomic
+        self._ids = itertools.count(1)
+
+    def _post(self, payload):
+        request = urllib.request.Request(self.url, data=json.dumps(payload).encode(), headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.load(response)
+
+    def _message(self, method, params):
+        return {"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": params}
+
+    def request(self, method, params):
+        body = self._post(self._message(method, params))
+        if "error" in body:
+            raise RpcError(body["error"].get("message"))
+        return body["result"]
+
+    def batch(self, requests, allow_errors=False):
+        """Sends [(method, params), ...] in a single HTTP request, results are returned in the same order.
+        With `allow_errors` the failed requests results are None instead of raising"""
+        if not requests:
+            return []
+        messages = [self._message(method, params) for method, params in requests]
+        by_id = {item["id"]: item for item in self._post(messages)}
+        results = []
+        for message in messages:
+            item = by_id[message["id"]]
+            if "error" in item:
+                if not allow_errors:
+                    raise RpcError(item["error"].get("message"))
+                results.append(None)
+                continue
+            results.append(item["result"])
+        return results
+
+
+class Contract:
+    def __init__(self, client, abi_name, address):
+        self.client = client
+        self.abi_name = abi_name
+        self.address = address
+
+    def _function(self, name):
+        return load_abi(self.abi_name)[name]
+
+    def encode(self, name, *args):
+        fn = self._function(name)
+        types = [_canonical_type(i) for i in fn["inputs"]]
+        selector = function_selector(f"{name}({','.join(types)})")
+        return ("eth_call", [{"to": self.address, "data": "0x" + (selector + encode_args(types, args)).hex()}, "latest"])
+
+    def decode(self, name, result):
+        return decode_outputs(self._function(name)["outputs"], _to_bytes(result))
+
+    def call(self, name, *args):
+        return self.decode(name, self.client.request(*self.encode(name, *args)))
+
+
+def batch_call(client, calls):
+    """Executes [(contract, name, args), ...] view calls in one JSON-RPC batch"""
+    results = client.batch([contract.encode(name, *args) for contract, name, args in calls])
+    return [contract.decode(name, result) for (contract, name, _), result in zip(calls, results)]
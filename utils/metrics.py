@@ -0,0 +1,157 @@
+"""Optional Prometheus metrics of the seller scripts, served over HTTP when the METRICS_PORT env is set.
+
+`prometheus_client` is imported and the CowSwap API and RPC hooks are installed only by `start()`,
+so with the exporter disabled every `observe_*` call is a single check of a module global.
+"""
+import time
+from threading import Lock
+from utils.env import get_env
+import utils.log as log
+
+METRICS_PORT_ENV = "METRICS_PORT"
+# latency buckets of the CowSwap API and RPC requests, in seconds
+REQUEST_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# the sign flow includes the API calls and the tx inclusion
+SIGN_ORDER_BUCKETS = (1, 2.5, 5, 10, 15, 30, 60, 120, 300, 600)
+
+_metrics = None
+
+
+def enabled():
+    return _metrics is not None
+
+
+def start(port=None):
+    """Starts the exporter on `port` or the METRICS_PORT env port, returns whether metrics are enabled"""
+    global _metrics
+    port = port or get_env(METRICS_PORT_ENV)
+    if _metrics is not None or not port:
+        return _metrics is not None
+    try:
+        # optional dependency, only required for the exporter
+        import prometheus_client
+    except ImportError:
+        log.warn(f"{METRICS_PORT_ENV} is set, but prometheus_client is not installed. Metrics are disabled")
+        return False
+    from utils.cow import add_response_hook
+    from utils.rpc import add_request_hook
+
+    _metrics = Metrics(prometheus_client)
+    prometheus_client.start_http_server(int(port), registry=_metrics.registry)
+    add_response_hook(_metrics.observe_cow_response)
+    add_request_hook(_metrics.observe_rpc)
+    log.info("Metrics exporter listening on port", port)
+    return True
+
+
+def observe_sign_order(started, flow, result):
+    """`started` is the `time.monotonic()` of the order quote request, `result` is `signed` or the failure kind"""
+    if _metrics is not None:
+        _metrics.sign_order.labels(flow, result).observe(time.monotonic() - started)
+
+
+def watch_seller(seller):
+    """Exports the pair token balances and the price feed age of the seller"""
+    if _metrics is not None:
+        _metrics.watch_seller(seller)
+
+
+def watch_ledger(ledger):
+    """Exports the number of the ledger orders by status"""
+    if _metrics is not None:
+        _metrics.ledger = ledger
+
+
+def cow_endpoint(url):
+    """`quote`, `feeAndQuote`, `orders`... path part following `/api/v1/`, order uids are not used as labels"""
+    path = url.split("?")[0].split("/api/v1/", 1)[-1]
+    return path.split("/")[0]
+
+
+class Metrics:
+    def __init__(self, prometheus_client):
+        from prometheus_client.core import GaugeMetricFamily
+
+        self._gauge = GaugeMetricFamily
+        self.registry = prometheus_client.CollectorRegistry()
+        self.cow_request = prometheus_client.Histogram(
+            "otc_cow_api_request_seconds", "CowSwap API request latency", ["endpoint", "method"], buckets=REQUEST_BUCKETS, registry=self.registry
+        )
+        self.cow_response = prometheus_client.Counter(
+            "otc_cow_api_responses", "CowSwap API responses by status code", ["endpoint", "method", "code"], registry=self.registry
+        )
+        self.cow_error = prometheus_client.Counter(
+            "otc_cow_api_errors", "CowSwap API errors by the API errorType", ["endpoint", "error_type"], registry=self.registry
+        )
+        self.rpc_request = prometheus_client.Histogram(
+            "otc_rpc_request_seconds", "JSON-RPC request latency", ["method"], buckets=REQUEST_BUCKETS, registry=self.registry
+        )
+        self.rpc_error = prometheus_client.Counter("otc_rpc_errors", "JSON-RPC error responses", ["method"], registry=self.registry)
+        self.sign_order = prometheus_client.Histogram(
+            "otc_sign_order_seconds",
+            "Order sign flow time from the quote to the sign tx receipt",
+            ["flow", "result"],
+            buckets=SIGN_ORDER_BUCKETS,
+            registry=self.registry,
+        )
+        self.sellers = {}
+        self.ledger = None
+        self._lock = Lock()
+        # the scrape time values are read by the exporter thread
+        self.registry.register(self)
+
+    def observe_cow_response(self, response, *args, **kwargs):
+        endpoint = cow_endpoint(response.request.url)
+        method = response.request.method
+        self.cow_request.labels(endpoint, method).observe(response.elapsed.total_seconds())
+        self.cow_response.labels(endpoint, method, str(response.status_code)).inc()
+        if response.status_code >= 400:
+            try:
+                error_type = response.json().get("errorType", "unknown")
+            except ValueError:
+                error_type = "unknown"
+            self.cow_error.labels(endpoint, error_type).inc()
+
+    def observe_rpc(self, method, params, response, elapsed):
+        self.rpc_request.labels(method).observe(elapsed)
+        if response is None or (isinstance(response, dict) and "error" in response):
+            self.rpc_error.labels(method).inc()
+
+    def watch_seller(self, seller):
+        with self._lock:
+            self.sellers[seller.address] = seller
+
+    def collect(self):
+        """Scrape time gauges, a failed read is logged and skipped so it doesn't fail the whole scrape"""
+        with self._lock:
+            (sellers, ledger) = (list(self.sellers.values()), self.ledger)
+        if ledger is not None:
+            orders = self._gauge("otc_orders", "Ledger orders by status", labels=["status"])
+            for (status, count) in ledger.status_counts().items():
+                orders.add_metric([status], count)
+            yield orders
+        if not sellers:
+            return
+        balances = self._gauge("otc_seller_balance", "Seller pair token balance, in token units", labels=["seller", "token"])
+        feed_age = self._gauge("otc_oracle_price_age_seconds", "Time since the seller price feed latest round update", labels=["feed"])
+        # sellers of the same pair share the feed
+        feeds = set()
+        for seller in sellers:
+            try:
+                self._collect_seller(seller, balances, feed_age, feeds)
+            except Exception as err:
+                log.warn(f"Metrics of seller {seller.address} failed", str(err))
+        yield balances
+        yield feed_age
+
+    def _collect_seller(self, seller, balances, feed_age, feeds):
+        from brownie import interface
+
+        for token in (seller.tokenA(), seller.tokenB()):
+            erc20 = interface.ERC20(token)
+            balances.add_metric([seller.address, erc20.symbol()], erc20.balanceOf(seller.address) / 10 ** erc20.decimals())
+        (priceFeed, _, _, constantPrice) = seller.getPairConfig()
+        if not constantPrice and priceFeed not in feeds:
+            feeds.add(priceFeed)
+            (_, _, _, updatedAt, _) = interface.IChainlinkPriceFeedV3(priceFeed).latestRoundData()
+            feed_age.add_metric([priceFeed], time.time() - updatedAt)
@@ -0,0 +1,70 @@
+import time
+from utils.store import open_db
+
+PENDING = "pending"
+PROCESSING = "processing"
+SIGNED = "signed"
+REJECTED = "rejected"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS order_intents (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sell_token TEXT NOT NULL,
+    buy_token TEXT NOT NULL,
+    sell_amount TEXT NOT NULL,
+    valid_period INTEGER NOT NULL,
+    beneficiary TEXT NOT NULL,
+    status TEXT NOT NULL,
+    order_uid TEXT,
+    tx_hash TEXT,
+    error TEXT,
+    created_at INTEGER NOT NULL,
+    updated_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS order_intents_status ON order_intents (status, id);
+"""
+
+
+class OrderQueue:
+    """Order intents queue backed by a local sqlite table, safe to be fed while the daemon is running"""
+
+    def __init__(self, conn=None):
+        self.conn = conn or open_db("orders", SCHEMA)
+        if conn:
+            conn.executescript(SCHEMA)
+
+    def push(self, sell_token, buy_token, sell_amount, valid_period, beneficiary):
+        now = int(time.time())
+        with self.conn:
+            cur = self.conn.execute(
+                "INSERT INTO order_intents (sell_token, buy_token, sell_amount, valid_period, beneficiary, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (sell_token, buy_token, str(sell_amount), int(valid_period), beneficiary, PENDING, now, now),
+            )
+        return cur.lastrowid
+
+    def take(self):
+        """Marks the oldest pending intent as processing and returns it"""
+        with self.conn:
+            row = self.conn.execute("SELECT * FROM order_intents WHERE status = ? ORDER BY id LIMIT 1", (PENDING,)).fetchone()
+            if row is None:
+                return None
+            self.update(row["id"], PROCESSING)
+        return row
+
+    def update(self, intent_id, status, **fields):
+        fields = {"status": status, "updated_at": int(time.time()), **fields}
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        with self.conn:
+            self.conn.execute(f"UPDATE order_intents SET {assignments} WHERE id = ?", (*fields.values(), intent_id))
+
+    def get(self, intent_id):
+        return self.conn.execute("SELECT * FROM order_intents WHERE id = ?", (intent_id,)).fetchone()
+
+    def list(self, status=None):
+        if status:
+            return self.conn.execute("SELECT * FROM order_intents WHERE status = ? ORDER BY id", (status,)).fetchall()
+        return self.conn.execute("SELECT * FROM order_intents ORDER BY id").fetchall()
+
+    def interrupted(self):
+        return self.list(PROCESSING)
@@ -0,0 +1,130 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+MAX_BPS = 10_000
+# OTCSeller.checkOrder rejects orders with a fee above 1/10th of the sell amount
+MAX_FEE_DIVISOR = 10
+
+
+def min_buy_amount(sell_amount, price, max_margin, sell_decimals, buy_decimals):
+    """Python equivalent of OTCSeller.minBuyAmount, `price` is normalized to 1e18"""
+    return ((sell_amount * price * (MAX_BPS - max_margin)) // MAX_BPS) // (10 ** (18 + sell_decimals - buy_decimals))
+
+
+def check_order_amounts(sell_amount, buy_amount, fee_amount, min_buy):
+    """Amount rules of OTCSeller.checkOrder, returns the same (success, result) pair"""
+    if fee_amount > sell_amount // MAX_FEE_DIVISOR:
+        return (False, "Order fee to high")
+    if min_buy > buy_amount:
+        return (False, "buyAmount too low")
+    return (True, "")
+
+
+class QuoteCurve:
+    """Memoized (fee, buy amount after fee) quotes by sell amount, missing quotes are requested concurrently"""
+
+    def __init__(self, quote, max_workers=8):
+        self.quote = quote
+        self.max_workers = max_workers
+        self.quotes = {}
+        self.requests = 0
+        self._lock = Lock()
+
+    def _request(self, sell_amount):
+        result = self.quote(sell_amount)
+        with self._lock:
+            self.requests += 1
+            self.quotes[sell_amount] = result
+        return result
+
+    def get_many(self, sell_amounts):
+        missing = sorted({amount for amount in sell_amounts if amount not in self.quotes})
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(missing))) as executor:
+                list(executor.map(self._request, missing))
+        return {amount: self.quotes[amount] for amount in sell_amounts}
+
+    def get(self, sell_amount):
+        return self.get_many([sell_amount])[sell_amount]
+
+
+def _fit_line(points):
+    """Least squares (intercept, slope) of the (x, y) points"""
+    n = len(points)
+    mean_x = sum(x for x, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    var_x = sum((x - mean_x) ** 2 for x, _ in points)
+    if var_x == 0:
+        return (mean_y, 0.0)
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x
+    return (mean_y - slope * mean_x, slope)
+
+
+class FeeModel:
+    """Fee as a fixed (gas) part plus a share of the size, and the execution rate decaying linearly with the size (price impact)"""
+
+    def __init__(self, quotes):
+        self.fee = _fit_line([(amount, fee) for amount, (fee, _) in quotes.items()])
+        self.rate = _fit_line([(amount, buy / (amount - fee)) for amount, (fee, buy) in quotes.items() if amount > fee])
+
+    def predict(self, sell_amount):
+        fee = max(0.0, self.fee[0] + self.fee[1] * sell_amount)
+        rate = max(0.0, self.rate[0] + self.rate[1] * sell_amount)
+        return (fee, max(0.0, sell_amount - fee) * rate)
+
+
+def split_amounts(total, count):
+    """`count` equal slices of `total`, the remainder goes to the last one"""
+    size = total // count
+    return [size] * (count - 1) + [total - size * (count - 1)]
+
+
+class SplitPlan:
+    def __init__(self, slices):
+        # (sell_amount, fee_amount, buy_amount_after_fee, min_buy_amount) of every slice
+        self.slices = slices
+        self.sell_amount = sum(x[0] for x in slices)
+        self.fee_amount = sum(x[1] for x in slices)
+        self.proceeds = sum(x[2] for x in slices)
+
+    @property
+    def count(self):
+        return len(self.slices)
+
+    @property
+    def fee_ratio(self):
+        return self.fee_amount / self.sell_amount if self.sell_amount else 0
+
+
+def optimize_split(total, quote, min_buy, max_slices=8, probes=4, candidates=3, curve=None):
+    """Splits the `total` sell amount into the orders count maximizing the quoted proceeds.
+
+    `quote(sell_amount)` returns the (fee, buy amount after fee) of a single order and `min_buy(sell_amount)` its signed buyAmount floor.
+    The fee model fitted on `probes` sizes ranks all the counts, only the best `candidates` counts get real quotes.
+    Every slice of the returned plan passes the checkOrder amount rules, None is returned if no count does.
+    """
+    curve = curve or QuoteCurve(quote)
+    probe_counts = sorted({max(1, min(max_slices, round(max_slices ** (i / max(1, probes - 1))))) for i in range(probes)})
+    model = FeeModel(curve.get_many([split_amounts(total, count)[0] for count in probe_counts]))
+
+    def predicted(count):
+        return sum(model.predict(amount)[1] for amount in split_amounts(total, count))
+
+    counts = sorted(range(1, max_slices + 1), key=predicted, reverse=True)[:candidates]
+    quotes = curve.get_many({amount for count in counts for amount in split_amounts(total, count)})
+
+    best = None
+    for count in counts:
+        slices = []
+        for amount in split_amounts(total, count):
+            (fee, buy) = quotes[amount]
+            floor = min_buy(amount)
+            # the order is signed with the floor as buyAmount, but only fills when the market quote is above it
+            if not check_order_amounts(amount, buy, fee, floor)[0]:
+                break
+            slices.append((amount, fee, buy, floor))
+        else:
+            plan = SplitPlan(slices)
+            if best is None or plan.proceeds > best.proceeds:
+                best = plan
+    return best
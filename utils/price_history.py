@@ -0,0 +1,296 @@
+# Local history of Chainlink feed rounds for the price staleness and volatility analysis.
+# Must not import brownie or web3, so the analysis code and `scripts.price_history` start fast.
+import json
+import mmap
+import os
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from utils.light_rpc import Contract
+import utils.log as log
+
+# column name, array typecode; rows are sorted by updatedAt
+COLUMNS = (("updated_at", "Q"), ("answer", "q"), ("phase", "H"), ("round", "Q"))
+PHASE_OFFSET = 64
+INT64_MAX = 2**63 - 1
+# average number of rounds per bucket of the time index
+ROUNDS_PER_BUCKET = 4
+
+
+def split_round_id(round_id):
+    """Proxy roundId is the aggregator phase in the high bits and the aggregator round in the low 64 bits"""
+    return (round_id >> PHASE_OFFSET, round_id & (2**PHASE_OFFSET - 1))
+
+
+def make_round_id(phase, round):
+    return (phase << PHASE_OFFSET) | round
+
+
+class RoundHistory:
+    """Columnar store of the feed rounds, a file per column in `directory`, read through memory maps.
+
+    Lookups of the price at a time are `bisect` over the memory mapped `updated_at` column, O(log n) without
+    loading the history to memory. The bisect range is narrowed by a time index of the first row of each
+    power of two seconds bucket, built on the first lookup. Answers are kept as int64, which is enough
+    for the ETH denominated feeds.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._maps = []
+        self._index = None
+        self.meta = self._read_meta()
+        self._open()
+
+    def _path(self, name):
+        return os.path.join(self.directory, f"{name}.col")
+
+    def _read_meta(self):
+        path = os.path.join(self.directory, "meta.json")
+        if not os.path.exists(path):
+            return {}
+        with open(path) as fp:
+            return json.load(fp)
+
+    def set_meta(self, **values):
+        self.meta.update(values)
+        with open(os.path.join(self.directory, "meta.json"), "w") as fp:
+            json.dump(self.meta, fp, indent=4)
+
+    def _open(self):
+        self.close()
+        self._index = None
+        for (name, typecode) in COLUMNS:
+            path = self._path(name)
+            if not os.path.exists(path) or os.path.getsize(path) == 0:
+                # empty files can't be mapped
+                setattr(self, name, array(typecode))
+                continue
+            with open(path, "rb") as fp:
+                mapped = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps.append(mapped)
+            setattr(self, name, memoryview(mapped).cast(typecode))
+
+    def close(self):
+        for (name, _) in COLUMNS:
+            if isinstance(getattr(self, name, None), memoryview):
+                getattr(self, name).release()
+        for mapped in self._maps:
+            mapped.close()
+        self._maps = []
+
+    def __len__(self):
+        return len(self.updated_at)
+
+    def last_round_id(self):
+        if not len(self):
+            return None
+        return make_round_id(self.phase[-1], self.round[-1])
+
+    def add(self, rounds):
+        """Stores [(roundId, answer, updatedAt), ...], rounds newer than the stored ones are appended,
+        otherwise the columns are rewritten with the merged rounds"""
+        rounds = sorted({round_id: (round_id, answer, updated_at) for (round_id, answer, updated_at) in rounds}.values(), key=lambda x: (x[2], x[0]))
+        if not rounds:
+            return 0
+        for (_, answer, _) in rounds:
+            if abs(answer) > INT64_MAX:
+                raise ValueError(f"Answer {answer} is out of the int64 column range")
+        if not len(self) or (rounds[0][2], rounds[0][0]) > (self.updated_at[-1], self.last_round_id()):
+            self._write(rounds, "ab")
+            return len(rounds)
+
+        stored = {row[0]: row for row in self.rows()}
+        added = sum(1 for row in rounds if row[0] not in stored)
+        stored.update({row[0]: row for row in rounds})
+        self._write(sorted(stored.values(), key=lambda x: (x[2], x[0])), "wb")
+        return added
+
+    def _write(self, rounds, mode):
+        values = {
+            "updated_at": [x[2] for x in rounds],
+            "answer": [x[1] for x in rounds],
+            "phase": [split_round_id(x[0])[0] for x in rounds],
+            "round": [split_round_id(x[0])[1] for x in rounds],
+        }
+        self.close()
+        for (name, typecode) in COLUMNS:
+            path = self._path(name)
+            # columns are rewritten to a temporary file first, so readers never see partially written ones
+            target = path + ".tmp" if mode == "wb" else path
+            with open(target, mode) as fp:
+                array(typecode, values[name]).tofile(fp)
+            if mode == "wb":
+                os.replace(target, path)
+        self._open()
+
+    def rows(self, start=0, stop=None):
+        """[(roundId, answer, updatedAt), ...] of the rows range"""
+        stop = len(self) if stop is None else stop
+        return [(make_round_id(self.phase[i], self.round[i]), self.answer[i], self.updated_at[i]) for i in range(start, stop)]
+
+    def _time_index(self):
+        """(first updatedAt, bucket width bits, first row of each bucket)"""
+        if self._index is None:
+            (updated_at, count) = (self.updated_at, len(self))
+            first = updated_at[0]
+            shift = max(0, ((updated_at[-1] - first) * ROUNDS_PER_BUCKET // count).bit_length() - 1)
+            buckets = ((updated_at[-1] - first) >> shift) + 2
+            self._index = (first, shift, array("q", (bisect_left(updated_at, first + (b << shift)) for b in range(buckets))))
+        return self._index
+
+    def index_at(self, timestamp):
+        """Index of the round effective at `timestamp`, i.e. the last one updated at or before it, -1 if none"""
+        if not len(self) or timestamp < self.updated_at[0]:
+            return -1
+        (first, shift, index) = self._time_index()
+        bucket = (timestamp - first) >> shift
+        if bucket >= len(index) - 1:
+            return len(self) - 1
+        return bisect_right(self.updated_at, timestamp, index[bucket], index[bucket + 1]) - 1
+
+    def price_at(self, timestamp):
+        index = self.index_at(timestamp)
+        return self.answer[index] if index >= 0 else None
+
+    def round_at(self, timestamp):
+        index = self.index_at(timestamp)
+        return self.rows(index, index + 1)[0] if index >= 0 else None
+
+    def age_at(self, timestamp):
+        """Seconds since the update of the round effective at `timestamp`, i.e. how stale the feed price was"""
+        index = self.index_at(timestamp)
+        return timestamp - self.updated_at[index] if index >= 0 else None
+
+    def prices_at(self, timestamps):
+        """Prices at many timestamps, vectorized by numpy when it's installed"""
+        if not len(self):
+            return [None] * len(timestamps)
+        try:
+            import numpy
+        except ImportError:
+            return self._prices_at(timestamps)
+        indexes = numpy.searchsorted(numpy.frombuffer(self.updated_at, dtype=numpy.uint64), numpy.asarray(timestamps, dtype=numpy.uint64), side="right") - 1
+        answers = numpy.frombuffer(self.answer, dtype=numpy.int64)
+        return [int(answers[i]) if i >= 0 else None for i in indexes]
+
+    def _prices_at(self, timestamps):
+        # `index_at` inlined, the lookup cost is dominated by the calls overhead
+        (first, shift, index) = self._time_index()
+        (updated_at, answer, last_bucket, last_answer) = (self.updated_at, self.answer, len(index) - 2, self.answer[-1])
+        prices = []
+        append = prices.append
+        for timestamp in timestamps:
+            bucket = (timestamp - first) >> shift
+            if bucket < 0:
+                append(None)
+            elif bucket > last_bucket:
+                append(last_answer)
+            else:
+                append(answer[bisect_right(updated_at, timestamp, index[bucket], index[bucket + 1]) - 1])
+        return prices
+
+    def range(self, start_time, end_time):
+        """Rounds updated within [start_time, end_time]"""
+        return self.rows(bisect_right(self.updated_at, start_time - 1), bisect_right(self.updated_at, end_time))
+
+
+class RoundRecorder:
+    """Backfills the feed rounds by `getRoundData` in JSON-RPC batches sent concurrently, then follows the new rounds"""
+
+    def __init__(self, client, feed_address, history, batch_size=100, workers=4):
+        self.feed = Contract(client, "ChainlinkPriceFeed", feed_address)
+        self.client = client
+        self.history = history
+        self.batch_size = batch_size
+        self.workers = workers
+
+    def _fetch_batch(self, round_ids):
+        results = self.client.batch([self.feed.encode("getRoundData", round_id) for round_id in round_ids], allow_errors=True)
+        rounds = []
+        for result in results:
+            # missing rounds revert or return zeros depending on the aggregator version
+            if result is None or result == "0x":
+                continue
+            (round_id, answer, _, updated_at, _) = self.feed.decode("getRoundData", result)
+            if updated_at:
+                rounds.append((round_id, answer, updated_at))
+        return rounds
+
+    def fetch(self, round_ids):
+        batches = [round_ids[i : i + self.batch_size] for i in range(0, len(round_ids), self.batch_size)]
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return [x for rounds in executor.map(self._fetch_batch, batches) for x in rounds]
+
+    def _round_exists(self, phase, round):
+        return bool(self._fetch_batch([make_round_id(phase, round)]))
+
+    def last_phase_round(self, phase):
+        """Last round of a previous phase, found by exponential probing and bisection"""
+        if not self._round_exists(phase, 1):
+            return 0
+        (low, high) = (1, 2)
+        while self._round_exists(phase, high):
+            (low, high) = (high, high * 2)
+        # low exists, high does not
+        while high - low > 1:
+            middle = (low + high) // 2
+            (low, high) = (middle, high) if self._round_exists(phase, middle) else (low, middle)
+        return low
+
+    def latest_round_id(self):
+        (round_id, _, _, _, _) = self.feed.call("latestRoundData")
+        return round_id
+
+    def _fetch_range(self, phase, first, last, since=0):
+        """Rounds [first, last] of the phase updated since `since`, fetched from the newest in chunks.
+        Returns the rounds and whether a round older than `since` was reached"""
+        rounds = []
+        chunk = self.batch_size * self.workers
+        while last >= first:
+            start = max(first, last - chunk + 1)
+            fetched = self.fetch([make_round_id(phase, r) for r in range(last, start - 1, -1)])
+            rounds += [x for x in fetched if x[2] >= since]
+            if any(x[2] < since for x in fetched):
+                return (rounds, True)
+            last = start - 1
+        return (rounds, False)
+
+    def backfill(self, since=0):
+        """Stores the rounds updated since the `since` timestamp, going back through the previous phases"""
+        (phase, last) = split_round_id(self.latest_round_id())
+        added = 0
+        while True:
+            (rounds, reached) = self._fetch_range(phase, 1, last, since)
+            added += self.history.add(rounds)
+            log.note(f"Phase {phase}", f"{len(rounds)} rounds")
+            # proxy phases start at 1, phase 0 is an aggregator read directly
+            if reached or phase <= 1:
+                return added
+            phase -= 1
+            last = self.last_phase_round(phase)
+
+    def sync(self):
+        """Stores the rounds after the last stored one, including the rest of its phase after a phase change"""
+        stored = self.history.last_round_id()
+        if stored is None:
+            return self.backfill()
+        (phase, last) = split_round_id(self.latest_round_id())
+        (stored_phase, stored_round) = split_round_id(stored)
+        rounds = []
+        if phase != stored_phase:
+            rounds += self._fetch_range(stored_phase, stored_round + 1, self.last_phase_round(stored_phase))[0]
+            stored_round = 0
+        for skipped_phase in range(stored_phase + 1, phase):
+            rounds += self._fetch_range(skipped_phase, 1, self.last_phase_round(skipped_phase))[0]
+        rounds += self._fetch_range(phase, stored_round + 1, last)[0]
+        return self.history.add(rounds)
+
+    def follow(self, interval=60):
+        while True:
+            added = self.sync()
+            if added:
+                log.note("New rounds", added)
+            time.sleep(interval)
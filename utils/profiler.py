@@ -0,0 +1,110 @@
+import functools
+import hashlib
+import json
+from collections import defaultdict
+from utils.env import get_env
+from utils.rpc import add_request_hook, remove_request_hook
+import utils.log as log
+
+PROFILE_ENV = "RPC_PROFILE"
+
+
+def params_fingerprint(method, params):
+    payload = json.dumps([method, params], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()[:12]
+
+
+def describe_call(method, params, selectors=None):
+    # eth_call params are [{"to": ..., "data": ...}, block], show target and called function
+    if method in ("eth_call", "eth_estimateGas") and params and isinstance(params[0], dict):
+        tx = params[0]
+        data = tx.get("data") or tx.get("input") or "0x"
+        selector = data[:10]
+        name = (selectors or {}).get(selector, selector)
+        return f"{method} {name} @ {tx.get('to')}"
+    return method
+
+
+class RpcProfiler:
+    def __init__(self, selectors=None):
+        self.selectors = selectors or {}
+        self.calls = []
+
+    def __enter__(self):
+        add_request_hook(self.record)
+        return self
+
+    def __exit__(self, *exc):
+        remove_request_hook(self.record)
+
+    def record(self, method, params, response, elapsed):
+        error = isinstance(response, dict) and "error" in response
+        self.calls.append((method, params_fingerprint(method, params), elapsed, describe_call(method, params, self.selectors), error))
+
+    def report(self):
+        methods = defaultdict(lambda: {"count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0})
+        seen = defaultdict(lambda: {"count": 0, "total_ms": 0.0, "call": None})
+        for method, fingerprint, elapsed, call, error in self.calls:
+            ms = elapsed * 1000
+            stats = methods[method]
+            stats["count"] += 1
+            stats["errors"] += int(error)
+            stats["total_ms"] += ms
+            stats["max_ms"] = max(stats["max_ms"], ms)
+            entry = seen[fingerprint]
+            entry["count"] += 1
+            entry["total_ms"] += ms
+            entry["call"] = call
+
+        duplicates = [{"fingerprint": fp, **entry} for fp, entry in seen.items() if entry["count"] > 1]
+        duplicates.sort(key=lambda x: x["total_ms"], reverse=True)
+        for stats in methods.values():
+            stats["avg_ms"] = stats["total_ms"] / stats["count"]
+        return {
+            "requests": len(self.calls),
+            "total_ms": sum(c[2] for c in self.calls) * 1000,
+            "methods": dict(sorted(methods.items(), key=lambda x: x[1]["total_ms"], reverse=True)),
+            "duplicates": duplicates,
+        }
+
+    def print_report(self):
+        report = self.report()
+        log.info("RPC requests", f"{report['requests']} ({report['total_ms']:.1f}ms)")
+        for method, stats in report["methods"].items():
+            log.note(
+                method,
+                f"{stats['count']}x, total {stats['total_ms']:.1f}ms, avg {stats['avg_ms']:.1f}ms, max {stats['max_ms']:.1f}ms, errors {stats['errors']}",
+            )
+        if report["duplicates"]:
+            log.warn("Duplicate requests", len(report["duplicates"]))
+            for dup in report["duplicates"]:
+                log.note(dup["call"], f"{dup['count']}x, total {dup['total_ms']:.1f}ms")
+
+    def dump(self, filename):
+        with open(filename, "w") as fp:
+            json.dump({**self.report(), "calls": [{"method": c[0], "fingerprint": c[1], "ms": c[2] * 1000, "call": c[3]} for c in self.calls]}, fp, indent=4)
+        log.info("RPC profile saved to", filename)
+
+
+def profile_rpc(selectors=None):
+    """Profiles the wrapped command if the RPC_PROFILE env is set: `1` prints the report, any other value is a dump filename"""
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            target = get_env(PROFILE_ENV)
+            if not target:
+                return fn(*args, **kwargs)
+            profiler = RpcProfiler(selectors() if callable(selectors) else selectors)
+            try:
+                with profiler:
+                    return fn(*args, **kwargs)
+            finally:
+                if target.lower() in ("1", "true", "yes"):
+                    profiler.print_report()
+                else:
+                    profiler.dump(target)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,41 @@
+import time
+from brownie import web3
+
+HOOKS_MIDDLEWARE = "otc_request_hooks"
+
+_request_hooks = []
+
+
+def add_request_hook(hook):
+    """hook(method, params, response, elapsed) is called after every JSON-RPC request sent to the node"""
+    _install(web3)
+    if hook not in _request_hooks:
+        _request_hooks.append(hook)
+
+
+def remove_request_hook(hook):
+    if hook in _request_hooks:
+        _request_hooks.remove(hook)
+
+
+def request_hooks_middleware(make_request, w3):
+    def middleware(method, params):
+        started = time.perf_counter()
+        response = None
+        try:
+            response = make_request(method, params)
+            return response
+        finally:
+            elapsed = time.perf_counter() - started
+            for hook in list(_request_hooks):
+                hook(method, params, response, elapsed)
+
+    return middleware
+
+
+def _install(w3):
+    # a middleware, not a patched `provider.make_request`: web3 caches the request function bound to the provider
+    # on the first request. The onion outlives brownie reconnects, the outermost layer sees the requests served by
+    # the inner middlewares too, e.g. the cassette replay
+    if HOOKS_MIDDLEWARE not in w3.middleware_onion:
+        w3.middleware_onion.add(request_hooks_middleware, name=HOOKS_MIDDLEWARE)
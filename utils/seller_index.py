@@ -0,0 +1,58 @@
+from web3 import Web3
+from utils.events import to_hex
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sellers (
+    seller TEXT PRIMARY KEY,
+    token0 TEXT NOT NULL,
+    token1 TEXT NOT NULL,
+    beneficiary TEXT NOT NULL,
+    block_number INTEGER NOT NULL,
+    tx_hash TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sellers_pair ON sellers (token0, token1);
+CREATE INDEX IF NOT EXISTS sellers_token1 ON sellers (token1);
+CREATE INDEX IF NOT EXISTS sellers_beneficiary ON sellers (beneficiary);
+"""
+
+
+class SellerIndex:
+    """Index of OTCFactory.SellerCreated events, fed by a LogIngester sharing the same connection"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        conn.executescript(SCHEMA)
+
+    def on_events(self, events):
+        rows = [
+            (event.args["pair"], event.args["token0"], event.args["token1"], event.args["beneficiary"], event.blockNumber, to_hex(event.transactionHash))
+            for event in events
+            if event.event == "SellerCreated"
+        ]
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO sellers VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def on_rollback(self, block_number):
+        with self.conn:
+            self.conn.execute("DELETE FROM sellers WHERE block_number > ?", (block_number,))
+
+    def _select(self, where="", params=()):
+        return [dict(row) for row in self.conn.execute(f"SELECT * FROM sellers {where} ORDER BY block_number", params)]
+
+    def all(self):
+        return self._select()
+
+    def get(self, seller):
+        rows = self._select("WHERE seller = ?", (Web3.toChecksumAddress(seller),))
+        return rows[0] if rows else None
+
+    def by_token(self, token):
+        token = Web3.toChecksumAddress(token)
+        return self._select("WHERE token0 = ? OR token1 = ?", (token, token))
+
+    def by_pair(self, token_a, token_b):
+        (token0, token1) = sorted((Web3.toChecksumAddress(token_a), Web3.toChecksumAddress(token_b)), key=str.lower)
+        return self._select("WHERE token0 = ? AND token1 = ?", (token0, token1))
+
+    def by_beneficiary(self, beneficiary):
+        return self._select("WHERE beneficiary = ?", (Web3.toChecksumAddress(beneficiary),))
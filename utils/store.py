@@ -0,0 +1,20 @@
+import sqlite3
+from brownie import network
+from utils.helpers import is_called_from_test
+
+
+def get_db_filename(name):
+    return f"./{name}-{network.show_active()}.sqlite"
+
+
+def open_db(name, schema=None, transient=False):
+    """`transient` stores live in memory, e.g. the state of a one-off logs scan"""
+    filename = ":memory:" if transient or is_called_from_test() else get_db_filename(name)
+    # the connection may be shared with worker threads, writes are wrapped into `with conn:` transactions
+    conn = sqlite3.connect(filename, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    if schema:
+        conn.executescript(schema)
+    return conn
@@ -0,0 +1,154 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from brownie import web3
+from web3.exceptions import TransactionNotFound
+import utils.log as log
+
+PENDING = "pending"
+CONFIRMED = "confirmed"
+REVERTED = "reverted"
+DROPPED = "dropped"
+
+
+def get_receipt(txids):
+    """Receipt of the mined one of the sent versions of a tx, None if none is mined"""
+    for txid in reversed(txids):
+        try:
+            return web3.eth.get_transaction_receipt(txid)
+        except TransactionNotFound:
+            continue
+    return None
+
+
+def is_known(txid):
+    try:
+        web3.eth.get_transaction(txid)
+        return True
+    except TransactionNotFound:
+        return False
+
+
+class PipelineTx:
+    def __init__(self, nonce, fn, args, tx_params):
+        self.nonce = nonce
+        self.fn = fn
+        self.args = args
+        self.tx_params = tx_params
+        self.tx = None
+        self.txids = []
+        self.status = PENDING
+        self.receipt = None
+        self.sent_at = None
+        self.attempts = 0
+
+    @property
+    def txid(self):
+        return self.tx.txid if self.tx else None
+
+
+class TxPipeline:
+    """Sends transactions of a single account back-to-back with locally assigned nonces.
+
+    Receipts of in-flight transactions are polled concurrently. A transaction not mined within `stuck_timeout`
+    is resent with the same nonce: as is when it has been dropped from the mempool, with bumped fees otherwise.
+    """
+
+    def __init__(self, account, max_in_flight=16, stuck_timeout=180, fee_increment=1.125, max_attempts=4, poll_interval=1):
+        self.account = account
+        self.max_in_flight = max_in_flight
+        self.stuck_timeout = stuck_timeout
+        self.fee_increment = fee_increment
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.txs = []
+        self._nonce = None
+        self._executor = ThreadPoolExecutor(max_workers=8)
+
+    def _next_nonce(self):
+        if self._nonce is None:
+            self._nonce = web3.eth.get_transaction_count(self.account.address, "pending")
+        nonce = self._nonce
+        self._nonce += 1
+        return nonce
+
+    def in_flight(self):
+        return [entry for entry in self.txs if entry.status == PENDING]
+
+    def submit(self, fn, *args, tx_params=None):
+        """Sends `fn(*args, tx_params)` without waiting for the receipt, `fn` is a brownie contract method"""
+        while len(self.in_flight()) >= self.max_in_flight:
+            self.poll()
+            time.sleep(self.poll_interval)
+
+        entry = PipelineTx(self._next_nonce(), fn, args, tx_params or {})
+        try:
+            self._send(entry)
+        except Exception:
+            # nothing was broadcast (e.g. gas estimation reverted), so the nonce is released to avoid a gap
+            self._nonce = entry.nonce
+            raise
+        self.txs.append(entry)
+        return entry
+
+    def _send(self, entry, fees=None):
+        params = {**entry.tx_params, **(fees or {}), "from": self.account, "nonce": entry.nonce, "required_confs": 0}
+        entry.tx = entry.fn(*entry.args, params)
+        entry.txids.append(entry.tx.txid)
+        entry.sent_at = time.monotonic()
+        entry.attempts += 1
+
+    def _bumped_fees(self, tx):
+        if getattr(tx, "max_fee", None):
+            return {"max_fee": int(tx.max_fee * self.fee_increment), "priority_fee": int(tx.priority_fee * self.fee_increment)}
+        return {"gas_price": int(tx.gas_price * self.fee_increment)}
+
+    def _set_receipt(self, entry, receipt):
+        entry.receipt = receipt
+        entry.status = CONFIRMED if receipt.status == 1 else REVERTED
+
+    def poll(self):
+        pending = self.in_flight()
+        if not pending:
+            return
+        # the nonce is read before the receipts, so a tx mined in between is not taken for a replaced one
+        mined_nonce = web3.eth.get_transaction_count(self.account.address)
+        # any of the sent versions of the tx may be the one that got mined
+        for entry, receipt in zip(pending, self._executor.map(lambda entry: get_receipt(entry.txids), pending)):
+            if receipt is not None:
+                self._set_receipt(entry, receipt)
+
+        for entry in self.in_flight():
+            if entry.nonce < mined_nonce:
+                # a receipt may lag behind the nonce on a load balanced node, it's checked once more
+                receipt = get_receipt(entry.txids)
+                if receipt is not None:
+                    self._set_receipt(entry, receipt)
+                    continue
+                # the nonce was consumed by a tx not sent by this pipeline
+                entry.status = DROPPED
+                log.warn(f"Tx with nonce {entry.nonce} was replaced outside of the pipeline", entry.txid)
+            elif time.monotonic() - entry.sent_at > self.stuck_timeout:
+                self._recover(entry)
+
+    def _recover(self, entry):
+        if entry.attempts >= self.max_attempts:
+            entry.status = DROPPED
+            log.error(f"Tx with nonce {entry.nonce} is not mined after {entry.attempts} attempts", entry.txid)
+            return
+        if is_known(entry.txid):
+            log.warn(f"Tx with nonce {entry.nonce} is stuck, replacing with bumped fees", entry.txid)
+            self._send(entry, self._bumped_fees(entry.tx))
+        else:
+            # dropped from the mempool, a later nonce can't be mined until the gap is filled
+            log.warn(f"Tx with nonce {entry.nonce} was dropped, resending", entry.txid)
+            self._send(entry)
+
+    def wait_all(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.in_flight():
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"{len(self.in_flight())} transactions are still pending")
+            self.poll()
+            if self.in_flight():
+                time.sleep(self.poll_interval)
+        return self.txs